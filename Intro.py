@@ -5,6 +5,7 @@ import rasterio
 from rasterio.plot import reshape_as_image
 import geopandas as gpd
 import matplotlib.pyplot as plt
+from display_stretch import stretch
 
 st.set_page_config(layout="wide", page_title="Intro SR")
 
@@ -32,8 +33,7 @@ def get_raster_and_meta(url):
         transform = src.transform  # The 'key' to converting GPS to Pixels
         crs = src.crs              # The coordinate system (e.g., WGS84)
         
-        img_display = reshape_as_image(img)
-        img_display = (img_display - img_display.min()) / (img_display.max() - img_display.min())
+        img_display = stretch(reshape_as_image(img), mode="minmax")
         return img_display, transform, crs
 
 # 4. Alignment Logic
@@ -4,6 +4,7 @@ from sklearn.feature_selection import SelectKBest, f_regression, chi2
 from sklearn.preprocessing import LabelEncoder
 import numpy as np
 import io
+from atributos_streaming import iter_chunks, score_chunks, rank_features, DEFAULT_CHUNKSIZE
 
 # --- Configuration & Initialization (Mandatory for Canvas, safe to ignore for local run) ---
 # Global variables are provided by the canvas environment for persistent storage,
@@ -14,6 +15,70 @@ import io
 # ------------------------------------------------------------------------------------------
 
 
+def read_columns(uploaded_file):
+    """Reads only the header (CSV) or schema (Parquet) of the file."""
+    uploaded_file.seek(0)
+    if uploaded_file.name.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(uploaded_file).schema_arrow.names
+    return pd.read_csv(uploaded_file, nrows=0).columns.tolist()
+
+
+@st.cache_data
+def streaming_scores(file_id, _uploaded_file, target_column, chunksize):
+    """One pass over the file chunks; cached per file, target and chunk size."""
+    _uploaded_file.seek(0)
+    chunks = iter_chunks(_uploaded_file, _uploaded_file.name, chunksize=chunksize)
+    return score_chunks(chunks, target_column)
+
+
+def streaming_selection(uploaded_file):
+    """Feature ranking from per-feature sufficient statistics accumulated by chunks."""
+    st.sidebar.header("Configuracion")
+    target_column = st.sidebar.selectbox(
+        "1. Seleccione la variable objetivo (Y):",
+        read_columns(uploaded_file)
+    )
+    chunksize = st.sidebar.number_input("Filas por bloque", 1000, 10_000_000, DEFAULT_CHUNKSIZE, step=10_000)
+
+    with st.spinner('Acumulando estadisticas por bloques...'):
+        scorer, feature_names, preview, dropped = streaming_scores(
+            uploaded_file.file_id, uploaded_file, target_column, chunksize
+        )
+
+    st.subheader("Previsualizacion de datos (Primeras 5 filas)")
+    st.dataframe(preview)
+    if dropped:
+        st.warning(f"Note: Dropped {dropped} rows with missing values for analysis.")
+    st.write(f"Filas analizadas: **{scorer.n:,}**")
+
+    max_k = len(feature_names)
+    k_features = st.sidebar.slider(
+        f"2. Seleccione el numero de mejores atributos (K, Max: {max_k}):",
+        min_value=1,
+        max_value=max_k,
+        value=min(10, max_k)
+    )
+
+    feature_results, selected_features, method_name = rank_features(scorer, feature_names, k_features)
+    st.sidebar.markdown(f"**Metodo Seleccionado:** `{method_name}`")
+
+    st.subheader("Resultados")
+    st.markdown(f"### Top {k_features} Selected Features")
+    st.dataframe(pd.DataFrame({"Atributos seleccionados": selected_features}), use_container_width=True)
+
+    st.markdown(f"### Ranking de Atributos totales (basado en el puntaje {method_name})")
+    st.dataframe(feature_results, use_container_width=True, height=500)
+
+    st.download_button(
+        label="Descargar el ranking de atributos",
+        data=feature_results.to_csv(index=False).encode('utf-8'),
+        file_name='ranking_atributos.csv',
+        mime='text/csv',
+        key='download_ranking'
+    )
+
+
 def feature_selection_app():
     """Main function to run the Streamlit feature selection application."""
     st.set_page_config(
@@ -27,12 +92,22 @@ def feature_selection_app():
 
     # --- File Uploader ---
     uploaded_file = st.file_uploader(
-        "Cargue un archivo CSV (recomendado) o Excel",
-        type=["csv", "xlsx"]
+        "Cargue un archivo CSV (recomendado), Parquet o Excel",
+        type=["csv", "parquet", "xlsx"]
     )
 
     if uploaded_file is not None:
         try:
+            # Large CSV/Parquet files are scored by chunks without loading the full table
+            streaming = st.sidebar.checkbox(
+                "Modo streaming (archivos grandes)",
+                value=uploaded_file.name.endswith('.parquet'),
+                disabled=uploaded_file.name.endswith('.xlsx')
+            )
+            if streaming:
+                streaming_selection(uploaded_file)
+                return
+
             # Load the data
             if uploaded_file.name.endswith('.csv'):
                 data = pd.read_csv(uploaded_file)
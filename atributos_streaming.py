@@ -0,0 +1,308 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# --- Configuration ---
+DEFAULT_CHUNKSIZE = 100_000   # Rows parsed per chunk
+MAX_TRACKED_CLASSES = 1000    # Beyond this the target is treated as continuous
+MAX_ENCODED_LABELS = 50_000   # Distinct labels of a text target that can be label encoded
+
+
+class StreamingFeatureScorer:
+    """
+    Accumulates the sufficient statistics needed by f_regression and chi2
+    over chunks of (X, y) and produces the same scores and p-values as
+    sklearn's SelectKBest without holding the full matrix in memory.
+
+    - f_regression: per-feature mean and centered co-moments with the target,
+      merged chunk by chunk (Chan et al.) to keep the precision of a single pass.
+    - chi2: per-class feature sums and class counts (Y^T X in sklearn).
+
+    Text targets are label encoded over the sorted labels of the whole file,
+    which are only known at the end, so their per-label sums are kept for
+    every label (up to MAX_ENCODED_LABELS) and the target moments are built
+    from them in f_regression.
+    """
+
+    def __init__(self, n_features):
+        self.n_features = n_features
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.m2_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.m2_y = 0.0
+        self.c_xy = np.zeros(n_features)
+        self.min_x = np.full(n_features, np.inf)
+        self.target_numeric = True
+        self.target_float = False
+        # Per-class accumulators: label -> row in class_sums / class_counts
+        self.class_index = {}
+        self.class_sums = np.zeros((0, n_features))
+        self.class_counts = np.zeros(0, dtype=np.int64)
+        self.track_classes = True
+
+    # --- Accumulation ---
+    def partial_fit(self, X, y):
+        """Adds one chunk of rows. X: (rows, n_features), y: (rows,)."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        rows = X.shape[0]
+        if rows == 0:
+            return self
+
+        self.min_x = np.minimum(self.min_x, X.min(axis=0))
+        if y.dtype.kind not in "biuf" or not self.target_numeric:
+            # Labels are compared as text, so mixed int / str values sort consistently
+            y = y.astype(str)
+            if self.target_numeric:
+                self._labels_as_text()
+        elif y.dtype.kind == "f":
+            self.target_float = True
+
+        if self.track_classes:
+            self._update_classes(X, y)
+
+        if self.target_numeric:
+            self._update_moments(X, y.astype(np.float64))
+        else:
+            # Target moments are rebuilt from the class sums at the end
+            self._update_moments(X, None)
+        return self
+
+    def _update_moments(self, X, y):
+        rows = X.shape[0]
+        chunk_mean_x = X.mean(axis=0)
+        Xc = X - chunk_mean_x
+        chunk_m2_x = np.einsum("ij,ij->j", Xc, Xc)
+
+        total = self.n + rows
+        delta_x = chunk_mean_x - self.mean_x
+        weight = self.n * rows / total
+
+        if y is not None:
+            chunk_mean_y = y.mean()
+            yc = y - chunk_mean_y
+            chunk_m2_y = yc @ yc
+            chunk_c_xy = yc @ Xc
+            delta_y = chunk_mean_y - self.mean_y
+            self.c_xy += chunk_c_xy + delta_x * delta_y * weight
+            self.m2_y += chunk_m2_y + delta_y * delta_y * weight
+            self.mean_y += delta_y * rows / total
+
+        self.m2_x += chunk_m2_x + delta_x * delta_x * weight
+        self.mean_x += delta_x * rows / total
+        self.n = total
+
+    def _labels_as_text(self):
+        """
+        A text chunk after numeric ones: the target becomes a label-encoded
+        text target, re-keying the labels seen so far by their text.
+        """
+        self.target_numeric = False
+        if not self.track_classes:
+            raise ValueError(
+                "La variable objetivo mezcla valores numericos y texto despues de "
+                f"mas de {MAX_TRACKED_CLASSES} valores numericos distintos."
+            )
+        index, sums, counts = {}, [], []
+        for label, row in self.class_index.items():
+            label = str(label)
+            if label not in index:
+                index[label] = len(index)
+                sums.append(np.zeros(self.n_features))
+                counts.append(0)
+            sums[index[label]] = sums[index[label]] + self.class_sums[row]
+            counts[index[label]] += self.class_counts[row]
+        self.class_index = index
+        self.class_sums = np.array(sums).reshape(-1, self.n_features)
+        self.class_counts = np.array(counts, dtype=np.int64)
+
+    def _update_classes(self, X, y):
+        labels, inverse = np.unique(y, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        rows = []
+        for label in labels.tolist():
+            if label not in self.class_index:
+                self.class_index[label] = len(self.class_index)
+            rows.append(self.class_index[label])
+
+        if self.target_numeric and len(self.class_index) > MAX_TRACKED_CLASSES:
+            # Too many distinct values: this can only be a regression target,
+            # whose moments are accumulated directly
+            self.track_classes = False
+            self.class_index = {}
+            self.class_sums = np.zeros((0, self.n_features))
+            self.class_counts = np.zeros(0, dtype=np.int64)
+            return
+        if len(self.class_index) > MAX_ENCODED_LABELS:
+            raise ValueError(
+                f"La variable objetivo tiene mas de {MAX_ENCODED_LABELS} etiquetas de texto "
+                "distintas; no se puede codificar para la regresion F."
+            )
+
+        grow = len(self.class_index) - self.class_sums.shape[0]
+        if grow > 0:
+            self.class_sums = np.vstack([self.class_sums, np.zeros((grow, self.n_features))])
+            self.class_counts = np.concatenate([self.class_counts, np.zeros(grow, dtype=np.int64)])
+
+        # Per-label feature sums with one bincount per feature (no rows x labels one-hot)
+        rows = np.asarray(rows)
+        for j in range(self.n_features):
+            self.class_sums[rows, j] += np.bincount(inverse, weights=X[:, j], minlength=len(labels))
+        self.class_counts[rows] += np.bincount(inverse, minlength=len(labels))
+
+    # --- Results ---
+    @property
+    def n_classes(self):
+        return len(self.class_index) if self.track_classes else None
+
+    @property
+    def has_negative(self):
+        return bool((self.min_x < 0).any())
+
+    def _sorted_classes(self):
+        """Class rows ordered like LabelEncoder/LabelBinarizer (sorted labels)."""
+        labels = sorted(self.class_index)
+        order = np.array([self.class_index[label] for label in labels], dtype=np.intp)
+        return labels, order
+
+    def f_regression(self):
+        """Returns (F, p-values) matching sklearn.feature_selection.f_regression."""
+        if self.target_numeric:
+            c_xy, m2_y = self.c_xy, self.m2_y
+        else:
+            # Object targets are label encoded (0..k-1 over sorted labels)
+            _, order = self._sorted_classes()
+            codes = np.arange(len(order), dtype=np.float64)
+            counts = self.class_counts[order].astype(np.float64)
+            sums = self.class_sums[order]
+            mean_y = codes @ counts / self.n
+            dy = codes - mean_y
+            c_xy = dy @ (sums - counts[:, None] * self.mean_x)
+            m2_y = dy @ (counts * dy)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = c_xy / np.sqrt(self.m2_x) / np.sqrt(m2_y)
+            corr2 = corr ** 2
+            dof = self.n - 2
+            f_statistic = corr2 / (1 - corr2) * dof
+        p_values = stats.f.sf(f_statistic, 1, dof)
+
+        # Same force_finite handling as sklearn
+        if not np.isfinite(f_statistic).all():
+            mask_inf = np.isclose(corr2, 1.0)
+            f_statistic[mask_inf] = np.finfo(f_statistic.dtype).max
+            mask_nan = np.isnan(f_statistic)
+            f_statistic[mask_nan] = 0.0
+            p_values[mask_inf] = 0.0
+            p_values[mask_nan] = 1.0
+        return f_statistic, p_values
+
+    def chi2(self):
+        """Returns (chi2, p-values) matching sklearn.feature_selection.chi2."""
+        if not self.track_classes:
+            raise ValueError("chi2 requiere una variable objetivo categorica.")
+        if self.has_negative:
+            raise ValueError("chi2 requiere valores de atributos no negativos.")
+
+        _, order = self._sorted_classes()
+        observed = self.class_sums[order]
+        counts = self.class_counts[order]
+        if len(order) == 1:
+            # sklearn pads a single class with an empty complementary column
+            observed = np.vstack([observed, np.zeros_like(observed)])
+            counts = np.array([counts[0], 0])
+
+        feature_count = observed.sum(axis=0)
+        class_prob = counts / self.n
+        expected = np.outer(class_prob, feature_count)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = (observed - expected) ** 2 / expected
+        chisq = terms.sum(axis=0)
+        p_values = stats.chi2.sf(chisq, len(observed) - 1)
+        return chisq, p_values
+
+
+def iter_chunks(source, file_name, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields DataFrame chunks of a CSV or Parquet file (path or file-like)."""
+    if file_name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+
+def score_chunks(chunks, target_column):
+    """
+    Single pass over DataFrame chunks. Rows with missing values are dropped
+    (like the in-memory app) and only numeric features are scored.
+    Returns (scorer, feature_names, preview, dropped_rows).
+    """
+    scorer = None
+    feature_names = None
+    preview = None
+    dropped = 0
+
+    for chunk in chunks:
+        if preview is None:
+            preview = chunk.head()
+        cleaned = chunk.dropna()
+        dropped += len(chunk) - len(cleaned)
+
+        if feature_names is None:
+            features = cleaned.drop(columns=[target_column])
+            feature_names = features.select_dtypes(include=np.number).columns.tolist()
+            if not feature_names:
+                raise ValueError("No se encontraron atributos numericos en el conjunto de datos.")
+            scorer = StreamingFeatureScorer(len(feature_names))
+
+        # Types are coerced on every chunk: pandas infers them per chunk, so a
+        # later chunk may parse a feature or the target differently
+        features = cleaned[feature_names].apply(pd.to_numeric, errors="coerce")
+        parsed = features.notna().all(axis=1).to_numpy()
+        dropped += int((~parsed).sum())
+        target = cleaned[target_column][parsed]
+        numeric_target = pd.to_numeric(target, errors="coerce")
+        if numeric_target.notna().all():
+            target = numeric_target.to_numpy()
+        else:
+            target = target.astype(str).to_numpy(dtype=object)
+        scorer.partial_fit(features[parsed].to_numpy(dtype=np.float64), target)
+
+    if scorer is None or scorer.n == 0:
+        raise ValueError("El conjunto de datos esta vacio despues de eliminar los valores faltantes.")
+    return scorer, feature_names, preview, dropped
+
+
+def rank_features(scorer, feature_names, k):
+    """
+    Picks the scoring function the same way the app does and returns
+    (results DataFrame ranked by score, selected feature names, method name).
+    """
+    is_classification = (
+        scorer.track_classes and scorer.n_classes <= 20 and not scorer.target_float
+    )
+    if is_classification and not scorer.has_negative:
+        scores, p_values = scorer.chi2()
+        method_name = "Chi-cuadrado (Clasificacion)"
+    else:
+        scores, p_values = scorer.f_regression()
+        method_name = "Regresion F (General)" if is_classification else "Regresion F (Regresion)"
+
+    results = pd.DataFrame({
+        'Atributo': feature_names,
+        'Puntaje': scores,
+        'P-valor': p_values
+    })
+
+    # Same tie-breaking as SelectKBest: stable argsort on the scores
+    selected_indices = np.sort(np.argsort(np.nan_to_num(scores, nan=-np.inf), kind="mergesort")[-k:])
+    selected_features = [feature_names[i] for i in selected_indices]
+
+    results = results.sort_values(by='Puntaje', ascending=False).reset_index(drop=True)
+    results.index += 1
+    return results, selected_features, method_name
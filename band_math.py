@@ -0,0 +1,300 @@
+import ast
+import functools
+import math
+import re
+
+import numpy as np
+
+# --- Configuration ---
+MAX_DEPTH = 200   # Deepest expression tree compiled (the compiler recurses per level)
+
+# --- Supported operations ---
+BINARY_OPS = {
+    ast.Add: "add",
+    ast.Sub: "sub",
+    ast.Mult: "mul",
+    ast.Div: "div",
+    ast.Pow: "pow",
+}
+UNARY_OPS = {
+    ast.USub: "neg",
+    ast.UAdd: None,   # +x is x
+}
+FUNCTIONS = {
+    "sqrt": ("sqrt", 1),
+    "abs": ("abs", 1),
+    "log": ("log", 1),
+    "exp": ("exp", 1),
+    "min": ("minimum", 2),
+    "max": ("maximum", 2),
+}
+COMMUTATIVE = {"add", "mul", "minimum", "maximum"}
+
+UFUNCS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "div": np.divide,
+    "pow": np.power,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "neg": np.negative,
+    "sqrt": np.sqrt,
+    "square": np.square,
+    "abs": np.absolute,
+    "log": np.log,
+    "exp": np.exp,
+}
+
+
+
+def fold(op, *values):
+    """
+    Constant folding with the same ufuncs (and inf / NaN results) as the
+    window evaluation: 10**1000 is inf, (-8)**(1/3) is NaN, x/0 is NaN.
+    """
+    args = [np.float64(value) for value in values]
+    if op == "div" and args[1] == 0:
+        return math.nan
+    with np.errstate(all="ignore"):
+        return float(UFUNCS[op](*args))
+
+BAND_NUMBER = re.compile(r"^b(\d+)$")
+
+
+class Plan:
+    """
+    Compiled evaluation plan for one or more band-math expressions.
+
+    instructions: ("op", ufunc name, dst register, operands) or ("out", k, operand),
+    where operands are ("band", alias), ("const", value) or ("reg", index).
+    Registers are reused as soon as their value is dead, so most operations
+    run in place and the number of window buffers stays small.
+    """
+
+    def __init__(self, expressions, instructions, n_registers, bands):
+        self.expressions = expressions
+        self.instructions = instructions
+        self.n_registers = n_registers
+        self.bands = bands
+
+    def evaluate(self, bands, pool, shape):
+        """
+        Runs the plan on one window. bands maps alias -> float32 buffer.
+        Yields (k, values) for every expression in order; values is only
+        valid until the generator is resumed.
+        """
+        registers = [pool.get(f"reg{i}", shape) for i in range(self.n_registers)]
+
+        def value(operand):
+            kind, arg = operand
+            if kind == "band":
+                return bands[arg]
+            if kind == "reg":
+                return registers[arg]
+            return arg
+
+        for instruction in self.instructions:
+            if instruction[0] == "out":
+                _, k, operand = instruction
+                result = value(operand)
+                if operand[0] == "const":
+                    result = pool.get("const_out", shape)
+                    result.fill(operand[1])
+                yield k, result
+                continue
+
+            _, op, dst, operands = instruction
+            out = registers[dst]
+            args = [value(operand) for operand in operands]
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                if op == "div":
+                    # NaN where the denominator is zero (checked before out may alias it)
+                    zero = np.equal(args[1], 0, out=pool.get("zero_mask", shape, bool))
+                    np.divide(args[0], args[1], out=out)
+                    np.copyto(out, np.nan, where=zero)
+                else:
+                    UFUNCS[op](*args, out=out)
+
+
+class _Compiler:
+    """Hash-consing compiler: identical sub-expressions become a single node."""
+
+    def __init__(self):
+        self.nodes = []      # (op, args) where args are node ids / constant / alias
+        self.memo = {}
+
+    def node(self, op, args):
+        key = (op, args)
+        if key not in self.memo:
+            self.memo[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self.memo[key]
+
+    def constant(self, value):
+        try:
+            value = float(value)
+        except OverflowError:
+            # Integer literals beyond the float range
+            value = math.inf if value > 0 else -math.inf
+        return self.node("const", value)
+
+    def is_const(self, node_id):
+        return self.nodes[node_id][0] == "const"
+
+    def const_value(self, node_id):
+        return self.nodes[node_id][1]
+
+    def apply(self, op, *operands):
+        if all(self.is_const(operand) for operand in operands):
+            return self.constant(fold(op, *(self.const_value(o) for o in operands)))
+        if op == "pow" and self.is_const(operands[1]):
+            exponent = self.const_value(operands[1])
+            if exponent == 1:
+                return operands[0]
+            if exponent == 2:
+                return self.apply("square", operands[0])
+            if exponent == 0.5:
+                return self.apply("sqrt", operands[0])
+        if op in COMMUTATIVE:
+            operands = tuple(sorted(operands))
+        return self.node(op, tuple(operands))
+
+    def visit(self, tree):
+        if isinstance(tree, ast.Expression):
+            return self.visit(tree.body)
+        if isinstance(tree, ast.Constant) and isinstance(tree.value, (int, float)) \
+                and not isinstance(tree.value, bool):
+            return self.constant(tree.value)
+        if isinstance(tree, ast.Name):
+            return self.node("band", tree.id)
+        if isinstance(tree, ast.BinOp) and type(tree.op) in BINARY_OPS:
+            return self.apply(BINARY_OPS[type(tree.op)], self.visit(tree.left), self.visit(tree.right))
+        if isinstance(tree, ast.UnaryOp) and type(tree.op) in UNARY_OPS:
+            operand = self.visit(tree.operand)
+            op = UNARY_OPS[type(tree.op)]
+            return operand if op is None else self.apply(op, operand)
+        if isinstance(tree, ast.Call) and isinstance(tree.func, ast.Name) \
+                and tree.func.id in FUNCTIONS and not tree.keywords:
+            op, arity = FUNCTIONS[tree.func.id]
+            if len(tree.args) != arity:
+                raise ValueError(f"{tree.func.id}() requiere {arity} argumento(s).")
+            return self.apply(op, *(self.visit(arg) for arg in tree.args))
+        raise ValueError(f"Elemento no permitido en la expresion: {type(tree).__name__}")
+
+
+def _depth(tree):
+    """Depth of an AST, measured without recursion."""
+    deepest, stack = 0, [(tree, 1)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+def parse(expression):
+    """
+    Parses an expression safely (only arithmetic, band aliases and FUNCTIONS).
+    Trees deeper than MAX_DEPTH are rejected, so compiling never recurses
+    past the interpreter limit.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Expresion no valida: {e.msg}") from None
+    except (RecursionError, MemoryError):
+        raise ValueError("Expresion demasiado anidada o extensa.") from None
+    if _depth(tree) > MAX_DEPTH:
+        raise ValueError(f"Expresion demasiado anidada (mas de {MAX_DEPTH} niveles).")
+    return tree
+
+
+@functools.lru_cache(maxsize=128)
+def compile_plan(expressions):
+    """Compiles a tuple of expressions into a single Plan (cached per tuple)."""
+    compiler = _Compiler()
+    outputs = [compiler.visit(parse(expression)) for expression in expressions]
+    nodes = compiler.nodes
+
+    # Emission order: the nodes each output needs, output by output
+    order, emitted = [], set()
+
+    def emit(node_id):
+        if node_id in emitted:
+            return
+        op, args = nodes[node_id]
+        if op not in ("band", "const"):
+            for arg in args:
+                emit(arg)
+        emitted.add(node_id)
+        order.append(("node", node_id))
+
+    for k, node_id in enumerate(outputs):
+        emit(node_id)
+        order.append(("out", k, node_id))
+
+    # Last position where each node is used
+    last_use = {}
+    for position, step in enumerate(order):
+        if step[0] == "out":
+            last_use[step[2]] = position
+        else:
+            op, args = nodes[step[1]]
+            if op not in ("band", "const"):
+                for arg in args:
+                    last_use[arg] = position
+
+    def operand(node_id):
+        op, args = nodes[node_id]
+        if op == "band":
+            return ("band", args)
+        if op == "const":
+            return ("const", args)
+        return ("reg", register_of[node_id])
+
+    instructions, register_of, free, n_registers = [], {}, [], 0
+    bands = []
+    for position, step in enumerate(order):
+        if step[0] == "out":
+            instructions.append(("out", step[1], operand(step[2])))
+            if nodes[step[2]][0] not in ("band", "const") and last_use[step[2]] == position:
+                free.append(register_of[step[2]])
+            continue
+
+        node_id = step[1]
+        op, args = nodes[node_id]
+        if op == "band":
+            if args not in bands:
+                bands.append(args)
+            continue
+        if op == "const":
+            continue
+
+        operands = tuple(operand(arg) for arg in args)
+        # Operands that die here give their register back: the op runs in place
+        for arg in dict.fromkeys(args):
+            if nodes[arg][0] not in ("band", "const") and last_use[arg] == position:
+                free.append(register_of[arg])
+        if free:
+            register = free.pop()
+        else:
+            register = n_registers
+            n_registers += 1
+        register_of[node_id] = register
+        instructions.append(("op", op, register, operands))
+
+    return Plan(tuple(expressions), instructions, n_registers, tuple(bands))
+
+
+def resolve_bands(aliases, band_map):
+    """Maps band aliases to band numbers: band_map names or bN for band N."""
+    resolved = {}
+    for alias in aliases:
+        if alias in band_map:
+            resolved[alias] = band_map[alias]
+        elif BAND_NUMBER.match(alias):
+            resolved[alias] = int(BAND_NUMBER.match(alias).group(1))
+        else:
+            raise ValueError(f"Banda desconocida en la expresion: '{alias}'")
+    return resolved
@@ -0,0 +1,183 @@
+import numpy as np
+from pyproj import CRS as ProjCRS
+
+from veg_index_engine import iter_windows
+
+# --- Configuration ---
+MAX_DENSE_SPAN = 1 << 20    # Largest class-value range counted with a dense np.bincount table
+WGS84 = (6378137.0, 298.257223563)   # Semi-major axis (m), inverse flattening
+
+
+def ellipsoid(crs):
+    """(semi-major axis in m, inverse flattening) of the ellipsoid of a CRS (WGS84 if unknown)."""
+    try:
+        shape = ProjCRS.from_wkt(crs.to_wkt()).ellipsoid
+    except Exception:
+        return WGS84
+    if shape is None:
+        return WGS84
+    return shape.semi_major_metre, shape.inverse_flattening
+
+
+def _authalic(latitude, e):
+    """q(phi) of the ellipsoidal area between the equator and a parallel (e > 0)."""
+    s = np.sin(np.radians(latitude))
+    return s / (1 - (e * s) ** 2) + np.log((1 + e * s) / (1 - e * s)) / (2 * e)
+
+
+def geodesic_row_areas(transform, height, semi_major=WGS84[0], inverse_flattening=WGS84[1]):
+    """
+    Exact ellipsoidal area (m2) of one pixel of each row of a north-up
+    lon/lat grid: a cell between two parallels and dlon wide has area
+    a^2 (1 - e^2) dlon (q(phi2) - q(phi1)) / 2.
+    """
+    if transform.b != 0 or transform.d != 0:
+        raise ValueError("Las areas geodesicas requieren una grilla sin rotacion (norte arriba).")
+    edges = transform.f + transform.e * np.arange(height + 1)
+    dlon = np.radians(abs(transform.a))
+    if not inverse_flattening:
+        # Sphere: area between parallels is a^2 dlon (sin(phi2) - sin(phi1))
+        return semi_major ** 2 * dlon * np.abs(np.diff(np.sin(np.radians(edges))))
+    f = 1 / inverse_flattening
+    e2 = f * (2 - f)
+    q = _authalic(edges, np.sqrt(e2))
+    return semi_major ** 2 * (1 - e2) * dlon * np.abs(np.diff(q)) / 2
+
+
+def pixel_areas(src):
+    """
+    Pixel area in m2: per-row array for geographic CRSs (area only depends on
+    latitude), a single value otherwise (cell size in the CRS linear unit,
+    or in map units when the raster has no CRS).
+    """
+    if src.crs is not None and src.crs.is_geographic:
+        return geodesic_row_areas(src.transform, src.height, *ellipsoid(src.crs))
+    area = src.res[0] * src.res[1]
+    if src.crs is not None:
+        area *= src.crs.linear_units_factor[1] ** 2
+    return area
+
+
+def grouped_counts(values, weights=None):
+    """
+    (unique values, counts, weighted sums) of one flat array: np.bincount
+    over the value range shifted by its minimum for integers spanning less
+    than MAX_DENSE_SPAN, np.unique otherwise.
+    """
+    if values.dtype.kind in "iub" and values.size:
+        low, high = int(values.min()), int(values.max())
+        if high - low < MAX_DENSE_SPAN:
+            index = values.astype(np.int64) - low
+            counts = np.bincount(index)
+            present = np.nonzero(counts)[0]
+            areas = (np.zeros(len(present)) if weights is None
+                     else np.bincount(index, weights=weights)[present])
+            return present + low, counts[present], areas
+    unique, inverse = np.unique(values, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse, minlength=len(unique))
+    areas = (np.zeros(len(unique)) if weights is None
+             else np.bincount(inverse, weights=weights, minlength=len(unique)))
+    return unique, counts, areas
+
+
+class ClassCounts:
+    """
+    Pixel count (and optionally area) of every class value, accumulated
+    window by window. Integer values go through np.bincount on a dense table
+    spanning the values seen so far (shifted by the smallest one, so negative
+    classes are kept); float maps or integer values too far apart for a dense
+    table fall back to a per-window np.unique. NaN and inf are never classes.
+    Areas are the same grouped sums weighted by the pixel area of each row.
+    """
+
+    def __init__(self):
+        self.low = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.areas = np.zeros(0)
+        self.sparse = {}
+
+    @property
+    def high(self):
+        return self.low + len(self.counts) - 1
+
+    def _grow(self, low, high):
+        if len(self.counts) == 0:
+            self.low, self.counts = low, np.zeros(high - low + 1, dtype=np.int64)
+            self.areas = np.zeros(high - low + 1)
+            return
+        new_low, new_high = min(self.low, low), max(self.high, high)
+        if new_low == self.low and new_high == self.high:
+            return
+        start, stop = self.low - new_low, self.low - new_low + len(self.counts)
+        counts, areas = np.zeros(new_high - new_low + 1, dtype=np.int64), np.zeros(new_high - new_low + 1)
+        counts[start:stop], areas[start:stop] = self.counts, self.areas
+        self.low, self.counts, self.areas = new_low, counts, areas
+
+    def update(self, classes, row_areas=None):
+        """Adds a (rows, cols) window; row_areas holds the pixel area of each of its rows."""
+        classes = np.asarray(classes)
+        weights = None
+        if row_areas is not None:
+            weights = np.broadcast_to(np.asarray(row_areas, dtype=np.float64)[:, None], classes.shape).ravel()
+        values = classes.ravel()
+        if values.dtype.kind == "f":
+            valid = np.isfinite(values)
+            values = values[valid]
+            weights = None if weights is None else weights[valid]
+        if values.size == 0:
+            return self
+        if values.dtype.kind in "iub":
+            low, high = int(values.min()), int(values.max())
+            if len(self.counts):
+                low, high = min(low, self.low), max(high, self.high)
+            if high - low < MAX_DENSE_SPAN:
+                self._grow(low, high)
+                index = values.astype(np.int64) - self.low
+                self.counts += np.bincount(index, minlength=len(self.counts))
+                if weights is not None:
+                    self.areas += np.bincount(index, weights=weights, minlength=len(self.counts))
+                return self
+        unique, counts, areas = grouped_counts(values, weights)
+        for value, count, area in zip(unique.tolist(), counts.tolist(), areas.tolist()):
+            total = self.sparse.get(value, (0, 0.0))
+            self.sparse[value] = (total[0] + count, total[1] + area)
+        return self
+
+    def result(self):
+        """(class values, pixel counts, weighted areas) of the classes present, sorted by value."""
+        present = np.nonzero(self.counts)[0]
+        totals = {value: (count, area) for value, count, area in
+                  zip((present + self.low).tolist(), self.counts[present].tolist(), self.areas[present].tolist())}
+        for value, (count, area) in self.sparse.items():
+            total = totals.get(value, (0, 0.0))
+            totals[value] = (total[0] + count, total[1] + area)
+        order = sorted(totals)
+        return (np.array(order), np.array([totals[value][0] for value in order], dtype=np.int64),
+                np.array([totals[value][1] for value in order], dtype=np.float64))
+
+
+def class_counts(src, band=1):
+    """Pixel count per class of a class band, in one linear pass over the raster windows."""
+    accumulator = ClassCounts()
+    for window in iter_windows(src):
+        accumulator.update(src.read(band, window=window))
+    values, counts, _ = accumulator.result()
+    return values, counts
+
+
+def class_areas(src, band=1):
+    """
+    (class values, pixel counts, areas in m2) in one pass. On geographic
+    CRSs each window is a bincount weighted by the geodesic area of its
+    rows (precomputed once); otherwise area = count x pixel area.
+    """
+    areas = pixel_areas(src)
+    if np.isscalar(areas):
+        values, counts = class_counts(src, band)
+        return values, counts, counts * areas
+    accumulator = ClassCounts()
+    for window in iter_windows(src):
+        (row_start, row_stop), _ = window.toranges()
+        accumulator.update(src.read(band, window=window), areas[row_start:row_stop])
+    return accumulator.result()
@@ -1,9 +1,16 @@
+import os
+import time
 import streamlit as st
 import rasterio
+from rasterio.io import MemoryFile
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 from Py6S import *
-import datetime
+from sixs_lut import DEFAULT_ATMOSPHERE, OLI_BANDS, RUNNERS, build_lut, correct_scene
+from landsat_mtl import PRODUCTS, parse_mtl, toa_scene
+from dos_correction import METHODS, compare_methods, dark_object_dn, dn_histograms, dos_scene, sample_dn
+from veg_index_engine import ScratchFile, read_preview
 
 # --- App Title and Description ---
 st.title("Corrección atmosférica OLI del Landsat 8 con Py6S")
@@ -22,43 +29,195 @@ with st.expander("Cargue su imagen Landsat 8 (.TIF) y su correspondiente metadat
 st.header("2. Configuracion de parametros atmosfericos")
 st.info("Establezca las condiciones atmosféricas para la corrección. Los valores predeterminados corresponden a un clima tropical cerca de Armero-Guayabal.")
 
+mode = st.radio("Modo de correccion", ["Pixel central (Py6S)", "Escena completa (tabla LUT de 6S)",
+                                       "Objeto oscuro (DOS1 / DOS4 / COST)",
+                                       "Valores TOA (sin correccion atmosferica)"])
+aot_550 = st.number_input("Espesor optico de aerosoles (AOT a 550 nm)", 0.0, 2.0, DEFAULT_ATMOSPHERE["aot550"], 0.01)
+if mode != "Pixel central (Py6S)":
+    oli_bands = st.multiselect("Bandas OLI contenidas en el TIF (en orden)", list(OLI_BANDS), default=[4],
+                               format_func=lambda band: f"B{band} - {OLI_BANDS[band][0]}")
+if mode == "Valores TOA (sin correccion atmosferica)":
+    product = st.radio("Producto", list(PRODUCTS), format_func=PRODUCTS.get)
+if mode == "Objeto oscuro (DOS1 / DOS4 / COST)":
+    method = st.selectbox("Metodo", list(METHODS), format_func=METHODS.get)
+    compare = st.checkbox("Comparar los tres metodos con la tabla LUT de 6S en pixeles de muestra")
+if mode == "Escena completa (tabla LUT de 6S)" or (mode == "Objeto oscuro (DOS1 / DOS4 / COST)" and compare):
+    runner_name = st.selectbox("Modelo de transferencia radiativa", list(RUNNERS))
+if mode == "Escena completa (tabla LUT de 6S)":
+    aot_grid = st.checkbox("Tabla con varios AOT (0.05 - 0.5), reutilizable para otros valores")
+
 # --- Correction Button and Main Logic ---
 st.header("3. Ejecutar la correccion atmosferica")
+
+
+def report_usage(started, first_result, image_bytes, output_bytes, output_label="GeoTIFF de salida"):
+    """
+    Size of the upload (kept in memory) and of the result, and time to the
+    first and last result. These are data sizes, not the peak memory of the
+    process: window buffers, previews and the copy made by the download
+    button come on top of them.
+    """
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Imagen cargada", f"{image_bytes / 2 ** 20:,.1f} MB")
+    col2.metric(output_label, f"{output_bytes / 2 ** 20:,.1f} MB")
+    col3.metric("Primer resultado", f"{first_result - started:.2f} s")
+    col4.metric("Tiempo total", f"{time.perf_counter() - started:.2f} s")
+
+
 if st.button("Run Atmospheric Correction"):
     if not uploaded_image or not uploaded_metadata:
         st.error("Por favor cargue ambos archivos TIF y MTL para continuar.")
     else:
-        # Save uploaded files to a temporary location
-        with open("uploaded_image.TIF", "wb") as f:
-            f.write(uploaded_image.getbuffer())
-        with open("uploaded_metadata.TXT", "wb") as f:
-            f.write(uploaded_metadata.getbuffer())
-        
+        started = time.perf_counter()
+        # The image is opened by GDAL straight from the upload buffer (no copy to
+        # the working directory, so concurrent sessions never share files)
+        image = MemoryFile(uploaded_image.getbuffer())
+
         # --- Pre-processing: Extract Metadata ---
         st.subheader("Procesando los datos...")
-        with open("uploaded_metadata.TXT", "r") as f:
-            metadata_lines = f.readlines()
-
-        def get_metadata_value(key):
-            for line in metadata_lines:
-                if key in line:
-                    return float(line.split("=")[1].strip())
-            return None
+        # Single pass over the MTL bytes: every field typed, band factors grouped by band
+        mtl = parse_mtl(uploaded_metadata.getvalue())
 
         # Extract radiometric scaling factors and other parameters
-        rad_mult_band4 = get_metadata_value("RADIANCE_MULT_BAND_4")
-        rad_add_band4 = get_metadata_value("RADIANCE_ADD_BAND_4")
-        
-        solar_zenith = get_metadata_value("SUN_ELEVATION")
-        if solar_zenith is not None:
-            solar_zenith = 90.0 - solar_zenith
-            
-        acquisition_date_str = None
-        for line in metadata_lines:
-            if "DATE_ACQUIRED" in line:
-                acquisition_date_str = line.split("=")[1].strip().replace("'", "")
-                break
-        
+        rad_mult_band4, rad_add_band4 = mtl.gains([4])[4]
+        solar_zenith = mtl.solar_zenith
+        date = mtl.date_acquired
+
+        # Time of the first corrected window
+        first_result = []
+
+        def on_window(band, window, values):
+            if not first_result:
+                first_result.append(time.perf_counter())
+
+        if mode != "Pixel central (Py6S)":
+            # Band list checked before any 6S run or pass over the scene
+            with image.open() as src:
+                n_bands = src.count
+            if n_bands != len(oli_bands):
+                st.error(f"El TIF tiene {n_bands} bandas y se seleccionaron {len(oli_bands)}.")
+                st.stop()
+
+        if mode == "Valores TOA (sin correccion atmosferica)":
+            st.subheader("Conversion de DN a valores en el tope de la atmosfera (TOA)")
+            output = ScratchFile(suffix=".tif")
+            with image, image.open() as src:
+                center = src.height // 2, src.width // 2
+                toa_scene(src, output.path, dict(zip(range(1, src.count + 1), oli_bands)), mtl, product,
+                          on_window=on_window)
+
+                with rasterio.open(output.path) as dst:
+                    sample = dst.read(window=((center[0], center[0] + 1), (center[1], center[1] + 1)))[:, 0, 0]
+            st.write(f"Fecha de adquisicion: {date}, elevacion solar: {mtl.sun_elevation:.2f}°")
+            st.table(pd.DataFrame({
+                "Banda": [f"B{band} - {OLI_BANDS[band][0]}" for band in oli_bands],
+                f"{PRODUCTS[product]} (pixel central)": sample,
+            }))
+            report_usage(started, first_result[0], uploaded_image.size, os.path.getsize(output.path))
+            with open(output.path, "rb") as f:
+                st.download_button(f"Descargar {PRODUCTS[product].split(' (')[0].lower()} (GeoTIFF)", data=f,
+                                   file_name=f"toa_{product}.tif", mime="image/tiff")
+            st.stop()
+
+        if mode == "Objeto oscuro (DOS1 / DOS4 / COST)":
+            st.subheader(f"Correccion por objeto oscuro: {METHODS[method]}")
+            output = ScratchFile(suffix=".tif")
+            with image, image.open() as src:
+                band_map = dict(zip(range(1, src.count + 1), oli_bands))
+                center = src.height // 2, src.width // 2
+                # Dark objects from streaming DN histograms (one pass, no sort)
+                try:
+                    histograms = dn_histograms(src, band_map)
+                    dark_dns = {band: dark_object_dn(h) for band, h in zip(oli_bands, histograms)}
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+                histogram_time = time.perf_counter() - started
+                dos_scene(src, output.path, band_map, mtl, method, dark_dns, on_window=on_window)
+                scene_time = time.perf_counter() - started
+
+                with rasterio.open(output.path) as dst:
+                    sample = dst.read(window=((center[0], center[0] + 1), (center[1], center[1] + 1)))[:, 0, 0]
+                samples = sample_dn(src, band_map) if compare else None
+                previews = [read_preview(output.path, band=k + 1) for k in range(len(oli_bands))]
+            st.table(pd.DataFrame({
+                "Banda": [f"B{band} - {OLI_BANDS[band][0]}" for band in oli_bands],
+                "DN del objeto oscuro": [dark_dns[band] for band in oli_bands],
+                f"Reflectancia {method} (pixel central)": sample,
+            }))
+            report_usage(started, first_result[0], uploaded_image.size, os.path.getsize(output.path))
+            st.write(f"Histogramas: {histogram_time:.2f} s, escena corregida: {scene_time:.2f} s")
+
+            if compare:
+                # Accuracy against the 6S table on a regular grid of pixels, to choose by cost
+                lut_started = time.perf_counter()
+                params = dict(DEFAULT_ATMOSPHERE, aot550=aot_550, solar_z=solar_zenith,
+                              month=date.month, day=date.day)
+                lut = build_lut(params, oli_bands, mtl.gains(oli_bands), runner=RUNNERS[runner_name])
+                comparison = compare_methods(samples, mtl, dark_dns, lut, aot_550)
+                st.subheader("Comparacion con la tabla LUT de 6S")
+                st.caption(f"{len(next(iter(samples.values())))} pixeles de muestra; tabla LUT ({runner_name}) "
+                           f"en {time.perf_counter() - lut_started:.2f} s")
+                st.dataframe(comparison.style.format({"Sesgo": "{:+.4f}", "Error absoluto medio": "{:.4f}",
+                                                      "RMSE": "{:.4f}"}))
+                st.bar_chart(comparison.pivot(index="Banda", columns="Metodo", values="Error absoluto medio"))
+
+            st.header("4. Visualizacion")
+            for k, tab in enumerate(st.tabs([f"B{band}" for band in oli_bands])):
+                with tab:
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    im = ax.imshow(previews[k], cmap='gray', vmin=0, vmax=0.4)
+                    ax.set_title(f"Reflectancia {method} de la banda {oli_bands[k]}")
+                    plt.colorbar(im, ax=ax)
+                    st.pyplot(fig)
+            with open(output.path, "rb") as f:
+                st.download_button(f"Descargar reflectancia {method} (GeoTIFF)", data=f,
+                                   file_name=f"reflectancia_{method.lower()}.tif", mime="image/tiff")
+            st.stop()
+
+        if mode == "Escena completa (tabla LUT de 6S)":
+            st.subheader("Correccion de la escena completa con una tabla LUT")
+            gains = mtl.gains(oli_bands)
+            params = dict(DEFAULT_ATMOSPHERE, aot550=aot_550, solar_z=solar_zenith,
+                          month=date.month, day=date.day)
+
+            # One 6S run per band and radiance node (and AOT), in parallel and cached on disk
+            progress = st.progress(0.0, text="Ejecutando 6S sobre la rejilla de radiancias...")
+            lut = build_lut(params, oli_bands, gains,
+                            aots=[0.05, 0.1, 0.2, 0.3, 0.5] if aot_grid else None,
+                            runner=RUNNERS[runner_name],
+                            on_progress=lambda done, total: progress.progress(done / total))
+            progress.empty()
+
+            output = ScratchFile(suffix=".tif")
+            with image, image.open() as src:
+                center = src.height // 2, src.width // 2
+                correct_scene(src, output.path, dict(zip(range(1, src.count + 1), oli_bands)), gains, lut, aot_550,
+                              on_window=on_window)
+
+                with rasterio.open(output.path) as dst:
+                    sample = dst.read(window=((center[0], center[0] + 1), (center[1], center[1] + 1)))[:, 0, 0]
+                previews = [read_preview(output.path, band=k + 1) for k in range(len(oli_bands))]
+            st.table(pd.DataFrame({
+                "Banda": [f"B{band} - {OLI_BANDS[band][0]}" for band in oli_bands],
+                "Reflectancia de superficie (pixel central)": sample,
+            }))
+            report_usage(started, first_result[0], uploaded_image.size, os.path.getsize(output.path))
+            st.success("Correction completed! ✨")
+
+            st.header("4. Visualizacion")
+            for k, tab in enumerate(st.tabs([f"B{band}" for band in oli_bands])):
+                with tab:
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    im = ax.imshow(previews[k], cmap='gray', vmin=0, vmax=0.4)
+                    ax.set_title(f"Reflectancia de superficie de la banda {oli_bands[k]}")
+                    plt.colorbar(im, ax=ax)
+                    st.pyplot(fig)
+            with open(output.path, "rb") as f:
+                st.download_button("Descargar reflectancia de superficie (GeoTIFF)", data=f,
+                                   file_name="reflectancia_superficie.tif", mime="image/tiff")
+            st.stop()
+
         # --- `Py6S` Configuration ---
         st.subheader("Configuracion del Modelo Py6S")
         s = SixS()
@@ -67,13 +226,13 @@ if st.button("Run Atmospheric Correction"):
         s.geometry = Geometry.User()
         s.geometry.solar_z = solar_zenith
         s.geometry.view_z = 0  # Assuming nadir view
-        s.geometry.month = datetime.datetime.strptime(acquisition_date_str, '%Y-%m-%d').month
-        s.geometry.day = datetime.datetime.strptime(acquisition_date_str, '%Y-%m-%d').day
+        s.geometry.month = date.month
+        s.geometry.day = date.day
         
         # Set atmospheric conditions
         #s.aero_profile = AeroProfile.PredefinedType(AeroProfile.types[aero_profile])
         s.aero_profile = AeroProfile.PredefinedType(1)
-        s.aot550 = 0.1 #aot_550
+        s.aot550 = aot_550
         #s.atmos_profile = AtmosProfile.PredefinedType(AtmosProfile.types[atmos_profile])
         s.atmos_profile = AtmosProfile.UserWaterAndOzone(0.22, 1.97)
         
@@ -87,12 +246,13 @@ if st.button("Run Atmospheric Correction"):
         # --- Process and Visualize a Single Band (e.g., Band 4 - Red) ---
         st.subheader("Ejecutando la correccion de la Banda 4 (Red)...")
         
-        with rasterio.open("uploaded_image.TIF") as src:
-            band4_data = src.read(1) # Assuming Band 4 is the red band
-        
-        # Get a single pixel for demonstration (e.g., center of the image)
-        pixel_row, pixel_col = band4_data.shape[0] // 2, band4_data.shape[1] // 2
-        dn_value = band4_data[pixel_row, pixel_col]
+        with image, image.open() as src:
+            # Get a single pixel for demonstration (e.g., center of the image),
+            # read alone; the band itself is only read decimated for display
+            pixel_row, pixel_col = src.height // 2, src.width // 2
+            dn_value = src.read(1, window=((pixel_row, pixel_row + 1), (pixel_col, pixel_col + 1)))[0, 0] # Assuming Band 4 is the red band
+            first_result.append(time.perf_counter())
+            band4_data = read_preview(image.name)
         
         # Convert DN to TOA Radiance
         radiance = dn_value * rad_mult_band4 + rad_add_band4
@@ -107,6 +267,7 @@ if st.button("Run Atmospheric Correction"):
         surface_reflectance = s.outputs.atmos_corrected_reflectance_lambertian
         
         st.write(f"**Calculated Surface Reflectance for this pixel:** **{surface_reflectance:.4f}**")
+        report_usage(started, first_result[0], uploaded_image.size, band4_data.nbytes, "Vista previa")
         st.success("Correction completed! ✨")
         
         # --- Visualization Section ---
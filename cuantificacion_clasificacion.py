@@ -1,8 +1,9 @@
 import streamlit as st
-import numpy as np
 import pandas as pd
 import rasterio as rio
-from io import BytesIO
+from rasterio.io import MemoryFile
+from class_area import class_areas
+from zonal_stats import DEFAULT_ZONES, read_zones, zone_grid, zonal_class_counts
 
 # --- Configuration ---
 HECTARE_CONVERSION = 0.0001  # 1 square meter = 0.0001 hectares
@@ -13,56 +14,36 @@ def calculate_area(uploaded_file, class_mapping):
     area and percentage in hectares.
     """
     try:
-        # Read the file-like object using rasterio
-        with rio.open(uploaded_file) as src:
-            # 1. Read the Classified Image Data
-            image_data = src.read(1)  # Read the first band (assuming single-band classification)
-
-            # 2. Get Pixel Resolution (Ground Sampling Distance)
-            # Assuming square pixels for simplicity. `src.res[0]` is the width resolution.
-            # Area of one pixel in square meters (m²).
-            pixel_area_sqm = src.res[0] * src.res[1]
-
-            # 3. Count Pixels per Class
-            # np.unique returns unique values and their counts
-            unique_classes, counts = np.unique(image_data, return_counts=True)
-            
-            # Remove class 0 (often NoData or background, if present)
-            if 0 in unique_classes:
-                idx_zero = np.where(unique_classes == 0)[0][0]
-                unique_classes = np.delete(unique_classes, idx_zero)
-                counts = np.delete(counts, idx_zero)
-
-            total_pixels = counts.sum()
-            total_area_sqm = total_pixels * pixel_area_sqm
-            total_area_ha = total_area_sqm * HECTARE_CONVERSION
-
-            # 4. Calculate Area and Percentage for each class
-            results = []
-            for class_value, pixel_count in zip(unique_classes, counts):
-                class_name = class_mapping.get(int(class_value), f"Class {int(class_value)}")
-                
-                # Pixel count
-                pixels = int(pixel_count)
-
-                # Area calculation
-                area_sqm = pixel_count * pixel_area_sqm
-                area_ha = area_sqm * HECTARE_CONVERSION
-                
-                # Percentage calculation
-                percentage = (pixel_count / total_pixels) * 100
-
-                results.append({
-                    "Valor Clase": int(class_value),
-                    "Nombre Clase": class_name,
-                    "Pixeles": pixels,
-                    "Area (metros2)": area_sqm,
-                    "Area (Hectareas)": area_ha,
-                    "Porcentaje (%)": percentage
-                })
-
-            df = pd.DataFrame(results)
-            return df, total_area_ha
+        # GDAL reads the upload buffer in place (no extra copy of the file)
+        with MemoryFile(uploaded_file.getbuffer()) as memfile, memfile.open() as src:
+            # 1. Count Pixels and Area (m²) per Class
+            # np.bincount over the raster block windows: one linear pass, memory
+            # bounded by the window size (first band, single-band classification).
+            # Geographic CRSs (e.g. EPSG:4326) weight each pixel by the geodesic
+            # area of its row; projected ones use the cell size in metres.
+            unique_classes, counts, area_sqm = class_areas(src, band=1)
+            if src.crs is not None and src.crs.is_geographic:
+                st.caption("CRS geografico: areas geodesicas de los pixeles calculadas por fila (latitud).")
+
+        # Remove class 0 (often NoData or background, if present)
+        keep = unique_classes != 0
+        unique_classes, counts, area_sqm = unique_classes[keep], counts[keep], area_sqm[keep]
+
+        total_area_sqm = area_sqm.sum()
+        total_area_ha = total_area_sqm * HECTARE_CONVERSION
+
+        # 2. Calculate Area and Percentage for each class
+        if len(counts) == 0:
+            return pd.DataFrame(), total_area_ha
+        df = pd.DataFrame({
+            "Valor Clase": unique_classes.astype(int),
+            "Nombre Clase": [class_mapping.get(int(v), f"Class {int(v)}") for v in unique_classes],
+            "Pixeles": counts.astype(int),
+            "Area (metros2)": area_sqm,
+            "Area (Hectareas)": area_sqm * HECTARE_CONVERSION,
+            "Porcentaje (%)": (area_sqm / total_area_sqm) * 100,
+        })
+        return df, total_area_ha
 
     except rio.RasterioIOError:
         st.error("Error: El archivo cargado no es un archivo GeoTIFF o raster válido.")
@@ -71,6 +52,23 @@ def calculate_area(uploaded_file, class_mapping):
         st.error(f"Se produjo un error inesperado: {e}")
         return None, None
 
+def calculate_zonal_area(uploaded_file, class_mapping, zones, zones_key, label_column):
+    """
+    Per-zone class areas: the polygons are rasterized once on the raster grid
+    and (zone, class) pixel counts are accumulated per window.
+    """
+    with MemoryFile(uploaded_file.getbuffer()) as memfile, memfile.open() as src:
+        grid = zone_grid(src, zones, zones_key, label_column)
+        df = zonal_class_counts(src, grid)
+
+    # Class 0 is NoData/background, as in calculate_area
+    df = df[df["Valor Clase"] != 0].reset_index(drop=True)
+    df.insert(2, "Nombre Clase", [class_mapping.get(int(v), f"Class {int(v)}") for v in df["Valor Clase"]])
+    df["Area (Hectareas)"] = df.pop("Area (metros2)") * HECTARE_CONVERSION
+    df["Porcentaje de la zona (%)"] = df["Area (Hectareas)"] / df.groupby("Zona")["Area (Hectareas)"].transform("sum") * 100
+    return df
+
+
 # --- Streamlit App Interface ---
 def main():
     st.set_page_config(layout="wide", page_title="Classified Image Area Quantifier")
@@ -102,6 +100,12 @@ def main():
 
     st.sidebar.json(class_mapping)
 
+    # Optional per-polygon quantification (campusUT by default)
+    zonal_enabled = st.sidebar.checkbox("Cuantificar por zonas (poligonos)")
+    zones_file = None
+    if zonal_enabled:
+        zones_file = st.sidebar.file_uploader("Poligonos (GeoJSON/GPKG, opcional)", type=["geojson", "gpkg"])
+
     # File Uploader
     uploaded_file = st.file_uploader(
         "Subir un archivo ráster GeoTIFF clasificado (.tif)", 
@@ -109,12 +113,8 @@ def main():
     )
 
     if uploaded_file is not None:
-        # Pass the file content to the calculation function
-        # We need to use BytesIO to let rasterio read the uploaded file from memory
-        file_content = BytesIO(uploaded_file.read())
-        
-        # Calculate results
-        results_df, total_area_ha = calculate_area(file_content, class_mapping)
+        # Calculate results (the upload is read from memory, without copying it)
+        results_df, total_area_ha = calculate_area(uploaded_file, class_mapping)
 
         if results_df is not None:
             st.success("Análisis completo!")
@@ -150,5 +150,13 @@ def main():
                 mime='text/csv',
             )
 
+            # --- Zonal Quantification ---
+            if zonal_enabled:
+                st.subheader("Cuantificacion por zonas")
+                zones_key = zones_file.file_id if zones_file else DEFAULT_ZONES
+                zones, label_column = read_zones(zones_file or DEFAULT_ZONES)
+                zonal_df = calculate_zonal_area(uploaded_file, class_mapping, zones, zones_key, label_column)
+                st.dataframe(zonal_df, use_container_width=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Configuration ---
+SAMPLE_PIXELS = 262_144   # Pixels of the regular subsample used for float percentiles
+CACHE_SIZE = 64           # Stretch parameters kept in memory
+
+# (key, mode, p_low, p_high, per_band) -> (low, high), shared by all sessions
+_PARAMS_CACHE = OrderedDict()
+_PARAMS_LOCK = threading.Lock()
+
+
+def _as_bands(img):
+    """(pixels, bands) view of a (rows, cols) or (rows, cols, bands) array."""
+    img = np.asarray(img)
+    return img.reshape(-1, 1) if img.ndim == 2 else img.reshape(-1, img.shape[-1])
+
+
+def _histogram_percentiles(values, qs):
+    """Exact percentiles ('lower' value) of an integer array from np.bincount."""
+    offset = int(values.min())
+    counts = np.bincount((values.astype(np.int64) - offset).ravel())
+    cdf = np.cumsum(counts)
+    targets = np.asarray(qs) / 100 * (cdf[-1] - 1)
+    return np.searchsorted(cdf, targets, side="right").astype(np.float64) + offset
+
+
+def _sample(values):
+    """Regular subsample of the rows (pixels) of a (pixels, bands) array."""
+    step = max(1, len(values) // SAMPLE_PIXELS)
+    return values[::step]
+
+
+def stretch_params(img, p_low=2, p_high=98, mode="percentile", per_band=False):
+    """
+    (low, high) display limits, arrays with one value per band (or a single
+    value broadcast to all bands when per_band is False).
+
+    mode "minmax" uses the exact min/max; "percentile" reads the p_low and
+    p_high percentiles from an integer histogram (np.bincount, integer
+    images) or from a regular subsample of SAMPLE_PIXELS pixels (float
+    images), instead of sorting the whole array.
+    """
+    values = _as_bands(img)
+    columns = [values[:, b] for b in range(values.shape[1])] if per_band else [values]
+    low, high = [], []
+    for column in columns:
+        finite = column if column.dtype.kind in "iub" else column[np.isfinite(column)]
+        if finite.size == 0:
+            low.append(0.0)
+            high.append(1.0)
+        elif mode == "minmax":
+            low.append(float(finite.min()))
+            high.append(float(finite.max()))
+        elif finite.dtype.kind in "iub" and int(finite.max()) - int(finite.min()) <= 2 ** 16:
+            bottom, top = _histogram_percentiles(finite, [p_low, p_high])
+            low.append(bottom)
+            high.append(top)
+        else:
+            bottom, top = np.percentile(_sample(finite.ravel()), [p_low, p_high])
+            low.append(float(bottom))
+            high.append(float(top))
+    n_bands = values.shape[1]
+    low, high = np.asarray(low), np.asarray(high)
+    if not per_band:
+        low, high = np.repeat(low, n_bands), np.repeat(high, n_bands)
+    return low, high
+
+
+def cached_params(key, img, p_low=2, p_high=98, mode="percentile", per_band=False):
+    """stretch_params kept per image key (e.g. file id + bands) across reruns."""
+    cache_key = (key, mode, p_low, p_high, per_band)
+    with _PARAMS_LOCK:
+        if cache_key in _PARAMS_CACHE:
+            _PARAMS_CACHE.move_to_end(cache_key)
+            return _PARAMS_CACHE[cache_key]
+    # Computed outside the lock so other sessions are not blocked meanwhile
+    params = stretch_params(img, p_low, p_high, mode, per_band)
+    with _PARAMS_LOCK:
+        _PARAMS_CACHE[cache_key] = params
+        while len(_PARAMS_CACHE) > CACHE_SIZE:
+            _PARAMS_CACHE.popitem(last=False)
+    return params
+
+
+def apply_stretch(img, params):
+    """
+    uint8 display image. Small integer images go through a per-band lookup
+    table (one gather per band); other images are scaled, clipped and cast
+    in place on a single float32 buffer.
+    """
+    img = np.asarray(img)
+    low, high = params
+    scale = 255.0 / np.where(high > low, high - low, 1.0)
+    squeeze = img.ndim == 2
+    values = img[..., None] if squeeze else img
+
+    if values.dtype.kind in "ub" and values.dtype.itemsize <= 2:
+        levels = np.arange(2 ** (8 * values.dtype.itemsize), dtype=np.float32)
+        out = np.empty(values.shape, dtype=np.uint8)
+        for b in range(values.shape[-1]):
+            lut = np.clip((levels - low[b]) * scale[b], 0, 255).astype(np.uint8)
+            np.take(lut, values[..., b], out=out[..., b])
+    else:
+        buffer = np.subtract(values, low.astype(np.float32), dtype=np.float32)
+        buffer *= scale.astype(np.float32)
+        np.clip(buffer, 0, 255, out=buffer)
+        np.nan_to_num(buffer, copy=False, nan=0.0)
+        out = buffer.astype(np.uint8)
+    return out[..., 0] if squeeze else out
+
+
+def stretch(img, p_low=2, p_high=98, mode="percentile", per_band=False, key=None):
+    """Stretch an image to uint8 for display; key caches its parameters."""
+    if key is None:
+        params = stretch_params(img, p_low, p_high, mode, per_band)
+    else:
+        params = cached_params(key, img, p_low, p_high, mode, per_band)
+    return apply_stretch(img, params)
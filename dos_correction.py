@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from landsat_mtl import scale_scene
+from sixs_lut import OLI_CENTERS, OLI_ESUN, sun_distance
+from veg_index_engine import BufferPool, iter_windows, window_shape
+
+# --- Configuration ---
+DARK_FRACTION = 1e-4    # Share of the valid pixels at or below the dark-object DN
+DARK_REFLECTANCE = 0.01 # Assumed reflectance of the dark object (1 %)
+N_LEVELS = 2 ** 16      # Histogram bins (16-bit DN)
+SAMPLE_GRID = 32        # Sample pixels per side for the comparison with 6S
+
+METHODS = {
+    "DOS1": "DOS1 (transmitancias = 1)",
+    "DOS4": "DOS4 (transmitancias de Rayleigh y luz difusa)",
+    "COST": "COST (transmitancia = cos del cenit solar)",
+}
+
+
+def dn_histograms(src, band_map):
+    """
+    (bands, 65536) DN histograms of the mapped bands, accumulated window by
+    window with np.bincount (no full read and no sort). The bands must be
+    unsigned integers of at most 16 bits, the range of the uint16 buffer.
+    """
+    for file_band in band_map:
+        dtype = np.dtype(src.dtypes[file_band - 1])
+        if dtype.kind != "u" or dtype.itemsize > 2:
+            raise ValueError("La correccion por objeto oscuro requiere una imagen en DN enteros sin signo "
+                             f"de hasta 16 bits (la banda {file_band} es {dtype.name}).")
+    histograms = np.zeros((len(band_map), N_LEVELS), dtype=np.int64)
+    pool = BufferPool(dtype=np.uint16)
+    for window in iter_windows(src):
+        dn = pool.get("dn", window_shape(window))
+        for k, file_band in enumerate(band_map):
+            src.read(file_band, window=window, out=dn)
+            histograms[k] += np.bincount(dn.ravel(), minlength=N_LEVELS)
+    return histograms
+
+
+def dark_object_dn(histogram, fraction=DARK_FRACTION):
+    """Lowest non-zero DN with at least `fraction` of the valid pixels at or below it."""
+    counts = histogram.copy()
+    counts[0] = 0  # fill
+    total = counts.sum()
+    if total == 0:
+        raise ValueError("La banda no tiene pixeles validos.")
+    return int(np.searchsorted(np.cumsum(counts), max(1, fraction * total)))
+
+
+def solar_irradiance(mtl, band):
+    """
+    Exo-atmospheric irradiance (W/m2/um) of a band: from the MTL radiance and
+    reflectance maxima when present (pi d^2 Lmax / rho_max), else the
+    tabulated OLI value.
+    """
+    radiance = mtl.values.get(f"RADIANCE_MAXIMUM_BAND_{band}")
+    reflectance = mtl.values.get(f"REFLECTANCE_MAXIMUM_BAND_{band}")
+    if radiance and reflectance:
+        return np.pi * earth_sun_distance(mtl) ** 2 * radiance / reflectance
+    return OLI_ESUN[band]
+
+
+def earth_sun_distance(mtl):
+    if mtl.earth_sun_distance is not None:
+        return mtl.earth_sun_distance
+    return sun_distance(mtl.date_acquired.month, mtl.date_acquired.day)
+
+
+def rayleigh_depth(wavelength):
+    """Rayleigh optical thickness at a wavelength (um)."""
+    return 0.008569 * wavelength ** -4 * (1 + 0.0113 * wavelength ** -2 + 0.00013 * wavelength ** -4)
+
+
+def dos_coefficients(mtl, band, dark_dn, method="DOS1", view_z=0.0):
+    """
+    (gain, offset) of DN -> surface reflectance for a band:
+
+        rho = pi (L - Lp) d^2 / (Tv (ESUN cos(sz) Tz + Edown)),  L = DN * M + A
+
+    with the path radiance Lp = Lmin - L1% taken from the dark object
+    (radiance of dark_dn minus that of a 1 % reflector). DOS1: Tv = Tz = 1,
+    Edown = 0. COST: Tz = cos(sz). DOS4: Rayleigh transmittances and
+    Edown = pi Lp (solved in closed form).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Metodo desconocido: {method}")
+    mult, add = mtl.gains([band])[band]
+    mu_s = np.cos(np.radians(mtl.solar_zenith))
+    d2 = earth_sun_distance(mtl) ** 2
+    esun = solar_irradiance(mtl, band)
+    l_min = dark_dn * mult + add
+
+    if method == "DOS4":
+        tau = rayleigh_depth(OLI_CENTERS[band])
+        t_v, t_z = np.exp(-tau / np.cos(np.radians(view_z))), np.exp(-tau / mu_s)
+        # Lp = Lmin - DARK_REFLECTANCE Tv (ESUN mu_s Tz + pi Lp) / (pi d^2)
+        path = ((l_min - DARK_REFLECTANCE * t_v * esun * mu_s * t_z / (np.pi * d2))
+                / (1 + DARK_REFLECTANCE * t_v / d2))
+        e_down = np.pi * path
+    else:
+        t_v, t_z, e_down = 1.0, mu_s if method == "COST" else 1.0, 0.0
+        path = l_min - DARK_REFLECTANCE * t_v * esun * mu_s * t_z / (np.pi * d2)
+
+    scale = np.pi * d2 / (t_v * (esun * mu_s * t_z + e_down))
+    return mult * scale, (add - path) * scale
+
+
+def dos_scene(src, dst_path, band_map, mtl, method="DOS1", dark_dns=None, on_window=None):
+    """
+    Scene-wide dark-object correction: one pass for the DN histograms (unless
+    dark_dns are given) and one windowed float32 pass applying the per-band
+    linear map, clipped at 0. Returns (dst_path, {band: dark DN}).
+    """
+    if dark_dns is None:
+        histograms = dn_histograms(src, band_map)
+        dark_dns = {band: dark_object_dn(h) for band, h in zip(band_map.values(), histograms)}
+    coefficients = {band: dos_coefficients(mtl, band, dark_dns[band], method) for band in band_map.values()}
+    scale_scene(src, dst_path, band_map, coefficients, f"SR_{method}", minimum=0.0, on_window=on_window)
+    return dst_path, dark_dns
+
+
+def sample_dn(src, band_map, size=SAMPLE_GRID):
+    """{band: DN} on a regular size x size grid of pixels (decimated nearest read); fill excluded."""
+    samples = {}
+    for file_band, band in band_map.items():
+        samples[band] = src.read(file_band, out_shape=(size, size)).ravel().astype(np.float64)
+    valid = np.all([values > 0 for values in samples.values()], axis=0)
+    return {band: values[valid] for band, values in samples.items()}
+
+
+def compare_methods(samples, mtl, dark_dns, lut, aot=None, methods=tuple(METHODS)):
+    """
+    Bias, mean absolute error and RMSE of each dark-object method against
+    the 6S lookup table on sampled DNs, per band.
+    """
+    rows = []
+    for band, dn in samples.items():
+        mult, add = mtl.gains([band])[band]
+        reference = lut.correct(band, dn * mult + add, aot).astype(np.float64)
+        for method in methods:
+            gain, offset = dos_coefficients(mtl, band, dark_dns[band], method)
+            difference = np.maximum(dn * gain + offset, 0) - reference
+            rows.append({
+                "Metodo": method,
+                "Banda": f"B{band}",
+                "Sesgo": difference.mean(),
+                "Error absoluto medio": np.abs(difference).mean(),
+                "RMSE": np.sqrt((difference ** 2).mean()),
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,312 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# --- Configuration ---
+DN_SCALE = 1000.0   # Simulated digital numbers are uniform in [0, DN_SCALE) before the gradient
+WRITE_BLOCK_BYTES = 64 * 2 ** 20   # Size of the row blocks copied by write_cube
+
+# Storage order of the (row, col, band) axes for each interleave
+INTERLEAVES = {
+    "bsq": (2, 0, 1),   # band, line, sample: one band is contiguous
+    "bil": (0, 2, 1),   # line, band, sample
+    "bip": (0, 1, 2),   # line, sample, band: one spectrum is contiguous
+}
+# ENVI "data type" codes
+ENVI_TYPES = {"uint8": 1, "int16": 2, "int32": 3, "float32": 4, "float64": 5, "uint16": 12}
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _uniform(counter, seed):
+    """
+    Uniform [0, 1) float32 values from uint64 counters (splitmix64 hash), so
+    any element of the cube can be generated independently of the others.
+    """
+    with np.errstate(over="ignore"):
+        x = counter * _GOLDEN + np.uint64(seed) * _MIX_2
+        x ^= x >> np.uint64(30)
+        x *= _MIX_1
+        x ^= x >> np.uint64(27)
+        x *= _MIX_2
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(40)).astype(np.float32) * np.float32(2.0 ** -24)
+
+
+def _indices(key, size):
+    """Index array and whether the axis is dropped (integer key)."""
+    if isinstance(key, (int, np.integer)):
+        if not -size <= key < size:
+            raise IndexError(f"indice {key} fuera de rango para tamano {size}")
+        return np.array([key % size]), True
+    if isinstance(key, slice):
+        return np.arange(size)[key], False
+    index = np.asarray(key)
+    if index.dtype == bool:
+        index = np.nonzero(index)[0]
+    return np.arange(size)[index], False
+
+
+def _expand_key(key):
+    """Key as a (rows, cols, bands) tuple, expanding Ellipsis and missing axes."""
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        position = key.index(Ellipsis)
+        fill = (slice(None),) * (3 - len(key) + 1)
+        key = key[:position] + fill + key[position + 1:]
+    return key + (slice(None),) * (3 - len(key))
+
+
+class _Cube:
+    """
+    Common interface of the cubes: numpy-style indexing cube[rows, cols,
+    bands] with integers, slices and integer/boolean arrays per axis (arrays
+    select the outer product, one per axis). Subclasses implement
+    read(rows, cols, bands) for index arrays and return (R, C, B) arrays.
+    """
+
+    ndim = 3
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        key = _expand_key(key)
+        (r, drop_r), (c, drop_c), (b, drop_b) = (_indices(k, n) for k, n in zip(key, self.shape))
+        return self.read(r, c, b)[(0 if drop_r else slice(None),
+                                   0 if drop_c else slice(None),
+                                   0 if drop_b else slice(None))]
+
+    def window(self, row_slice, col_slice, bands=slice(None)):
+        return self[row_slice, col_slice, bands]
+
+    def spectrum(self, row, col):
+        return self[row, col, :]
+
+    def band(self, band):
+        return self[:, :, band]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:, :, :]
+        return values if dtype is None else values.astype(dtype)
+
+
+class SyntheticCube(_Cube):
+    """
+    Lazy (rows, cols, bands) float32 cube with the pattern of
+    simulate_hsi_data: uniform noise scaled by a diagonal gradient
+    (1 + (i + j) / (rows + cols)). Values depend only on the seed and the
+    element position, so any window or band subset is generated on demand,
+    always with the same values, and the full cube is never allocated.
+
+    """
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, rows=1000, cols=1000, bands=200, seed=0):
+        self.shape = (rows, cols, bands)
+        self.seed = seed
+
+    def read(self, rows, cols, bands):
+        """Values for the outer product of row, column and band indices."""
+        rows = np.asarray(rows, dtype=np.uint64)[:, None, None]
+        cols = np.asarray(cols, dtype=np.uint64)[None, :, None]
+        bands = np.asarray(bands, dtype=np.uint64)[None, None, :]
+        n_cols, n_bands = np.uint64(self.shape[1]), np.uint64(self.shape[2])
+        values = _uniform((rows * n_cols + cols) * n_bands + bands, self.seed)
+        values *= np.float32(DN_SCALE)
+        values *= gradient(rows, cols, self.shape[0], self.shape[1])
+        return values
+
+
+def gradient(rows, cols, n_rows, n_cols):
+    """Diagonal brightness gradient 1 + (i + j) / (rows + cols), broadcast."""
+    return (1 + (rows.astype(np.float32) + cols.astype(np.float32)) / np.float32(n_rows + n_cols))
+
+
+class CubeStore(_Cube):
+    """
+    Cube kept on disk as raw bytes (np.memmap) plus a JSON header with ENVI
+    field names (samples, lines, bands, data type, interleave, byte order,
+    wavelength). Indexing reads only the bytes the request touches, so the
+    cube may be larger than RAM:
+
+    - interleave "bsq" makes a band a contiguous block (cheap composites),
+      "bip" makes a pixel spectrum contiguous (cheap profiles), "bil" is in
+      between.
+    - chunks=(rows, cols) stores the cube as tiles, each tile contiguous with
+      the chosen interleave inside, so small windows touch few pages in any
+      direction. Edge tiles are padded.
+
+    Unchunked stores also get an ENVI .hdr next to the data file. The JSON
+    header is written last (see write_cube), so a store whose header exists
+    is complete; open also checks the data size against the header.
+    """
+
+    def __init__(self, path, header, mode="r"):
+        self.path = path
+        self.header = header
+        self.shape = (header["lines"], header["samples"], header["bands"])
+        self.dtype = np.dtype(header["dtype"])
+        self.interleave = header["interleave"]
+        self.chunks = tuple(header["chunks"]) if header.get("chunks") else None
+        self.wavelengths = np.asarray(header.get("wavelength") or np.arange(self.shape[2]), dtype=np.float64)
+
+        order = INTERLEAVES[self.interleave]
+        self._to_cube = tuple(np.argsort(order))
+        if self.chunks is None:
+            storage = tuple(self.shape[axis] for axis in order)
+        else:
+            tile = (self.chunks[0], self.chunks[1], self.shape[2])
+            self._grid = (-(-self.shape[0] // tile[0]), -(-self.shape[1] // tile[1]))
+            storage = self._grid + tuple(tile[axis] for axis in order)
+        if mode != "w+" and os.path.getsize(path) != int(np.prod(storage)) * self.dtype.itemsize:
+            raise ValueError(f"El cubo {path} esta incompleto: su tamaño no coincide con el encabezado.")
+        self._data = np.memmap(path, dtype=self.dtype, mode=mode, shape=storage)
+
+    # --- Creation ---
+    @classmethod
+    def create(cls, path, shape, dtype=np.float32, interleave="bsq", chunks=None, wavelengths=None):
+        """
+        Creates an empty data file ready to be written. The headers are
+        written by save_header once the data is complete.
+        """
+        if interleave not in INTERLEAVES:
+            raise ValueError(f"Organizacion desconocida: {interleave}")
+        rows, cols, bands = shape
+        dtype = np.dtype(dtype)
+        header = {
+            "samples": cols,
+            "lines": rows,
+            "bands": bands,
+            "header offset": 0,
+            "data type": ENVI_TYPES.get(dtype.name),
+            "interleave": interleave,
+            "byte order": 0 if dtype.byteorder in "<=|" else 1,
+            "wavelength units": "Nanometers",
+            "wavelength": None if wavelengths is None else [float(w) for w in wavelengths],
+            "dtype": dtype.name,
+            "chunks": list(chunks) if chunks else None,
+        }
+        return cls(path, header, mode="w+")
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        with open(header_path(path)) as f:
+            header = json.load(f)
+        return cls(path, header, mode=mode)
+
+    # --- Access ---
+    def _tile(self, tile_row, tile_col):
+        """(rows, cols, bands) view of one tile."""
+        return self._data[tile_row, tile_col].transpose(self._to_cube)
+
+    def __getitem__(self, key):
+        key = _expand_key(key)
+        n_arrays = sum(not isinstance(k, (int, np.integer, slice)) for k in key)
+        if self.chunks is None and n_arrays <= 1:
+            # Basic slicing on the memmap view: only the touched pages are read
+            return np.array(self._data.transpose(self._to_cube)[key])
+        return super().__getitem__(key)
+
+    def read(self, rows, cols, bands):
+        if self.chunks is None:
+            return np.array(self._data.transpose(self._to_cube)[np.ix_(rows, cols, bands)])
+        out = np.empty((len(rows), len(cols), len(bands)), dtype=self.dtype)
+        tile_rows, tile_cols = rows // self.chunks[0], cols // self.chunks[1]
+        for tile_row in np.unique(tile_rows):
+            row_sel = np.nonzero(tile_rows == tile_row)[0]
+            local_rows = rows[row_sel] - tile_row * self.chunks[0]
+            for tile_col in np.unique(tile_cols):
+                col_sel = np.nonzero(tile_cols == tile_col)[0]
+                local_cols = cols[col_sel] - tile_col * self.chunks[1]
+                tile = self._tile(tile_row, tile_col)
+                out[np.ix_(row_sel, col_sel)] = tile[np.ix_(local_rows, local_cols, bands)]
+        return out
+
+    def write(self, row_start, values):
+        """Writes a (rows, cols, bands) block of whole rows starting at row_start."""
+        row_stop = row_start + len(values)
+        if self.chunks is None:
+            self._data.transpose(self._to_cube)[row_start:row_stop] = values
+            return
+        tile_rows, tile_cols = self.chunks
+        for tile_row in range(row_start // tile_rows, -(-row_stop // tile_rows)):
+            top = max(row_start, tile_row * tile_rows)
+            bottom = min(row_stop, (tile_row + 1) * tile_rows)
+            for tile_col in range(self._grid[1]):
+                left = tile_col * tile_cols
+                right = min(self.shape[1], left + tile_cols)
+                tile = self._tile(tile_row, tile_col)
+                tile[top - tile_row * tile_rows:bottom - tile_row * tile_rows, :right - left] = \
+                    values[top - row_start:bottom - row_start, left:right]
+
+    def flush(self):
+        self._data.flush()
+
+
+def header_path(path):
+    return f"{path}.json"
+
+
+def save_header(path, header):
+    """ENVI .hdr (unchunked stores), then the JSON header, replaced atomically."""
+    if not header.get("chunks"):
+        write_envi_header(path, header)
+    part = f"{header_path(path)}.{os.getpid()}.part"
+    with open(part, "w") as f:
+        json.dump(header, f)
+    os.replace(part, header_path(path))
+
+
+def write_envi_header(path, header):
+    """ENVI .hdr for unchunked stores, so other software can open the raw file."""
+    lines = ["ENVI"]
+    for key in ("samples", "lines", "bands", "header offset", "data type", "interleave", "byte order"):
+        lines.append(f"{key} = {header[key]}")
+    if header.get("wavelength"):
+        lines.append(f"wavelength units = {header['wavelength units']}")
+        lines.append("wavelength = {" + ", ".join(f"{w:g}" for w in header["wavelength"]) + "}")
+    with open(os.path.splitext(path)[0] + ".hdr", "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def write_cube(source, path, interleave="bsq", chunks=None, wavelengths=None):
+    """
+    Copies any cube (array, memmap, SyntheticCube...) into a CubeStore by
+    blocks of whole rows (aligned with the tiles), so it never needs the
+    whole cube in memory. The data is written under a temporary name and
+    moved into place once flushed, header last, so an interrupted write
+    never leaves a store that looks complete and concurrent writers of the
+    same path each publish a whole file.
+    """
+    rows, cols, bands = source.shape
+    fd, part = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                prefix=os.path.basename(path) + ".", suffix=".part")
+    os.close(fd)
+    try:
+        store = CubeStore.create(part, source.shape, source.dtype, interleave, chunks, wavelengths)
+        block_rows = max(1, WRITE_BLOCK_BYTES // (cols * bands * np.dtype(source.dtype).itemsize))
+        if chunks:
+            block_rows = max(chunks[0], block_rows // chunks[0] * chunks[0])
+        for start in range(0, rows, block_rows):
+            store.write(start, np.asarray(source[start:start + block_rows]))
+        store.flush()
+        header = store.header
+        del store   # releases the memmap before the file is moved
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    save_header(path, header)
+    return CubeStore.open(path)
@@ -1,7 +1,17 @@
+import os
+import tempfile
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image
+from hsi_cube import INTERLEAVES, CubeStore, SyntheticCube, header_path, write_cube
+from spectral_library import SpectralLibrary
+from spectral_matching import METHODS, match_cube
+from display_stretch import stretch
+from terrain import LAYERS, compute_terrain
+from lidar_grid import CHUNK_POINTS, Grid, grid_points, iter_point_csv, point_bounds
+from region_spectra import (DEFAULT_PERCENTILES, class_regions, grid_regions, parse_regions,
+                            region_statistics, statistics_frame)
 
 # --- Configuration and Setup ---
 
@@ -16,47 +26,187 @@ def simulate_hsi_data(rows=50, cols=50, bands=100):
     """Simulates a simple Hyperspectral Image cube."""
     # Create a dummy HSI cube with some spatial pattern
     hsi_data = np.random.rand(rows, cols, bands) * 1000
-    # Add a simple gradient to make it look less random
-    for i in range(rows):
-        for j in range(cols):
-            hsi_data[i, j, :] = hsi_data[i, j, :] * (1 + (i+j)/(rows+cols))
+    # Add a simple gradient to make it look less random (broadcast over bands)
+    i = np.arange(rows)[:, None, None]
+    j = np.arange(cols)[None, :, None]
+    hsi_data *= 1 + (i + j) / (rows + cols)
     return hsi_data.astype(np.float32)
 
-def simulate_lidar_data(rows=50, cols=50):
-    """Simulates a simple 2D LiDAR Elevation Map (Digital Surface Model - DSM)."""
-    # Create a dummy DSM with a peak in the center
-    x = np.linspace(-2, 2, rows)
-    y = np.linspace(-2, 2, cols)
-    X, Y = np.meshgrid(x, y)
-    # Z is elevation: a mountain-like structure
-    Z = 100 * np.exp(-(X**2 + Y**2) / 1.5) + np.random.rand(rows, cols) * 5
-    return Z.astype(np.float32)
+def simulate_lidar_points(n_points, extent=50.0, seed=0, chunksize=CHUNK_POINTS):
+    """
+    Simulates a classified LiDAR point cloud over an extent x extent area,
+    yielded in (x, y, z, class) chunks so it is never held whole: a
+    mountain-like ground (class 2) with buildings (6), tree crowns (5) and a
+    few noise returns (7).
+    """
+    layout = np.random.default_rng(seed)
+    # Buildings: (x0, y0, width, depth, height); trees: (x, y, radius, height)
+    buildings = np.column_stack([layout.uniform(0, 0.85, 4) * extent, layout.uniform(0, 0.85, 4) * extent,
+                                 layout.uniform(0.08, 0.15, (4, 2)) * extent, layout.uniform(5, 15, 4)])
+    trees = np.column_stack([layout.uniform(0, 1, (25, 2)) * extent,
+                             layout.uniform(0.02, 0.05, 25) * extent, layout.uniform(4, 20, 25)])
+    for k, start in enumerate(range(0, n_points, chunksize)):
+        rng = np.random.default_rng((seed, k))
+        n = min(chunksize, n_points - start)
+        x, y = rng.uniform(0, extent, n), rng.uniform(0, extent, n)
+        u, v = 4 * x / extent - 2, 4 * y / extent - 2
+        z = 100 * np.exp(-(u ** 2 + v ** 2) / 1.5) + rng.normal(0, 0.1, n)
+        classes = np.full(n, 2, dtype=np.uint8)
+        for x0, y0, width, depth, height in buildings:
+            roof = (x >= x0) & (x < x0 + width) & (y >= y0) & (y < y0 + depth)
+            z[roof] += height
+            classes[roof] = 6
+        for tx, ty, radius, height in trees:
+            d2 = ((x - tx) ** 2 + (y - ty) ** 2) / radius ** 2
+            # Part of the pulses cross the crown and reach the ground
+            crown = (d2 < 1) & (classes == 2) & (rng.random(n) < 0.7)
+            z[crown] += height * (1 - d2[crown]) * rng.uniform(0.7, 1.0, crown.sum())
+            classes[crown] = 5
+        noise = rng.random(n) < 0.001
+        z[noise] += rng.choice([-30.0, 60.0], noise.sum())
+        classes[noise] = 7
+        yield x, y, z, classes
+
+@st.cache_data
+def grid_lidar(source_key, _source=None, n_points=50_000, cellsize=1.0):
+    """
+    DSM, DTM and CHM gridded from a point cloud, streamed chunk by chunk:
+    the simulated cloud (n_points) or an uploaded CSV with x, y, z, class.
+    """
+    if _source is None:
+        grid = Grid((0.0, 0.0, 50.0, 50.0), cellsize)
+        surfaces = grid_points(simulate_lidar_points(n_points), grid)
+    else:
+        grid = Grid(point_bounds(iter_point_csv(_source)), cellsize)
+        surfaces = grid_points(iter_point_csv(_source), grid)
+    return surfaces
 
 # Load/Simulate Data
 @st.cache_data # Cache the data loading/simulation for performance
 def load_data():
-    """Load and return simulated HSI and LiDAR data."""
+    """Load and return simulated HSI data."""
     hsi = simulate_hsi_data()
-    lidar = simulate_lidar_data()
     # Create a wavelength list for the HSI
     wavelengths = np.linspace(400, 2500, hsi.shape[2]) # 400nm to 2500nm
-    return hsi, lidar, wavelengths
+    return hsi, wavelengths
+
+HSI_DATA, WAVELENGTHS = load_data()
+
+# Point clouds available in the LiDAR view (simulated, number of points)
+LIDAR_CLOUDS = {
+    "Nube simulada (50 mil puntos)": 50_000,
+    "Nube simulada (5 millones de puntos)": 5_000_000,
+    "Cargar CSV (x, y, z, clase)": None,
+}
+
+# Surfaces gridded from the points
+SURFACES = {
+    "dsm": "Modelo digital de superficie (DSM)",
+    "dtm": "Modelo digital de terreno (DTM)",
+    "chm": "Modelo de altura de dosel (CHM = DSM - DTM)",
+}
+
+# Cubes available in the HSI view: the small in-memory one, a large
+# synthetic cube generated window by window on demand (never allocated whole)
+# and a cube stored on disk, read through a memmap
+HSI_CUBES = {
+    "Simulado 50 x 50 x 100 (en memoria)": None,
+    "Sintetico 1000 x 1000 x 200 (bajo demanda)": ("lazy", (1000, 1000, 200)),
+    "En disco 512 x 512 x 200 (memmap)": ("disk", (512, 512, 200)),
+}
+DISK_TILE = (128, 128) # Tile size of the chunked layout
+
+@st.cache_resource
+def load_lazy_cube(rows, cols, bands):
+    cube = SyntheticCube(rows, cols, bands)
+    wavelengths = np.linspace(400, 2500, bands)
+    return cube, wavelengths
+
+@st.cache_resource
+def load_disk_cube(rows, cols, bands, interleave, chunked):
+    """
+    Opens the on-disk cube, writing it once from the synthetic cube (again
+    if the stored one is incomplete). write_cube publishes the file
+    atomically, so sessions sharing the path never see a partial cube.
+    """
+    name = f"hsi_{rows}x{cols}x{bands}_{interleave}{'_tiles' if chunked else ''}.raw"
+    path = os.path.join(tempfile.gettempdir(), name)
+    if os.path.exists(header_path(path)):
+        try:
+            store = CubeStore.open(path)
+            return store, store.wavelengths
+        except (ValueError, OSError):
+            pass
+    store = write_cube(SyntheticCube(rows, cols, bands), path, interleave,
+                       DISK_TILE if chunked else None, np.linspace(400, 2500, bands))
+    return store, store.wavelengths
+
+def get_hsi_cube(dataset, interleave="bsq", chunked=False):
+    """(cube, wavelengths) of the selected dataset."""
+    if HSI_CUBES[dataset] is None:
+        return HSI_DATA, WAVELENGTHS
+    kind, shape = HSI_CUBES[dataset]
+    if kind == "disk":
+        return load_disk_cube(*shape, interleave, chunked)
+    return load_lazy_cube(*shape)
+
+@st.cache_data
+def match_hsi(method, dataset, interleave="bsq", chunked=False):
+    """Best-match and score maps of the HSI cube against the sample library."""
+    cube, wavelengths = get_hsi_cube(dataset, interleave, chunked)
+    library = SpectralLibrary.sample()
+    # The simulated cube is in DN (0-2000); scale to reflectance-like values
+    best, score = match_cube(cube, wavelengths, library, method, scale=1 / 1000)
+    return best, score, library.names
+
+@st.cache_data
+def hsi_region_stats(dataset, interleave, chunked, source, spec, method):
+    """Per-region spectral statistics (cached per cube and region definition)."""
+    cube, wavelengths = get_hsi_cube(dataset, interleave, chunked)
+    if source == "Cuadricula":
+        regions = grid_regions(cube.shape, *spec)
+    elif source == "Clases de similitud":
+        best, _, names = match_hsi(method, dataset, interleave, chunked)
+        regions = class_regions(best.astype(np.int32) + 1, dict(enumerate(names, start=1)))
+    else:
+        regions = parse_regions(spec, cube.shape)
+    stats = region_statistics(cube, regions)
+    return [region.name for region in regions], stats, statistics_frame(regions, stats, wavelengths)
+
+@st.cache_data
+def terrain_layers(dsm_key, _dsm, cellsize=1.0):
+    """All terrain derivatives of a DSM, computed once per DSM (tile-wise)."""
+    return compute_terrain(_dsm, cellsize)
 
-HSI_DATA, LIDAR_DATA, WAVELENGTHS = load_data()
+# Colormap of each terrain layer
+TERRAIN_CMAPS = {
+    "hillshade": "gray",
+    "slope": "magma",
+    "aspect": "twilight",
+    "curvature": "RdBu",
+    "tpi": "RdBu",
+    "roughness": "cividis",
+}
 
 
 # --- Main App Functions ---
 
-def display_hsi_dashboard():
+def display_hsi_dashboard(dataset, interleave="bsq", chunked=False):
     """Creates the HSI visualization and interaction section."""
     st.header("🛰️ Análisis de imágenes hiperespectrales (HSI)")
+    hsi, wavelengths = get_hsi_cube(dataset, interleave, chunked)
+    if isinstance(hsi, CubeStore):
+        # Composites read 3 bands and profiles one spectrum from the file
+        st.caption(f"Cubo en disco: {hsi.nbytes / 2**20:.0f} MB, organizacion {interleave.upper()}"
+                   f"{' en bloques de %d x %d' % DISK_TILE if chunked else ''}.")
 
     # Use a three-band composite (e.g., RGB) for visual display
     # We'll use band indices 20, 40, and 60 as R, G, B for a simulated "False Color"
     R_band, G_band, B_band = 20, 40, 60
-    hsi_composite = HSI_DATA[:, :, [R_band, G_band, B_band]]
+    hsi_composite = hsi[:, :, [R_band, G_band, B_band]]
     # Normalize the composite for display
-    composite_normalized = (hsi_composite - hsi_composite.min()) / (hsi_composite.max() - hsi_composite.min())
+    composite_normalized = stretch(hsi_composite, mode="minmax",
+                                   key=(dataset, interleave, chunked, R_band, G_band, B_band))
 
     col1, col2 = st.columns(2)
 
@@ -69,16 +219,16 @@ def display_hsi_dashboard():
     with col2:
         st.subheader("Selector de perfil espectral de píxeles")
         # Interactive sliders for selecting a pixel
-        max_row, max_col, _ = HSI_DATA.shape
+        max_row, max_col, _ = hsi.shape
         row = st.slider("Seleccionar fila de píxeles (Y)", 0, max_row - 1, int(max_row / 2))
         col = st.slider("Seleccionar columna de píxeles (X)", 0, max_col - 1, int(max_col / 2))
 
         # Extract the spectral curve for the selected pixel
-        spectral_curve = HSI_DATA[row, col, :]
+        spectral_curve = hsi[row, col, :]
 
         # Plot the spectral curve
         fig, ax = plt.subplots(figsize=(8, 5))
-        ax.plot(WAVELENGTHS, spectral_curve, label=f"Pixel ({row}, {col})", color='green')
+        ax.plot(wavelengths, spectral_curve, label=f"Pixel ({row}, {col})", color='green')
         ax.set_title("Perfil de reflectancia espectral")
         ax.set_xlabel("Longitud de onda (nm)")
         ax.set_ylabel("Número digital (DN) / Reflectancia")
@@ -86,6 +236,62 @@ def display_hsi_dashboard():
         ax.legend()
         st.pyplot(fig) # Display the plot in Streamlit
 
+    # Spectral matching against the library of 5_spectral_signatures_app
+    st.markdown("---")
+    st.subheader("Clasificacion por similitud espectral")
+    method = st.selectbox("Metodo de similitud", list(METHODS))
+    best, score, names = match_hsi(method, dataset, interleave, chunked)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        fig, ax = plt.subplots(figsize=(6, 5))
+        cmap = plt.get_cmap('tab10', len(names))
+        cax = ax.imshow(best, cmap=cmap, vmin=-0.5, vmax=len(names) - 0.5)
+        cbar = fig.colorbar(cax, ticks=range(len(names)))
+        cbar.ax.set_yticklabels(names)
+        ax.set_title("Material mas similar")
+        st.pyplot(fig)
+    with col4:
+        fig, ax = plt.subplots(figsize=(6, 5))
+        cax = ax.imshow(score, cmap='magma_r')
+        fig.colorbar(cax, label=METHODS[method])
+        ax.set_title("Puntaje de la mejor coincidencia (menor es mejor)")
+        st.pyplot(fig)
+
+    # Region statistics: mean, std and percentiles per band over many pixels
+    st.markdown("---")
+    st.subheader("Espectros por region")
+    source = st.radio("Definir regiones por:", ["Cuadricula", "Rectangulos / poligonos", "Clases de similitud"],
+                      horizontal=True)
+    if source == "Cuadricula":
+        n = st.slider("Regiones por lado", 1, 10, 3)
+        spec = (n, n)
+    elif source == "Rectangulos / poligonos":
+        spec = st.text_area(
+            "Una region por linea: 'nombre: fila_ini fila_fin col_ini col_fin' o 'nombre: x,y x,y x,y ...'",
+            "A: 0 10 0 10\nB: 20 40 5 30\nC: 5,5 45,10 25,45")
+    else:
+        spec = None
+    try:
+        names, stats, table = hsi_region_stats(dataset, interleave, chunked, source, spec, method)
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        fig, ax = plt.subplots(figsize=(10, 5))
+        for k, name in enumerate(names):
+            line, = ax.plot(wavelengths, stats["mean"][k], label=f"{name} ({stats['count'][k]} px)")
+            if len(names) <= 5:
+                ax.fill_between(wavelengths, stats["percentiles"][0, k], stats["percentiles"][-1, k],
+                                color=line.get_color(), alpha=0.15)
+        ax.set_title(f"Media por region (banda: P{DEFAULT_PERCENTILES[0]}-P{DEFAULT_PERCENTILES[-1]})")
+        ax.set_xlabel("Longitud de onda (nm)")
+        ax.set_ylabel("Número digital (DN) / Reflectancia")
+        ax.grid(True, linestyle='--', alpha=0.6)
+        if len(names) <= 12:
+            ax.legend()
+        st.pyplot(fig)
+        st.dataframe(table, use_container_width=True)
+
     # Optional: Display HSI Metadata
     st.markdown("---")
     st.subheader("Descripcion")
@@ -95,16 +301,43 @@ def display_hsi_dashboard():
 
 
 
-def display_lidar_dashboard():
+def display_lidar_dashboard(cloud, cellsize=1.0):
     """Creates the LiDAR visualization and interaction section."""
     st.header("🌲 Análisis de datos LiDAR (DSM)")
 
-     # Plot the LiDAR DSM as a heat map
+    if LIDAR_CLOUDS[cloud] is None:
+        uploaded_file = st.file_uploader("Nube de puntos (CSV con columnas x, y, z, clase)", type=["csv", "txt"])
+        if uploaded_file is None:
+            st.info("Cargue un archivo CSV de puntos para generar los modelos.")
+            return
+        source_key = (uploaded_file.file_id, cellsize)
+        surfaces = grid_lidar(source_key, uploaded_file, cellsize=cellsize)
+    else:
+        source_key = (cloud, cellsize)
+        surfaces = grid_lidar(source_key, n_points=LIDAR_CLOUDS[cloud], cellsize=cellsize)
+    st.caption(f"{int(surfaces['count'].sum()):,} puntos en una grilla de "
+               f"{surfaces['dsm'].shape[0]} x {surfaces['dsm'].shape[1]} celdas de {cellsize} m")
+
+    surface = st.selectbox("Superficie", list(SURFACES), format_func=SURFACES.get)
+    layer = st.selectbox("Capa", ["elevation"] + list(LAYERS),
+                         format_func=lambda name: "Elevacion / altura" if name == "elevation" else LAYERS[name])
+
+     # Plot the LiDAR surface (or a derivative) as a heat map
     fig, ax = plt.subplots(figsize=(10, 8))
     # Use imshow for 2D visualization of the elevation data
-    cax = ax.imshow(LIDAR_DATA, cmap='viridis', origin='lower')
-    fig.colorbar(cax, label='Elevacion (m)') # Add a color bar for scale
-    ax.set_title("LiDAR DSM")
+    if layer == "elevation":
+        cax = ax.imshow(surfaces[surface], cmap='Greens' if surface == "chm" else 'viridis')
+        fig.colorbar(cax, label='Altura (m)' if surface == "chm" else 'Elevacion (m)') # Add a color bar for scale
+    else:
+        values = terrain_layers(source_key + (surface,), surfaces[surface], cellsize)[layer]
+        if TERRAIN_CMAPS[layer] == "RdBu":
+            limit = np.nanpercentile(np.abs(values), 98) or 1.0
+            cax = ax.imshow(values, cmap='RdBu', vmin=-limit, vmax=limit)
+        else:
+            cax = ax.imshow(values, cmap=TERRAIN_CMAPS[layer])
+        fig.colorbar(cax, label=LAYERS[layer])
+    title = f"LiDAR {surface.upper()}"
+    ax.set_title(title if layer == "elevation" else f"{title}: {LAYERS[layer]}")
     ax.set_xlabel("Coordenada X  (Columna)")
     ax.set_ylabel("Coordenada Y (Fila)")
     st.pyplot(fig)
@@ -130,9 +363,17 @@ def main():
     )
 
     if selected_view == "Datos Hiperespectrales":
-        display_hsi_dashboard()
+        dataset = st.sidebar.selectbox("Cubo hiperespectral:", list(HSI_CUBES))
+        interleave, chunked = "bsq", False
+        if HSI_CUBES[dataset] is not None and HSI_CUBES[dataset][0] == "disk":
+            interleave = st.sidebar.selectbox("Organizacion en disco:", list(INTERLEAVES),
+                                              format_func=str.upper)
+            chunked = st.sidebar.checkbox("Almacenar en bloques (tiles)")
+        display_hsi_dashboard(dataset, interleave, chunked)
     elif selected_view == "Datos LiDAR":
-        display_lidar_dashboard()
+        cloud = st.sidebar.selectbox("Nube de puntos:", list(LIDAR_CLOUDS))
+        cellsize = st.sidebar.select_slider("Tamaño de celda (m):", options=[0.5, 1.0, 2.0, 5.0], value=1.0)
+        display_lidar_dashboard(cloud, cellsize)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,7 @@ import streamlit as st
 import rasterio
 import numpy as np
 import matplotlib.pyplot as plt
+from display_stretch import stretch
 from sklearn_extra.cluster import CommonNNClustering # Or use a custom ISODATA implementation
 # Note: True ISODATA is often implemented manually in Python for RS.
 # For this script, we will use a refined KMeans/MiniBatch approach 
@@ -64,7 +65,7 @@ if uploaded_file is not None:
                 st.subheader("Imagen Original (RGB/Falso Color)")
                 # Normalize for display
                 rgb = np.dstack((img_data[0], img_data[1], img_data[2]))
-                rgb_norm = (rgb - rgb.min()) / (rgb.max() - rgb.min())
+                rgb_norm = stretch(rgb, mode="minmax")
                 st.image(rgb_norm, use_container_width=True)
 
             with col2:
@@ -0,0 +1,173 @@
+import numpy as np
+from scipy import linalg
+
+# --- Configuration ---
+BLOCK_PIXELS = 65_536   # Pixels per block of rows
+NOISE_RIDGE = 1e-9      # Relative ridge added to a singular noise covariance
+METHODS = {
+    "PCA": "Componentes principales (KLT)",
+    "MNF": "Fraccion minima de ruido (MNF)",
+}
+
+
+class CovarianceAccumulator:
+    """
+    Mean and bands x bands covariance merged block by block (Chan et al.
+    co-moment updates in float64), so a cube is summarized in one pass
+    without holding its pixels.
+    """
+
+    def __init__(self, n_bands):
+        self.n = 0
+        self.mean = np.zeros(n_bands)
+        self.comoment = np.zeros((n_bands, n_bands))
+
+    def update(self, pixels):
+        """Adds an (n_pixels, bands) block; rows with NaN/inf are skipped."""
+        pixels = np.asarray(pixels, dtype=np.float64)
+        pixels = pixels[np.isfinite(pixels).all(axis=1)]
+        n = len(pixels)
+        if n == 0:
+            return self
+        block_mean = pixels.mean(axis=0)
+        deviation = pixels - block_mean
+        total = self.n + n
+        delta = block_mean - self.mean
+        self.comoment += deviation.T @ deviation + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+        return self
+
+    def covariance(self):
+        return self.comoment / max(self.n - 1, 1)
+
+
+def iter_row_blocks(cube, block_pixels=BLOCK_PIXELS):
+    """(start, (rows, cols, bands) block) for blocks of whole rows of a cube."""
+    rows, cols = cube.shape[:2]
+    step = max(1, block_pixels // cols)
+    for start in range(0, rows, step):
+        yield start, np.asarray(cube[start:start + step])
+
+
+def accumulate(cube, noise=False, block_pixels=BLOCK_PIXELS):
+    """
+    Signal covariance of a (rows, cols, bands) cube (array, memmap or any
+    cube from hsi_cube) in one pass over row blocks. With noise=True it also
+    accumulates the noise covariance estimated from the differences between
+    horizontally adjacent pixels (shift difference, covariance / 2).
+    """
+    bands = cube.shape[2]
+    signal = CovarianceAccumulator(bands)
+    difference = CovarianceAccumulator(bands) if noise else None
+    for _, block in iter_row_blocks(cube, block_pixels):
+        signal.update(block.reshape(-1, bands))
+        if noise and block.shape[1] > 1:
+            shifted = np.subtract(block[:, 1:], block[:, :-1], dtype=np.float64)
+            difference.update(shifted.reshape(-1, bands))
+    return signal, difference
+
+
+class Transform:
+    """
+    Linear transform of the bands: scores = (x - mean) @ vectors, sorted by
+    decreasing eigenvalue (variance for PCA, signal-to-noise for MNF).
+    inverse holds the rows that map scores back to bands, so a k-component
+    reconstruction is mean + (x - mean) @ vectors[:, :k] @ inverse[:k].
+    """
+
+    def __init__(self, method, mean, vectors, eigenvalues, inverse):
+        self.method = method
+        self.mean = mean
+        self.vectors = vectors
+        self.eigenvalues = eigenvalues
+        self.inverse = inverse
+
+    @property
+    def n_bands(self):
+        return len(self.mean)
+
+    @property
+    def explained_variance_ratio(self):
+        total = self.eigenvalues.sum()
+        return self.eigenvalues / total if total else np.zeros_like(self.eigenvalues)
+
+    def reconstruction_matrix(self, k, bands=None):
+        """(bands, len(bands)) matrix of the k-component reconstruction."""
+        inverse = self.inverse[:k] if bands is None else self.inverse[:k, bands]
+        return self.vectors[:, :k] @ inverse
+
+    def project(self, pixels, components=None):
+        """Scores of (n, bands) pixels for the selected components (all by default)."""
+        vectors = self.vectors if components is None else self.vectors[:, components]
+        return (np.asarray(pixels, dtype=np.float64) - self.mean) @ vectors
+
+    def reconstruct(self, pixels, k, bands=None):
+        """k-component reconstruction of (n, bands) pixels, only for the given bands."""
+        mean = self.mean if bands is None else self.mean[bands]
+        return (np.asarray(pixels, dtype=np.float64) - self.mean) @ self.reconstruction_matrix(k, bands) + mean
+
+
+def pca(signal):
+    """PCA from a CovarianceAccumulator: eigh of the bands x bands covariance."""
+    eigenvalues, vectors = np.linalg.eigh(signal.covariance())
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues, vectors = np.maximum(eigenvalues[order], 0), vectors[:, order]
+    return Transform("PCA", signal.mean.copy(), vectors, eigenvalues, vectors.T.copy())
+
+
+def mnf(signal, noise):
+    """
+    Minimum noise fraction: generalized eigenproblem C v = l N v (signal and
+    noise covariances), i.e. PCA of the noise-whitened data. Components are
+    sorted by decreasing l (signal-to-noise); the vectors are scaled so the
+    noise has unit variance in every component.
+    """
+    noise_cov = noise.covariance() / 2
+    ridge = NOISE_RIDGE * max(np.trace(noise_cov) / len(noise_cov), np.finfo(float).tiny)
+    noise_cov = noise_cov + ridge * np.eye(len(noise_cov))
+    eigenvalues, vectors = linalg.eigh(signal.covariance(), noise_cov)
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues, vectors = np.maximum(eigenvalues[order], 0), vectors[:, order]
+    # vectors^T N vectors = I, so the inverse is vectors^T N
+    inverse = vectors.T @ noise_cov
+    return Transform("MNF", signal.mean.copy(), vectors, eigenvalues, inverse)
+
+
+def fit(cube, method="PCA", block_pixels=BLOCK_PIXELS):
+    """Fits a PCA or MNF Transform to a cube in one streaming pass."""
+    if method not in METHODS:
+        raise ValueError(f"Metodo desconocido: {method}")
+    signal, noise = accumulate(cube, noise=method == "MNF", block_pixels=block_pixels)
+    if signal.n < 2:
+        raise ValueError("La imagen no tiene suficientes pixeles validos.")
+    return pca(signal) if method == "PCA" else mnf(signal, noise)
+
+
+def project_cube(cube, transform, components, out=None, block_pixels=BLOCK_PIXELS):
+    """
+    Component images (rows, cols, len(components)) float32, computed block
+    by block; out may be a preallocated array or memmap.
+    """
+    rows, cols, bands = cube.shape
+    components = np.atleast_1d(components)
+    if out is None:
+        out = np.empty((rows, cols, len(components)), dtype=np.float32)
+    for start, block in iter_row_blocks(cube, block_pixels):
+        scores = transform.project(block.reshape(-1, bands), components)
+        out[start:start + len(block)] = scores.reshape(len(block), cols, -1)
+    return out
+
+
+def reconstruct_cube(cube, transform, k, bands=None, out=None, block_pixels=BLOCK_PIXELS):
+    """k-component reconstruction of the given bands (all by default), block by block."""
+    rows, cols, n_bands = cube.shape
+    bands = np.arange(n_bands) if bands is None else np.atleast_1d(bands)
+    matrix = transform.reconstruction_matrix(k, bands)
+    if out is None:
+        out = np.empty((rows, cols, len(bands)), dtype=np.float32)
+    for start, block in iter_row_blocks(cube, block_pixels):
+        centered = block.reshape(-1, n_bands) - transform.mean
+        values = centered @ matrix + transform.mean[bands]
+        out[start:start + len(block)] = values.reshape(len(block), cols, -1)
+    return out
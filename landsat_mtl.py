@@ -0,0 +1,158 @@
+import re
+from datetime import date, datetime
+
+import numpy as np
+import rasterio
+
+from veg_index_engine import BufferPool, iter_windows, output_profile, window_shape
+
+# KEY = VALUE lines of an MTL file (GROUP / END_GROUP lines included)
+LINE = re.compile(r"^\s*(\w+)\s*=\s*(.*?)\s*$")
+DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+NUMBER = re.compile(r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$")
+BAND_KEY = re.compile(r"^(RADIANCE|REFLECTANCE)_(MULT|ADD)_BAND_(\d+)$")
+
+PRODUCTS = {
+    "reflectance": "Reflectancia TOA (corregida por elevacion solar)",
+    "radiance": "Radiancia TOA (W/(m2 sr um))",
+}
+
+
+def parse_value(text):
+    """Typed MTL value: quoted string, date, int, float or raw string."""
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+        return date.fromisoformat(text) if DATE.match(text) else text
+    if DATE.match(text):
+        return date.fromisoformat(text)
+    if NUMBER.match(text):
+        return float(text) if any(ch in text for ch in ".eE") else int(text)
+    return text
+
+
+class MTLMetadata:
+    """
+    Landsat MTL read in one pass. values keeps every field (first occurrence,
+    keyed by name) and groups the group each one was found in; the per-band
+    rescaling factors are collected into {band: value} dictionaries.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.groups = {}
+        self.radiance_mult = {}
+        self.radiance_add = {}
+        self.reflectance_mult = {}
+        self.reflectance_add = {}
+
+    @property
+    def sun_elevation(self):
+        return self.values.get("SUN_ELEVATION")
+
+    @property
+    def sun_azimuth(self):
+        return self.values.get("SUN_AZIMUTH")
+
+    @property
+    def solar_zenith(self):
+        return None if self.sun_elevation is None else 90.0 - self.sun_elevation
+
+    @property
+    def earth_sun_distance(self):
+        return self.values.get("EARTH_SUN_DISTANCE")
+
+    @property
+    def date_acquired(self):
+        value = self.values.get("DATE_ACQUIRED")
+        if isinstance(value, str):
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        return value
+
+    def gains(self, bands, product="radiance"):
+        """{band: (mult, add)} of DN -> radiance or DN -> TOA reflectance."""
+        mult, add = ((self.radiance_mult, self.radiance_add) if product == "radiance"
+                     else (self.reflectance_mult, self.reflectance_add))
+        missing = [band for band in bands if band not in mult or band not in add]
+        if missing:
+            raise ValueError(f"El MTL no tiene los factores {product.upper()}_MULT/ADD de las bandas {missing}.")
+        return {band: (mult[band], add[band]) for band in bands}
+
+
+def parse_mtl(source):
+    """MTLMetadata from the text (str / bytes) or the lines of an MTL file."""
+    if isinstance(source, bytes):
+        source = source.decode("utf-8", errors="replace")
+    lines = source.splitlines() if isinstance(source, str) else source
+    mtl = MTLMetadata()
+    group = []
+    tables = {
+        ("RADIANCE", "MULT"): mtl.radiance_mult,
+        ("RADIANCE", "ADD"): mtl.radiance_add,
+        ("REFLECTANCE", "MULT"): mtl.reflectance_mult,
+        ("REFLECTANCE", "ADD"): mtl.reflectance_add,
+    }
+    for line in lines:
+        match = LINE.match(line)
+        if match is None:
+            continue
+        key, text = match.groups()
+        if key == "GROUP":
+            group.append(text)
+            continue
+        if key == "END_GROUP":
+            if group:
+                group.pop()
+            continue
+        if key in mtl.values:
+            continue
+        value = mtl.values[key] = parse_value(text)
+        mtl.groups[key] = group[-1] if group else None
+        band_key = BAND_KEY.match(key)
+        if band_key is not None:
+            kind, term, band = band_key.groups()
+            tables[kind, term][int(band)] = float(value)
+    if not mtl.values:
+        raise ValueError("El archivo no es un MTL de Landsat valido.")
+    return mtl
+
+
+def scale_scene(src, dst_path, band_map, coefficients, prefix, minimum=None, on_window=None):
+    """
+    values = DN * gain + offset for all mapped bands, window by window in
+    float32 (one buffer per window, scaled in place). band_map maps raster
+    band numbers to Landsat band numbers, coefficients maps Landsat bands to
+    (gain, offset); values below minimum are clipped and DN 0 (fill)
+    becomes NaN. Writes a multi-band GeoTIFF.
+    """
+    pool = BufferPool()
+    with rasterio.open(dst_path, "w", **output_profile(src, count=len(band_map))) as dst:
+        for k, band in enumerate(band_map.values(), start=1):
+            dst.set_band_description(k, f"{prefix}_B{band}")
+        for window in iter_windows(src):
+            shape = window_shape(window)
+            values = pool.get("values", shape)
+            for k, (file_band, band) in enumerate(band_map.items(), start=1):
+                src.read(file_band, window=window, out=values)
+                fill = values == 0
+                gain, offset = coefficients[band]
+                values *= np.float32(gain)
+                values += np.float32(offset)
+                if minimum is not None:
+                    np.maximum(values, np.float32(minimum), out=values)
+                values[fill] = np.nan
+                dst.write(values, k, window=window)
+                if on_window is not None:
+                    on_window(band, window, values)
+    return dst_path
+
+
+def toa_scene(src, dst_path, band_map, mtl, product="reflectance", on_window=None):
+    """
+    DN -> TOA radiance or sun-elevation corrected TOA reflectance for all
+    mapped bands in one windowed pass (see scale_scene).
+    """
+    gains = mtl.gains(list(band_map.values()), product)
+    sun = np.sin(np.radians(mtl.sun_elevation)) if product == "reflectance" else 1.0
+    coefficients = {band: (mult / sun, add / sun) for band, (mult, add) in gains.items()}
+    prefix = "TOA_RAD" if product == "radiance" else "TOA_REF"
+    return scale_scene(src, dst_path, band_map, coefficients, prefix, on_window=on_window)
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+from rasterio.transform import from_origin
+
+# --- Configuration ---
+CHUNK_POINTS = 2_000_000    # Points gridded per chunk
+GROUND_CLASSES = (2,)       # ASPRS ground
+NOISE_CLASSES = (7, 18)     # ASPRS low / high noise, never gridded
+FILL_ITERATIONS = {"dsm": 2, "dtm": 8}   # Max gap radius (cells) filled per surface
+
+# Column names accepted for each field (CSV / structured arrays, case-insensitive)
+FIELD_NAMES = {
+    "x": ("x",),
+    "y": ("y",),
+    "z": ("z", "elevation", "height"),
+    "class": ("class", "classification", "clase"),
+}
+
+
+class Grid:
+    """Raster grid (north-up) over [xmin, xmax) x [ymin, ymax) with square cells."""
+
+    def __init__(self, bounds, cellsize):
+        xmin, ymin, xmax, ymax = bounds
+        self.xmin, self.ymax, self.cellsize = xmin, ymax, cellsize
+        self.cols = max(1, int(np.ceil((xmax - xmin) / cellsize)))
+        self.rows = max(1, int(np.ceil((ymax - ymin) / cellsize)))
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    @property
+    def transform(self):
+        return from_origin(self.xmin, self.ymax, self.cellsize, self.cellsize)
+
+    def cell_index(self, x, y):
+        """Flat cell index of every point, -1 outside the grid."""
+        col = np.floor((x - self.xmin) / self.cellsize).astype(np.int64)
+        row = np.floor((self.ymax - y) / self.cellsize).astype(np.int64)
+        # Points exactly on the max edges belong to the last cell
+        col[col == self.cols] = self.cols - 1
+        row[row == self.rows] = self.rows - 1
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        return np.where(inside, row * self.cols + col, -1)
+
+
+def _field(columns, name):
+    lookup = {str(column).lower(): column for column in columns}
+    for alias in FIELD_NAMES[name]:
+        if alias in lookup:
+            return lookup[alias]
+    if name == "class":
+        return None
+    raise ValueError(f"No se encontro la columna '{name}' en los puntos.")
+
+
+def iter_point_arrays(points, chunksize=CHUNK_POINTS):
+    """
+    (x, y, z, class) chunks from a structured array / dict of arrays (e.g.
+    the fields of a LAS file) or an (n, 3-4) array. class is None when the
+    points are not classified.
+    """
+    if isinstance(points, np.ndarray) and points.dtype.names is None:
+        columns = {name: points[:, k] for k, name in enumerate(["x", "y", "z", "class"][:points.shape[1]])}
+    else:
+        columns = points
+    names = columns.dtype.names if isinstance(columns, np.ndarray) else list(columns)
+    x, y, z = (columns[_field(names, name)] for name in ("x", "y", "z"))
+    class_field = _field(names, "class")
+    classes = None if class_field is None else columns[class_field]
+    for start in range(0, len(x), chunksize):
+        stop = start + chunksize
+        yield (np.asarray(x[start:stop], dtype=np.float64), np.asarray(y[start:stop], dtype=np.float64),
+               np.asarray(z[start:stop], dtype=np.float64),
+               None if classes is None else np.asarray(classes[start:stop]))
+
+
+def iter_point_csv(source, chunksize=CHUNK_POINTS):
+    """(x, y, z, class) chunks read from a CSV with pandas, chunk by chunk."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    for frame in pd.read_csv(source, chunksize=chunksize):
+        yield from iter_point_arrays({column: frame[column].to_numpy() for column in frame.columns},
+                                     chunksize)
+
+
+def point_bounds(chunks):
+    """(xmin, ymin, xmax, ymax) of all the points, in one pass."""
+    xmin = ymin = np.inf
+    xmax = ymax = -np.inf
+    for x, y, _, _ in chunks:
+        if len(x):
+            xmin, xmax = min(xmin, x.min()), max(xmax, x.max())
+            ymin, ymax = min(ymin, y.min()), max(ymax, y.max())
+    if not np.isfinite(xmin):
+        raise ValueError("No hay puntos para grillar.")
+    return xmin, ymin, xmax, ymax
+
+
+class GridAccumulator:
+    """
+    Per-cell count, sum, min and max of the points of every chunk (grouped
+    reductions with np.bincount and ufunc.at on flat cell indices), kept
+    separately for all the points and for the ground points.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        size = grid.rows * grid.cols
+        self.count = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros(size)
+        self.max = np.full(size, -np.inf)
+        self.min = np.full(size, np.inf)
+        self.ground_count = np.zeros(size, dtype=np.int64)
+        self.ground_sum = np.zeros(size)
+
+    def update(self, x, y, z, classes=None):
+        cell = self.grid.cell_index(x, y)
+        keep = cell >= 0
+        if classes is not None:
+            keep &= ~np.isin(classes, NOISE_CLASSES)
+        cell, z = cell[keep], z[keep]
+        size = len(self.count)
+        self.count += np.bincount(cell, minlength=size)
+        self.sum += np.bincount(cell, weights=z, minlength=size)
+        np.maximum.at(self.max, cell, z)
+        np.minimum.at(self.min, cell, z)
+
+        if classes is not None:
+            ground = np.isin(classes[keep], GROUND_CLASSES)
+            cell, z = cell[ground], z[ground]
+        self.ground_count += np.bincount(cell, minlength=size)
+        self.ground_sum += np.bincount(cell, weights=z, minlength=size)
+        return self
+
+    def surfaces(self, fill=FILL_ITERATIONS):
+        """
+        float32 rasters: dsm (highest point), dtm (mean ground elevation),
+        chm (dsm - dtm, >= 0), min, mean, count. Empty cells are NaN; small gaps
+        of the dsm and dtm are filled from their neighbours.
+        """
+        shape = self.grid.shape
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.sum / self.count, np.nan)
+            dtm = np.where(self.ground_count > 0, self.ground_sum / self.ground_count, np.nan)
+        dsm = np.where(self.count > 0, self.max, np.nan)
+        dsm = fill_gaps(dsm.reshape(shape), fill.get("dsm", 0))
+        dtm = fill_gaps(dtm.reshape(shape), fill.get("dtm", 0))
+        chm = np.maximum(dsm - dtm, 0)
+        return {
+            "dsm": dsm.astype(np.float32),
+            "dtm": dtm.astype(np.float32),
+            "chm": chm.astype(np.float32),
+            "min": np.where(self.count > 0, self.min, np.nan).reshape(shape).astype(np.float32),
+            "mean": mean.reshape(shape).astype(np.float32),
+            "count": self.count.reshape(shape).astype(np.int32),
+        }
+
+
+def fill_gaps(raster, iterations):
+    """
+    Fills NaN cells with the mean of their valid 3 x 3 neighbours, growing
+    from the edges of each gap for at most `iterations` steps, so only gaps
+    up to that radius are closed.
+    """
+    raster = np.array(raster, dtype=np.float64)
+    for _ in range(iterations):
+        missing = np.isnan(raster)
+        if not missing.any():
+            break
+        valid = ~missing
+        padded = np.pad(np.where(valid, raster, 0.0), 1)
+        weights = np.pad(valid.astype(np.float64), 1)
+        rows, cols = raster.shape
+        total = sum(padded[r:r + rows, c:c + cols] for r in range(3) for c in range(3))
+        n = sum(weights[r:r + rows, c:c + cols] for r in range(3) for c in range(3))
+        fillable = missing & (n > 0)
+        if not fillable.any():
+            break
+        raster[fillable] = total[fillable] / n[fillable]
+    return raster
+
+
+def grid_points(chunks, grid, fill=FILL_ITERATIONS):
+    """Grids a stream of (x, y, z, class) chunks; memory depends only on the grid and chunk size."""
+    accumulator = GridAccumulator(grid)
+    for x, y, z, classes in chunks:
+        accumulator.update(x, y, z, classes)
+    return accumulator.surfaces(fill)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+HISTOGRAM_BINS = 4096   # Fine bins kept by the accumulator (must be even)
+
+
+class StreamingStats:
+    """
+    Statistics of a raster updated window by window, without the full array:
+
+    - count, mean and standard deviation merged with Welford/Chan updates,
+    - exact min/max,
+    - a fixed-bin histogram whose range doubles (merging bin pairs) whenever
+      a window falls outside it. Median and percentiles are read from it,
+      with an error of at most one bin width. Each doubling extends the
+      range on one side only, so the range can end up to 4x (max - min)
+      wide: the bin width stays below max(4 (max - min), 2) / HISTOGRAM_BINS
+      (the 2 covers a constant first window, whose range starts at 1).
+
+    NaN and infinite values are ignored, like the previous get_stats.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.low = None
+        self.width = None
+
+    # --- Accumulation ---
+    def update(self, values):
+        """Adds the finite values of one window."""
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return self
+
+        n = values.size
+        window_min, window_max = float(values.min()), float(values.max())
+        window_mean = float(values.mean(dtype=np.float64))
+        window_m2 = float(values.var(dtype=np.float64)) * n
+
+        total = self.n + n
+        delta = window_mean - self.mean
+        self.m2 += window_m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.min = min(self.min, window_min)
+        self.max = max(self.max, window_max)
+
+        self._update_histogram(values, window_min, window_max)
+        return self
+
+    def _update_histogram(self, values, window_min, window_max):
+        if self.low is None:
+            self.low = window_min
+            self.width = (window_max - window_min or 1.0) / self.bins
+        while window_min < self.low:
+            self._grow(downward=True)
+        while window_max > self.low + self.width * self.bins:
+            self._grow(downward=False)
+
+        index = np.subtract(values, self.low, dtype=np.float64)
+        index /= self.width
+        index = index.astype(np.intp)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.bins)
+
+    def _grow(self, downward):
+        """Doubles the histogram range by merging adjacent bins."""
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        empty = np.zeros_like(merged)
+        if downward:
+            self.low -= self.width * self.bins
+            self.counts = np.concatenate([empty, merged])
+        else:
+            self.counts = np.concatenate([merged, empty])
+        self.width *= 2
+
+    # --- Results ---
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.n)) if self.n else np.nan
+
+    def edges(self):
+        if not self.n:
+            return np.zeros(0)
+        return self.low + self.width * np.arange(self.bins + 1)
+
+    def _cdf(self):
+        return np.concatenate([[0], np.cumsum(self.counts)])
+
+    def quantile(self, q):
+        """Approximate quantile(s) q in [0, 1], interpolated inside the bins."""
+        if not self.n:
+            return np.nan
+        value = np.interp(np.asarray(q) * self.n, self._cdf(), self.edges())
+        return np.clip(value, self.min, self.max)
+
+    def percentile(self, p):
+        return self.quantile(np.asarray(p) / 100)
+
+    def histogram(self, bins=50):
+        """Counts and edges on `bins` equal bins between min and max (empty without finite values)."""
+        if not self.n:
+            return np.zeros(0), np.zeros(0)
+        edges = np.linspace(self.min, self.max, bins + 1)
+        cdf = np.interp(edges, self.edges(), self._cdf())
+        # All mass lies in [min, max] even if min/max fall inside a bin
+        cdf[0], cdf[-1] = 0, self.n
+        return np.diff(cdf), edges
+
+    def summary(self):
+        return {
+            "Media": self.mean if self.n else np.nan,
+            "Mediana": float(self.quantile(0.5)),
+            "Minimo": self.min if self.n else np.nan,
+            "Maximo": self.max if self.n else np.nan,
+            "Desv. Est.": self.std,
+        }
+
+    def to_frame(self):
+        return pd.DataFrame(self.summary().items(), columns=["Metrica", "Valor"])
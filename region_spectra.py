@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+from skimage import draw
+
+# --- Configuration ---
+BLOCK_PIXELS = 65_536        # Pixels read per block of rows
+SAMPLE_VALUES = 25_000_000   # Values kept (all regions) for the percentiles
+MIN_SAMPLE_PIXELS = 1_000    # Pixels kept per region at least
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+class Region:
+    """Named region: bounding box (row/col slices) and a boolean mask inside it."""
+
+    def __init__(self, name, rows, cols, mask):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.mask = mask
+
+    @property
+    def n_pixels(self):
+        return int(self.mask.sum())
+
+
+def rectangle(name, row_start, row_stop, col_start, col_stop, shape):
+    """Rectangle [row_start, row_stop) x [col_start, col_stop), clipped to the cube."""
+    row_start, row_stop = max(0, row_start), min(shape[0], row_stop)
+    col_start, col_stop = max(0, col_start), min(shape[1], col_stop)
+    if row_stop <= row_start or col_stop <= col_start:
+        raise ValueError(f"La region '{name}' queda fuera de la imagen.")
+    mask = np.ones((row_stop - row_start, col_stop - col_start), dtype=bool)
+    return Region(name, slice(row_start, row_stop), slice(col_start, col_stop), mask)
+
+
+def polygon(name, vertices, shape):
+    """Polygon from (col, row) vertices, rasterized inside its bounding box."""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    cols, rows = vertices[:, 0], vertices[:, 1]
+    row_start, col_start = max(0, int(np.floor(rows.min()))), max(0, int(np.floor(cols.min())))
+    row_stop = min(shape[0], int(np.ceil(rows.max())) + 1)
+    col_stop = min(shape[1], int(np.ceil(cols.max())) + 1)
+    if row_stop <= row_start or col_stop <= col_start:
+        raise ValueError(f"La region '{name}' queda fuera de la imagen.")
+    mask = np.zeros((row_stop - row_start, col_stop - col_start), dtype=bool)
+    rr, cc = draw.polygon(rows - row_start, cols - col_start, shape=mask.shape)
+    mask[rr, cc] = True
+    return Region(name, slice(row_start, row_stop), slice(col_start, col_stop), mask)
+
+
+def class_regions(labels, names=None):
+    """One region per class value of a label raster (0 is ignored)."""
+    labels = np.asarray(labels)
+    regions = []
+    for value in np.unique(labels):
+        if value == 0:
+            continue
+        rows, cols = np.nonzero(np.any(labels == value, axis=1))[0], np.nonzero(np.any(labels == value, axis=0))[0]
+        window = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        name = names[value] if names is not None else str(value)
+        regions.append(Region(name, *window, labels[window] == value))
+    return regions
+
+
+def grid_regions(shape, n_rows, n_cols):
+    """Regular grid of rectangles covering the cube."""
+    row_edges = np.linspace(0, shape[0], n_rows + 1).astype(int)
+    col_edges = np.linspace(0, shape[1], n_cols + 1).astype(int)
+    return [rectangle(f"F{i + 1}C{j + 1}", row_edges[i], row_edges[i + 1], col_edges[j], col_edges[j + 1], shape)
+            for i in range(n_rows) for j in range(n_cols)]
+
+
+def parse_regions(text, shape):
+    """
+    Regions typed one per line as "name: r0 r1 c0 c1" (rectangle of rows
+    r0..r1 and columns c0..c1) or "name: x,y x,y x,y ..." (polygon vertices
+    as column,row).
+    """
+    regions = []
+    for number, line in enumerate(text.strip().splitlines(), start=1):
+        if not line.strip():
+            continue
+        name, _, coords = line.partition(":")
+        if not coords:
+            name, coords = f"R{number}", name
+        name, parts = name.strip(), coords.split()
+        is_polygon = any("," in part for part in parts)
+        try:
+            if is_polygon:
+                vertices = [tuple(float(v) for v in part.split(",")) for part in parts]
+                if len(vertices) < 3 or any(len(v) != 2 for v in vertices):
+                    raise ValueError
+            else:
+                r0, r1, c0, c1 = (int(v) for v in parts)
+        except ValueError:
+            raise ValueError(f"Linea {number} no valida: '{line.strip()}'") from None
+        if is_polygon:
+            regions.append(polygon(name, vertices, shape))
+        else:
+            regions.append(rectangle(name, r0, r1, c0, c1, shape))
+    return regions
+
+
+class _Layer:
+    """Label layer sized to the bounding box of its members (grown as they are added)."""
+
+    def __init__(self, region):
+        self.row0, self.col0 = region.rows.start, region.cols.start
+        self.labels = np.zeros(region.mask.shape, dtype=np.int32)
+        self.members = []
+
+    @property
+    def rows(self):
+        return slice(self.row0, self.row0 + self.labels.shape[0])
+
+    @property
+    def cols(self):
+        return slice(self.col0, self.col0 + self.labels.shape[1])
+
+    def _local(self, region):
+        """Labels under the region bounding box, at offset coordinates."""
+        return self.labels[region.rows.start - self.row0:region.rows.stop - self.row0,
+                           region.cols.start - self.col0:region.cols.stop - self.col0]
+
+    def overlaps(self, region):
+        rows, cols = self.rows, self.cols
+        if (region.rows.stop <= rows.start or region.rows.start >= rows.stop
+                or region.cols.stop <= cols.start or region.cols.start >= cols.stop):
+            return False
+        # Part of the region bounding box inside the layer
+        top, left = max(rows.start, region.rows.start), max(cols.start, region.cols.start)
+        bottom, right = min(rows.stop, region.rows.stop), min(cols.stop, region.cols.stop)
+        labels = self.labels[top - self.row0:bottom - self.row0, left - self.col0:right - self.col0]
+        mask = region.mask[top - region.rows.start:bottom - region.rows.start,
+                           left - region.cols.start:right - region.cols.start]
+        return bool((labels[mask] > 0).any())
+
+    def add(self, k, region):
+        rows, cols = self.rows, self.cols
+        row0, col0 = min(rows.start, region.rows.start), min(cols.start, region.cols.start)
+        row1, col1 = max(rows.stop, region.rows.stop), max(cols.stop, region.cols.stop)
+        if (row0, col0, row1, col1) != (rows.start, cols.start, rows.stop, cols.stop):
+            grown = np.zeros((row1 - row0, col1 - col0), dtype=np.int32)
+            grown[rows.start - row0:rows.stop - row0, cols.start - col0:cols.stop - col0] = self.labels
+            self.row0, self.col0, self.labels = row0, col0, grown
+        self.members.append(k)
+        self._local(region)[region.mask] = len(self.members)
+
+
+def layers(regions):
+    """
+    Groups the regions into label layers where they do not overlap, so each
+    layer is read once for all its regions. Each layer only spans the
+    bounding box of its members. Returns a list of
+    (row slice, col slice, int32 labels, region indices).
+    """
+    result = []
+    for k, region in enumerate(regions):
+        for layer in result:
+            if not layer.overlaps(region):
+                break
+        else:
+            layer = _Layer(region)
+            result.append(layer)
+        layer.add(k, region)
+    return [(layer.rows, layer.cols, layer.labels, layer.members) for layer in result]
+
+
+def region_statistics(cube, regions, percentiles=DEFAULT_PERCENTILES, block_pixels=BLOCK_PIXELS):
+    """
+    Per-region, per-band count, mean, standard deviation and percentiles of a
+    (rows, cols, bands) cube (array, memmap, CubeStore, SyntheticCube).
+
+    Non-overlapping regions share a label layer and are read together, by
+    blocks of rows of the layer bounding box, so only those windows are
+    read. Means and deviations are exact (grouped sums merged with Chan
+    updates); percentiles are exact up to SAMPLE_VALUES values in total and
+    otherwise come from a regular subsample of each region.
+
+    Returns {"count": (R,), "mean"/"std": (R, B), "percentiles": (P, R, B)}.
+    """
+    n_regions, bands = len(regions), cube.shape[2]
+    count = np.zeros(n_regions, dtype=np.int64)
+    mean = np.zeros((n_regions, bands))
+    m2 = np.zeros((n_regions, bands))
+
+    cap = max(MIN_SAMPLE_PIXELS, SAMPLE_VALUES // max(1, n_regions * bands))
+    steps = np.array([max(1, -(-region.n_pixels // cap)) for region in regions])
+    samples = [[] for _ in regions]
+
+    for rows, cols, labels, members in layers(regions):
+        members = np.asarray(members)
+        width = cols.stop - cols.start
+        step_rows = max(1, block_pixels // width)
+        seen = np.zeros(len(members) + 1, dtype=np.int64)
+        for start in range(rows.start, rows.stop, step_rows):
+            stop = min(rows.stop, start + step_rows)
+            ids = labels[start - rows.start:stop - rows.start]
+            if not ids.any():
+                continue
+            block = np.asarray(cube[start:stop, cols], dtype=np.float64)
+            ids = ids.ravel()
+            valid = np.nonzero(ids)[0]
+            order = valid[np.argsort(ids[valid], kind="stable")]
+            ids, pixels = ids[order], block.reshape(-1, bands)[order]
+
+            # Grouped reductions: one contiguous run of pixels per region
+            present, starts, n = np.unique(ids, return_index=True, return_counts=True)
+            sums = np.add.reduceat(pixels, starts, axis=0)
+            block_mean = sums / n[:, None]
+            deviation = pixels - np.repeat(block_mean, n, axis=0)
+            block_m2 = np.add.reduceat(deviation * deviation, starts, axis=0)
+
+            k = members[present - 1]
+            total = count[k] + n
+            delta = block_mean - mean[k]
+            m2[k] += block_m2 + delta * delta * (count[k] * n / total)[:, None]
+            mean[k] += delta * (n / total)[:, None]
+            count[k] = total
+
+            # Regular subsample of each region (every step-th pixel)
+            position = np.arange(len(ids)) - np.repeat(starts, n) + np.repeat(seen[present], n)
+            keep = position % np.repeat(steps[k], n) == 0
+            for region_id, group in zip(k, np.split(pixels[keep], np.cumsum(np.bincount(
+                    np.repeat(np.arange(len(k)), n)[keep], minlength=len(k)))[:-1])):
+                samples[region_id].append(group.astype(np.float32))
+            seen[present] += n
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(m2 / count[:, None])
+    mean[count == 0] = np.nan
+    result = np.full((len(percentiles), n_regions, bands), np.nan)
+    for k, parts in enumerate(samples):
+        if parts:
+            result[:, k] = np.percentile(np.concatenate(parts), percentiles, axis=0)
+    return {"count": count, "mean": mean, "std": std, "percentiles": result}
+
+
+def statistics_frame(regions, stats, wavelengths, percentiles=DEFAULT_PERCENTILES):
+    """Long table: one row per region and band."""
+    n_regions, bands = stats["mean"].shape
+    frame = pd.DataFrame({
+        "Region": np.repeat([region.name for region in regions], bands),
+        "Longitud de onda (nm)": np.tile(np.asarray(wavelengths, dtype=float), n_regions),
+        "Pixeles": np.repeat(stats["count"], bands),
+        "Media": stats["mean"].ravel(),
+        "Desv. Est.": stats["std"].ravel(),
+    })
+    for p, values in zip(percentiles, stats["percentiles"]):
+        frame[f"P{p}"] = values.ravel()
+    return frame
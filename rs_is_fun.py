@@ -7,6 +7,7 @@ from skimage import io
 from skimage import feature
 from skimage import exposure
 import skimage.util as ski_util
+from spectral_indices import calculate_ndvi
 
 # Set the page configuration with a wide layout
 st.set_page_config(layout="wide", page_title="Procesamiento basico de Imagenes")
@@ -98,27 +99,21 @@ def apply_ndvi(image_np):
     # Remote sensing images can have different band arrangements.
     if image_np.shape[2] >= 4:
         # Assumes a 4-channel image (e.g., RGB and a NIR band)
-        red_band = image_np[:, :, 2].astype(float) # Red is often channel 2
-        nir_band = image_np[:, :, 3].astype(float) # NIR is often channel 3
+        red_band = image_np[:, :, 2] # Red is often channel 2
+        nir_band = image_np[:, :, 3] # NIR is often channel 3
         st.write("Usando los canales 3 (Rojo) y 4 (NIR) para el calculo del indice NDVI.")
     elif image_np.shape[2] == 2:
         # Assumes a 2-channel image with Red and NIR bands
-        red_band = image_np[:, :, 0].astype(float)
-        nir_band = image_np[:, :, 1].astype(float)
+        red_band = image_np[:, :, 0]
+        nir_band = image_np[:, :, 1]
         st.write("Uso de los canales 0 (rojo) y 1 (NIR) para el cálculo del NDVI.")
     else:
         st.error("El NDVI requiere al menos una banda roja y una banda infrarroja cercana. Sube una imagen adecuada..")
         return None
         
-    # Handle division by zero
-    numerator = np.subtract(nir_band, red_band)
-    denominator = np.add(nir_band, red_band)
-    
-    # Using np.errstate to handle invalid values in a safe way
-    with np.errstate(invalid='ignore'):
-        ndvi = np.divide(numerator, denominator)
-        # Handle nan values (where denominator was zero)
-        ndvi[denominator == 0] = 0.0
+    # Zero denominators come back as NaN (masked, no branches) and are shown as 0
+    ndvi = calculate_ndvi(nir_band, red_band, dtype=np.float32)
+    ndvi[np.isnan(ndvi)] = 0.0
 
     # Map the NDVI values from -1 to 1 to a grayscale range 0-255 for visualization
     ndvi_scaled = ((ndvi + 1) * 127.5).astype(np.uint8)
@@ -0,0 +1,247 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+import rasterio
+
+from veg_index_engine import BufferPool, iter_windows, output_profile, window_shape
+
+# --- Configuration ---
+LUT_RADIANCES = 24          # Radiance nodes per band and AOT
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "intersr_6s_lut")
+
+# OLI reflective bands: name and Py6S predefined wavelength
+OLI_BANDS = {
+    1: ("Aerosol costero", "LANDSAT_OLI_B1"),
+    2: ("Azul", "LANDSAT_OLI_B2"),
+    3: ("Verde", "LANDSAT_OLI_B3"),
+    4: ("Rojo", "LANDSAT_OLI_B4"),
+    5: ("NIR", "LANDSAT_OLI_B5"),
+    6: ("SWIR 1", "LANDSAT_OLI_B6"),
+    7: ("SWIR 2", "LANDSAT_OLI_B7"),
+}
+
+# Centre wavelength (um) and exo-atmospheric irradiance (W/m2/um) of each
+# band, used by the local approximation of 6S
+OLI_CENTERS = {1: 0.443, 2: 0.482, 3: 0.561, 4: 0.655, 5: 0.865, 6: 1.609, 7: 2.201}
+OLI_ESUN = {1: 1895.3, 2: 2004.6, 3: 1820.8, 4: 1549.4, 5: 951.2, 6: 247.6, 7: 85.5}
+
+# Atmosphere of the original single-pixel correction (tropical, Armero-Guayabal)
+DEFAULT_ATMOSPHERE = {
+    "view_z": 0.0,
+    "aero_profile": 1,     # Py6S AeroProfile.Continental
+    "water": 0.22,         # g/cm2
+    "ozone": 1.97,         # cm-atm
+    "aot550": 0.1,
+}
+
+
+def sun_distance(month, day):
+    """Earth-Sun distance (AU) for a day of the year."""
+    doy = date(2001, month, day).timetuple().tm_yday
+    return 1 - 0.01672 * np.cos(np.radians(0.9856 * (doy - 4)))
+
+
+def run_sixs(task, sixs_path=None):
+    """
+    Surface reflectance for one (params, band, aot, radiance) task with
+    Py6S (Lambertian correction from radiance). sixs_path may point to any
+    6S executable, e.g. a local build.
+    """
+    from Py6S import (AeroProfile, AtmosCorr, AtmosProfile, Geometry, PredefinedWavelengths,
+                      SixS, Wavelength)
+
+    params, band, aot, radiance = task
+    s = SixS(sixs_path)
+    s.geometry = Geometry.User()
+    s.geometry.solar_z = params["solar_z"]
+    s.geometry.view_z = params["view_z"]
+    s.geometry.month = params["month"]
+    s.geometry.day = params["day"]
+    s.aero_profile = AeroProfile.PredefinedType(params["aero_profile"])
+    s.aot550 = aot
+    s.atmos_profile = AtmosProfile.UserWaterAndOzone(params["water"], params["ozone"])
+    s.altitudes.set_target_sea_level()
+    s.altitudes.set_sensor_satellite_level()
+    s.atmos_corr = AtmosCorr.AtmosCorrLambertianFromRadiance(float(radiance))
+    s.wavelength = Wavelength(getattr(PredefinedWavelengths, OLI_BANDS[band][1]))
+    s.run()
+    return s.outputs.atmos_corrected_reflectance_lambertian
+
+
+def approximate_sixs(task):
+    """
+    Local stand-in for 6S (same task and result as run_sixs): Rayleigh and
+    aerosol single-scattering path reflectance, two-way transmittance and
+    spherical albedo, without gaseous absorption. Fast and dependency-free,
+    for tests and for machines without the 6S executable.
+    """
+    params, band, aot, radiance = task
+    wavelength = OLI_CENTERS[band]
+    mu_s, mu_v = np.cos(np.radians(params["solar_z"])), np.cos(np.radians(params["view_z"]))
+    tau_r = 0.008569 * wavelength ** -4 * (1 + 0.0113 * wavelength ** -2 + 0.00013 * wavelength ** -4)
+    tau_a = aot * (wavelength / 0.55) ** -1.3
+
+    rho_toa = np.pi * radiance * sun_distance(params["month"], params["day"]) ** 2 / (OLI_ESUN[band] * mu_s)
+    rho_path = (0.5 * tau_r + 0.17 * tau_a) / (2 * mu_v)
+    transmittance = np.exp(-(0.52 * tau_r + 0.16 * tau_a) * (1 / mu_s + 1 / mu_v))
+    albedo = 0.92 * tau_r * np.exp(-tau_r) + 0.33 * tau_a
+    y = (rho_toa - rho_path) / transmittance
+    return float(y / (1 + albedo * y))
+
+
+RUNNERS = {
+    "6S (Py6S)": run_sixs,
+    "Aproximacion local (sin 6S)": approximate_sixs,
+}
+
+
+class LookupTable:
+    """
+    Surface reflectance of each band on a grid of AOT x radiance nodes:
+    reflectance[b, a, r] for bands[b], aots[a] and radiances[b, r].
+    """
+
+    def __init__(self, bands, aots, radiances, reflectance):
+        self.bands = [int(band) for band in bands]
+        self.aots = np.asarray(aots, dtype=np.float64)
+        self.radiances = np.asarray(radiances, dtype=np.float64)
+        self.reflectance = np.asarray(reflectance, dtype=np.float64)
+
+    def curve(self, band, aot=None):
+        """(radiances, reflectance) nodes of a band, interpolated linearly in AOT."""
+        b = self.bands.index(band)
+        nodes = self.reflectance[b]
+        if aot is None or len(self.aots) == 1:
+            return self.radiances[b], nodes[0]
+        a = int(np.clip(np.searchsorted(self.aots, aot) - 1, 0, len(self.aots) - 2))
+        t = np.clip((aot - self.aots[a]) / (self.aots[a + 1] - self.aots[a]), 0, 1)
+        return self.radiances[b], (1 - t) * nodes[a] + t * nodes[a + 1]
+
+    def correct(self, band, radiance, aot=None, out=None):
+        """Surface reflectance (float32) of any array of radiances of a band."""
+        nodes, values = self.curve(band, aot)
+        result = np.interp(radiance, nodes, values)
+        if out is None:
+            return result.astype(np.float32)
+        out[...] = result
+        return out
+
+    def save(self, path):
+        """
+        Writes the table under a temporary name in the same directory and
+        moves it into place, so concurrent builds of the same key each
+        publish a whole file and readers never load a partial one.
+        """
+        fd, part = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + ".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, bands=self.bands, aots=self.aots, radiances=self.radiances,
+                         reflectance=self.reflectance)
+            os.replace(part, path)
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["bands"], data["aots"], data["radiances"], data["reflectance"])
+
+
+def radiance_nodes(gains, band, n=LUT_RADIANCES):
+    """Radiance grid covering every possible DN (1..65535) of a band."""
+    mult, add = gains[band]
+    return np.linspace(mult * 1 + add, mult * 65535 + add, n)
+
+
+def runner_id(runner):
+    """
+    Name of a runner for the cache key: module and qualified name of
+    functions, plus the bound arguments of a functools.partial (e.g. its
+    sixs_path). Other callables are keyed by their repr, so two differently
+    configured objects never share a table.
+    """
+    if isinstance(runner, functools.partial):
+        bound = [repr(arg) for arg in runner.args]
+        bound += [f"{key}={value!r}" for key, value in sorted(runner.keywords.items())]
+        return f"{runner_id(runner.func)}({', '.join(bound)})"
+    if hasattr(runner, "__qualname__"):
+        return f"{runner.__module__}.{runner.__qualname__}"
+    return repr(runner)
+
+
+def lut_key(params, bands, aots, radiances, runner):
+    """Cache key: everything that changes the 6S results."""
+    payload = json.dumps({
+        "params": {key: params[key] for key in sorted(params)},
+        "bands": list(bands),
+        "aots": [round(float(aot), 6) for aot in aots],
+        "radiances": np.round(radiances, 6).tolist(),
+        "runner": runner_id(runner),
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def build_lut(params, bands, gains, aots=None, runner=run_sixs, workers=DEFAULT_WORKERS,
+              n_radiances=LUT_RADIANCES, cache_dir=CACHE_DIR, on_progress=None):
+    """
+    Runs 6S (or the stand-in runner) for every band, AOT and radiance node
+    in a thread pool (each 6S run is an external process) and caches the
+    table on disk, keyed by the atmosphere, the nodes and the runner.
+    on_progress(done, total) is called as the runs finish.
+    """
+    aots = np.atleast_1d(params["aot550"] if aots is None else aots).astype(np.float64)
+    radiances = np.array([radiance_nodes(gains, band, n_radiances) for band in bands])
+    path = os.path.join(cache_dir, lut_key(params, bands, aots, radiances, runner) + ".npz")
+    if os.path.exists(path):
+        return LookupTable.load(path)
+
+    tasks = [(params, band, float(aot), float(radiance))
+             for b, band in enumerate(bands) for aot in aots for radiance in radiances[b]]
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for value in executor.map(runner, tasks):
+            results.append(value)
+            if on_progress is not None:
+                on_progress(len(results), len(tasks))
+
+    lut = LookupTable(bands, aots, radiances,
+                      np.reshape(results, (len(bands), len(aots), len(radiances[0]))))
+    os.makedirs(cache_dir, exist_ok=True)
+    lut.save(path)
+    return lut
+
+
+def correct_scene(src, dst_path, band_map, gains, lut, aot=None, on_window=None):
+    """
+    Surface reflectance of every pixel of every mapped band, window by
+    window: DN -> radiance (MTL gains) -> LUT interpolation. band_map maps
+    raster band numbers to OLI band numbers; DN 0 (fill) becomes NaN.
+    Writes a float32 multi-band GeoTIFF in the band_map order.
+    """
+    pool = BufferPool()
+    with rasterio.open(dst_path, "w", **output_profile(src, count=len(band_map))) as dst:
+        for k, (file_band, oli_band) in enumerate(band_map.items(), start=1):
+            dst.set_band_description(k, f"SR_B{oli_band}")
+        for window in iter_windows(src):
+            shape = window_shape(window)
+            dn = pool.get("dn", shape)
+            for k, (file_band, oli_band) in enumerate(band_map.items(), start=1):
+                src.read(file_band, window=window, out=dn)
+                mult, add = gains[oli_band]
+                values = lut.correct(oli_band, dn * np.float32(mult) + np.float32(add), aot,
+                                     out=pool.get("sr", shape))
+                values[dn == 0] = np.nan
+                dst.write(values, k, window=window)
+                if on_window is not None:
+                    on_window(oli_band, window, values)
+    return dst_path
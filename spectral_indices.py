@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+
+# --- Vectorized Vegetation Index Functions ---
+# Inputs may be scalars or arrays of any (broadcastable) shape. Zero
+# denominators give NaN through a mask instead of a branch, `out=` receives
+# the result in place. Inputs are promoted with float32: 8/16-bit integers
+# (e.g. uint8, uint16 DN) and float32 give float32, while 32/64-bit
+# integers, Python scalars and float64 give float64.
+
+
+def _prepare(*bands, dtype=None):
+    arrays = [np.asarray(band) for band in bands]
+    if dtype is None:
+        dtype = np.result_type(*arrays, np.float32)
+    return [array.astype(dtype, copy=False) for array in arrays], dtype
+
+
+def _output(out, dtype, *arrays):
+    if out is None:
+        out = np.empty(np.broadcast_shapes(*(array.shape for array in arrays)), dtype=dtype)
+    return out
+
+
+def _divide(numerator, denominator, out):
+    """out = numerator / denominator, NaN where the denominator is zero."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(numerator, denominator, out=out)
+    np.copyto(out, np.nan, where=denominator == 0)
+    return out
+
+
+def _result(out):
+    # Scalars in, scalar out (keeps the scenario page's formatting working)
+    return out[()] if out.ndim == 0 else out
+
+
+def calculate_ndvi(nir, red, out=None, dtype=None):
+    """NDVI = (NIR - Red) / (NIR + Red)"""
+    (nir, red), dtype = _prepare(nir, red, dtype=dtype)
+    out = _output(out, dtype, nir, red)
+    denominator = nir + red
+    np.subtract(nir, red, out=out)
+    return _result(_divide(out, denominator, out))
+
+
+def calculate_evi(nir, red, blue, L=1.0, C1=6.0, C2=7.5, G=2.5, out=None, dtype=None):
+    """EVI = G * ((NIR - Red) / (NIR + C1 * Red - C2 * Blue + L))"""
+    (nir, red, blue), dtype = _prepare(nir, red, blue, dtype=dtype)
+    out = _output(out, dtype, nir, red, blue)
+    denominator = nir + C1 * red - C2 * blue + L
+    np.subtract(nir, red, out=out)
+    _divide(out, denominator, out)
+    out *= G
+    return _result(out)
+
+
+def calculate_savi(nir, red, L=0.5, out=None, dtype=None):
+    """SAVI = ((NIR - Red) / (NIR + Red + L)) * (1 + L)"""
+    (nir, red), dtype = _prepare(nir, red, dtype=dtype)
+    out = _output(out, dtype, nir, red)
+    denominator = nir + red + L
+    np.subtract(nir, red, out=out)
+    _divide(out, denominator, out)
+    out *= 1 + L
+    return _result(out)
+
+
+# --- Benchmark ---
+def benchmark(pixels=4_000_000, repeats=5, dtype=np.float32):
+    """Per-pixel throughput (Mpx/s) of each function, with and without out=."""
+    rng = np.random.default_rng(0)
+    blue, red, nir = (rng.random(pixels).astype(dtype) for _ in range(3))
+    out = np.empty(pixels, dtype=dtype)
+    cases = {
+        "NDVI": lambda o: calculate_ndvi(nir, red, out=o),
+        "EVI": lambda o: calculate_evi(nir, red, blue, out=o),
+        "SAVI": lambda o: calculate_savi(nir, red, out=o),
+    }
+    rows = []
+
+    # Baseline: the former scalar function applied pixel by pixel
+    def scalar_ndvi(n, r):
+        if (n + r) == 0: return np.nan
+        return (n - r) / (n + r)
+
+    sample = min(pixels, 100_000)
+    start = time.perf_counter()
+    for i in range(sample):
+        scalar_ndvi(nir[i], red[i])
+    rows.append(("NDVI", "escalar", sample / (time.perf_counter() - start) / 1e6))
+
+    for name, func in cases.items():
+        for label, target in (("nuevo", None), ("out=", out)):
+            best = np.inf
+            for _ in range(repeats):
+                start = time.perf_counter()
+                func(target)
+                best = min(best, time.perf_counter() - start)
+            rows.append((name, label, pixels / best / 1e6))
+    return rows
+
+
+if __name__ == "__main__":
+    for dtype in (np.float32, np.float64):
+        print(f"--- {np.dtype(dtype).name} ---")
+        for name, label, mpx in benchmark(dtype=dtype):
+            print(f"{name:5s} {label:6s} {mpx:8.1f} Mpx/s")
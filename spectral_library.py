@@ -0,0 +1,197 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# --- Sensor spectral response functions ---
+# Bands as (center, FWHM) in nm. The responses are modelled as Gaussians with
+# these parameters (published band centers and widths), which is close enough
+# for broad-band simulation of the library signatures.
+SENSORS = {
+    "Landsat 8 OLI": {
+        "B1 Costero": (443.0, 16.0),
+        "B2 Azul": (482.0, 60.0),
+        "B3 Verde": (561.4, 57.0),
+        "B4 Rojo": (654.6, 38.0),
+        "B5 NIR": (864.7, 28.0),
+        "B9 Cirrus": (1373.4, 20.0),
+        "B6 SWIR1": (1608.9, 85.0),
+        "B7 SWIR2": (2200.7, 187.0),
+    },
+    "Sentinel-2 MSI": {
+        "B1 Costero": (442.7, 21.0),
+        "B2 Azul": (492.4, 66.0),
+        "B3 Verde": (559.8, 36.0),
+        "B4 Rojo": (664.6, 31.0),
+        "B5 Red Edge 1": (704.1, 15.0),
+        "B6 Red Edge 2": (740.5, 15.0),
+        "B7 Red Edge 3": (782.8, 20.0),
+        "B8 NIR": (832.8, 106.0),
+        "B8A NIR estrecho": (864.7, 21.0),
+        "B9 Vapor de agua": (945.1, 20.0),
+        "B10 Cirrus": (1373.5, 31.0),
+        "B11 SWIR1": (1613.7, 91.0),
+        "B12 SWIR2": (2202.4, 175.0),
+    },
+}
+SRF_STEP = 1.0      # Integration step of the responses (nm)
+SRF_SIGMAS = 3.0    # Responses are truncated at +-3 sigma
+
+
+# --- Sample signatures ---
+# Simplified spectral signatures of common materials (shared by the apps).
+# Wavelengths are in nanometers (nm).
+# Reflectance values are unitless (0 to 1).
+SAMPLE_WAVELENGTHS = np.arange(400, 2500, 20)
+SAMPLE_SIGNATURES = {
+    'Vegetacion': {
+        'reflectance': [
+            0.05, 0.05, 0.06, 0.07, 0.1, 0.12, 0.15, 0.25, 0.35, 0.45, 0.5, 0.5, 0.45,
+            0.4, 0.35, 0.3, 0.25, 0.2, 0.18, 0.16, 0.14, 0.12, 0.11, 0.1, 0.09, 0.08,
+            0.08, 0.07, 0.06, 0.06, 0.05, 0.05, 0.05, 0.04, 0.04, 0.03, 0.03, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+            0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02,
+        ]
+    },
+    'Agua': {
+        'reflectance': [
+            0.05, 0.04, 0.03, 0.02, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+        ]
+    },
+    'Suelo seco': {
+        'reflectance': [
+            0.15, 0.16, 0.17, 0.18, 0.2, 0.22, 0.24, 0.26, 0.28, 0.3, 0.32, 0.34, 0.36,
+            0.38, 0.4, 0.42, 0.44, 0.46, 0.48, 0.5, 0.52, 0.54, 0.56, 0.58, 0.6, 0.62,
+            0.64, 0.66, 0.68, 0.7, 0.72, 0.74, 0.76, 0.78, 0.8, 0.82, 0.84, 0.86,
+            0.88, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0, 1.02, 1.04, 1.06, 1.08, 1.1,
+            1.12, 1.14, 1.16, 1.18, 1.2, 1.22, 1.24, 1.26, 1.28, 1.3, 1.32, 1.34,
+            1.36, 1.38, 1.4, 1.42, 1.44, 1.46, 1.48, 1.5, 1.52, 1.54, 1.56, 1.58,
+            1.6, 1.62, 1.64, 1.66, 1.68, 1.7, 1.72, 1.74, 1.76, 1.78, 1.8, 1.82,
+            1.84, 1.86, 1.88, 1.9, 1.92, 1.94, 1.96, 1.98, 2.0, 2.02, 2.04, 2.06,
+            2.08, 2.1, 2.12, 2.14, 2.16, 2.18, 2.2,
+        ]
+    },
+    'Nieve/hielo': {
+        'reflectance': [
+            0.9, 0.9, 0.89, 0.88, 0.87, 0.85, 0.82, 0.79, 0.75, 0.7, 0.65, 0.6, 0.55,
+            0.5, 0.45, 0.4, 0.35, 0.3, 0.25, 0.2, 0.18, 0.16, 0.14, 0.12, 0.1, 0.08,
+            0.07, 0.06, 0.05, 0.04, 0.03, 0.02, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+            0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01,
+        ]
+    }
+}
+
+
+def band_centers(sensor):
+    return np.array([center for center, _ in SENSORS[sensor].values()], dtype=np.float32)
+
+
+def interpolation_matrix(wavelengths, grid):
+    """
+    (len(grid), len(wavelengths)) matrix W such that W @ values is the linear
+    interpolation of values (sampled at wavelengths) on grid. Outside the
+    sampled range the rows are zero.
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    matrix = np.zeros((len(grid), len(wavelengths)))
+    inside = (grid >= wavelengths[0]) & (grid <= wavelengths[-1])
+    rows = np.nonzero(inside)[0]
+    upper = np.clip(np.searchsorted(wavelengths, grid[inside], side="right"), 1, len(wavelengths) - 1)
+    lower = upper - 1
+    fraction = (grid[inside] - wavelengths[lower]) / (wavelengths[upper] - wavelengths[lower])
+    matrix[rows, lower] = 1 - fraction
+    matrix[rows, upper] += fraction
+    return matrix
+
+
+@functools.lru_cache(maxsize=16)
+def resampling_matrix(sensor, wavelengths):
+    """
+    (n_bands, n_wavelengths) float32 matrix that turns a spectrum sampled at
+    wavelengths (tuple, nm) into the band values of the sensor: the Gaussian
+    responses integrated on a fine grid against the linear interpolation of
+    the spectrum, normalized to unit area. Cached per sensor and sampling.
+    Bands whose response falls outside the sampled range get NaN rows.
+    """
+    bands = SENSORS[sensor]
+    low = min(center - SRF_SIGMAS * fwhm for center, fwhm in bands.values())
+    high = max(center + SRF_SIGMAS * fwhm for center, fwhm in bands.values())
+    grid = np.arange(np.floor(low), np.ceil(high) + SRF_STEP, SRF_STEP)
+
+    # One Gaussian per row: sigma = FWHM / (2 * sqrt(2 * ln 2))
+    centers = np.array([center for center, _ in bands.values()])[:, None]
+    sigmas = np.array([fwhm for _, fwhm in bands.values()])[:, None] / (2 * np.sqrt(2 * np.log(2)))
+    response = np.exp(-0.5 * ((grid - centers) / sigmas) ** 2)
+    response[np.abs(grid - centers) > SRF_SIGMAS * sigmas] = 0
+
+    # Only the part of each response covered by the library counts
+    interp = interpolation_matrix(wavelengths, grid)
+    covered = response * interp.sum(axis=1)
+    area = covered.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = (response @ interp) / area
+    return matrix.astype(np.float32)
+
+
+class SpectralLibrary:
+    """
+    Signatures stored as one float32 matrix (n_materials, n_wavelengths).
+    resample() simulates a sensor for the whole library with one matrix
+    product and keeps the result per sensor.
+    """
+
+    def __init__(self, wavelengths, names, reflectance):
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float32)
+        self.names = list(names)
+        self.reflectance = np.asarray(reflectance, dtype=np.float32)
+        self._resampled = {}
+
+    @classmethod
+    def from_dict(cls, wavelengths, spectral_data):
+        """From {name: {'reflectance': values}} sampled at wavelengths."""
+        names = list(spectral_data)
+        reflectance = np.empty((len(names), len(wavelengths)), dtype=np.float32)
+        for i, name in enumerate(names):
+            values = np.asarray(spectral_data[name]["reflectance"], dtype=np.float32)
+            if len(values) != len(wavelengths):
+                raise ValueError(f"La firma '{name}' tiene {len(values)} valores "
+                                 f"para {len(wavelengths)} longitudes de onda.")
+            reflectance[i] = values
+        return cls(wavelengths, names, reflectance)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def sample(cls):
+        return cls.from_dict(SAMPLE_WAVELENGTHS, SAMPLE_SIGNATURES)
+
+    def __getitem__(self, name):
+        return self.reflectance[self.names.index(name)]
+
+    def resample(self, sensor):
+        """(n_materials, n_bands) band values of the library for a sensor."""
+        if sensor not in self._resampled:
+            matrix = resampling_matrix(sensor, tuple(self.wavelengths.tolist()))
+            self._resampled[sensor] = self.reflectance @ matrix.T
+        return self._resampled[sensor]
+
+    def to_frame(self, sensor):
+        return pd.DataFrame(self.resample(sensor), index=self.names, columns=list(SENSORS[sensor]))
@@ -0,0 +1,116 @@
+import numpy as np
+
+from spectral_library import interpolation_matrix
+
+# --- Configuration ---
+METHODS = {
+    "SAM": "Angulo espectral (rad)",
+    "SID": "Divergencia de informacion espectral",
+    "Euclidiana": "Distancia euclidiana",
+}
+BLOCK_PIXELS = 65_536   # Pixels matched per matrix product
+EPSILON = 1e-12         # Floor for norms, sums and logarithms
+
+
+def library_at(library, wavelengths):
+    """
+    Library resampled to the cube wavelengths with one matrix product.
+    Returns (band mask, spectra) where the mask keeps the cube bands covered
+    by the library sampling and spectra is (n_materials, n_kept_bands).
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    keep = (wavelengths >= library.wavelengths[0]) & (wavelengths <= library.wavelengths[-1])
+    matrix = interpolation_matrix(library.wavelengths, wavelengths[keep]).astype(np.float32)
+    return keep, library.reflectance @ matrix.T
+
+
+class SpectralMatcher:
+    """
+    Scores every pixel against every library spectrum with batched matrix
+    products. All the per-library terms (norms, normalized spectra, logs)
+    are computed once; each block of pixels then costs one or two
+    (pixels x bands) @ (bands x materials) products:
+
+    - SAM: arccos of (x / |x|) . (r / |r|)
+    - SID: sum (p - q)(log p - log q) with p, q the spectra scaled to unit
+      sum, expanded as sum p log p + sum q log q - p . log q - log p . q
+    - Euclidiana: sqrt(|x|^2 + |r|^2 - 2 x . r)
+
+    Lower scores are better for the three methods.
+    """
+
+    def __init__(self, spectra, method="SAM"):
+        if method not in METHODS:
+            raise ValueError(f"Metodo desconocido: {method}")
+        self.method = method
+        spectra = np.asarray(spectra, dtype=np.float32)
+        if method == "SAM":
+            norms = np.maximum(np.linalg.norm(spectra, axis=1, keepdims=True), EPSILON)
+            self.reference = (spectra / norms).T
+        elif method == "SID":
+            q = np.maximum(spectra, EPSILON)
+            q /= q.sum(axis=1, keepdims=True)
+            log_q = np.log(q)
+            self.reference = q.T
+            self.log_reference = log_q.T
+            self.entropy = (q * log_q).sum(axis=1)
+        else:
+            self.reference = spectra.T
+            self.squared_norms = (spectra * spectra).sum(axis=1)
+
+    def scores(self, pixels):
+        """(n_pixels, n_materials) float32 scores of an (n_pixels, bands) block."""
+        pixels = np.asarray(pixels, dtype=np.float32)
+        if self.method == "SAM":
+            norms = np.maximum(np.linalg.norm(pixels, axis=1, keepdims=True), EPSILON)
+            cosine = (pixels / norms) @ self.reference
+            np.clip(cosine, -1.0, 1.0, out=cosine)
+            return np.arccos(cosine, out=cosine)
+        if self.method == "SID":
+            p = np.maximum(pixels, EPSILON)
+            p /= p.sum(axis=1, keepdims=True)
+            log_p = np.log(p)
+            score = (p * log_p).sum(axis=1, keepdims=True) + self.entropy
+            score -= p @ self.log_reference
+            score -= log_p @ self.reference
+            return np.maximum(score, 0.0, out=score)
+        distance = pixels @ self.reference
+        distance *= -2.0
+        distance += (pixels * pixels).sum(axis=1, keepdims=True)
+        distance += self.squared_norms
+        np.maximum(distance, 0.0, out=distance)
+        return np.sqrt(distance, out=distance)
+
+    def match(self, cube, block_pixels=BLOCK_PIXELS, bands=None, scale=1.0):
+        """
+        Best-match index and score maps of a (rows, cols, bands) cube (array,
+        memmap or any object sliced the same way), matched by blocks of whole
+        rows so the full score table is never built. bands optionally selects
+        the cube bands to use; scale converts the cube values (e.g. DN) to
+        the units of the library.
+        """
+        rows, cols = cube.shape[:2]
+        best = np.empty((rows, cols), dtype=np.int16)
+        best_score = np.empty((rows, cols), dtype=np.float32)
+        step = max(1, block_pixels // cols)
+        for start in range(0, rows, step):
+            block = cube[start:start + step]
+            if bands is not None:
+                block = block[..., bands]
+            pixels = block.reshape(-1, block.shape[-1])
+            if scale != 1.0:
+                pixels = pixels * np.float32(scale)
+            score = self.scores(pixels)
+            index = score.argmin(axis=1)
+            n = len(block)
+            best[start:start + n] = index.reshape(n, cols)
+            best_score[start:start + n] = np.take_along_axis(score, index[:, None], axis=1).reshape(n, cols)
+        return best, best_score
+
+
+def match_cube(cube, wavelengths, library, method="SAM", block_pixels=BLOCK_PIXELS, scale=1.0):
+    """Best-match and score maps of a cube against a SpectralLibrary."""
+    keep, spectra = library_at(library, wavelengths)
+    matcher = SpectralMatcher(spectra, method)
+    return matcher.match(cube, block_pixels, bands=None if keep.all() else np.nonzero(keep)[0],
+                         scale=scale)
@@ -0,0 +1,134 @@
+import numpy as np
+
+# --- Configuration ---
+TILE = 512              # Tile side (cells) for large DEMs
+TPI_RADIUS = 3          # TPI neighbourhood: (2r + 1) x (2r + 1) cells
+SUN_AZIMUTH = 315.0     # Hillshade illumination (degrees from north, clockwise)
+SUN_ALTITUDE = 45.0     # Hillshade sun elevation (degrees)
+
+LAYERS = {
+    "hillshade": "Sombreado (hillshade)",
+    "slope": "Pendiente (grados)",
+    "aspect": "Orientacion (grados)",
+    "curvature": "Curvatura",
+    "tpi": "Indice de posicion topografica (TPI)",
+    "roughness": "Rugosidad",
+}
+
+
+def _neighbours(z):
+    """
+    The nine shifted views a..i of a padded tile (3 x 3 window, row-major):
+        a b c
+        d e f
+        g h i
+    each with the shape of the interior.
+    """
+    rows, cols = z.shape[0] - 2, z.shape[1] - 2
+    return [z[r:r + rows, c:c + cols] for r in range(3) for c in range(3)]
+
+
+def _gradients(window, cellsize):
+    """Horn (3rd order) finite differences dz/dx (east) and dz/dy (south)."""
+    a, b, c, d, _, f, g, h, i = window
+    dzdx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * cellsize)
+    dzdy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8 * cellsize)
+    return dzdx, dzdy
+
+
+def slope(dzdx, dzdy):
+    return np.degrees(np.arctan(np.hypot(dzdx, dzdy)))
+
+
+def aspect(dzdx, dzdy):
+    """Downslope direction in degrees clockwise from north (0-360); flat cells give -1."""
+    # Rows grow southwards, so north is -dzdy
+    value = np.degrees(np.arctan2(-dzdx, dzdy))
+    value = np.mod(value, 360.0)
+    value[(dzdx == 0) & (dzdy == 0)] = -1
+    return value
+
+
+def hillshade(dzdx, dzdy, azimuth=SUN_AZIMUTH, altitude=SUN_ALTITUDE):
+    """Lambertian shading 0-255 for the sun at azimuth/altitude."""
+    zenith = np.radians(90.0 - altitude)
+    sun = np.radians(azimuth)
+    slope_rad = np.arctan(np.hypot(dzdx, dzdy))
+    aspect_rad = np.arctan2(-dzdx, dzdy)
+    shade = (np.cos(zenith) * np.cos(slope_rad)
+             + np.sin(zenith) * np.sin(slope_rad) * np.cos(sun - aspect_rad))
+    return 255.0 * np.clip(shade, 0, 1)
+
+
+def curvature(window, cellsize):
+    """Total curvature (Zevenbergen & Thorne), positive on convex cells (1/100 units)."""
+    _, b, _, d, e, f, _, h, _ = window
+    d_xx = ((d + f) / 2 - e) / cellsize ** 2
+    d_yy = ((b + h) / 2 - e) / cellsize ** 2
+    return -200.0 * (d_xx + d_yy)
+
+
+def roughness(window):
+    """Largest elevation difference inside the 3 x 3 window."""
+    return np.maximum.reduce(window) - np.minimum.reduce(window)
+
+
+def tpi(z, radius):
+    """
+    Elevation minus the mean of its (2r + 1)^2 - 1 neighbours, from a
+    summed-area table of the padded tile (halo = radius).
+    """
+    size = 2 * radius + 1
+    table = np.zeros((z.shape[0] + 1, z.shape[1] + 1))
+    np.cumsum(np.cumsum(z, axis=0), axis=1, out=table[1:, 1:])
+    rows, cols = z.shape[0] - 2 * radius, z.shape[1] - 2 * radius
+    window_sum = (table[size:size + rows, size:size + cols] - table[:rows, size:size + cols]
+                  - table[size:size + rows, :cols] + table[:rows, :cols])
+    center = z[radius:radius + rows, radius:radius + cols]
+    return center - (window_sum - center) / (size * size - 1)
+
+
+def terrain_tile(padded, cellsize, layers, halo, tpi_radius=TPI_RADIUS):
+    """Derivatives of one tile padded with `halo` cells on every side."""
+    inner = padded[halo - 1:padded.shape[0] - halo + 1, halo - 1:padded.shape[1] - halo + 1]
+    window = _neighbours(inner)
+    dzdx, dzdy = _gradients(window, cellsize)
+    result = {}
+    if "hillshade" in layers:
+        result["hillshade"] = hillshade(dzdx, dzdy)
+    if "slope" in layers:
+        result["slope"] = slope(dzdx, dzdy)
+    if "aspect" in layers:
+        result["aspect"] = aspect(dzdx, dzdy)
+    if "curvature" in layers:
+        result["curvature"] = curvature(window, cellsize)
+    if "roughness" in layers:
+        result["roughness"] = roughness(window)
+    if "tpi" in layers:
+        offset = halo - tpi_radius
+        result["tpi"] = tpi(padded[offset:padded.shape[0] - offset, offset:padded.shape[1] - offset], tpi_radius)
+    return result
+
+
+def compute_terrain(dem, cellsize=1.0, layers=tuple(LAYERS), tile=TILE, tpi_radius=TPI_RADIUS, out=None):
+    """
+    Terrain derivatives of a (rows, cols) DEM (array or memmap), tile by tile.
+    Each tile is read with a halo large enough for the widest kernel; at the
+    DEM borders the halo repeats the edge cells. out may map layer names to
+    preallocated float32 arrays or memmaps.
+    """
+    rows, cols = dem.shape
+    halo = max(1, tpi_radius if "tpi" in layers else 1)
+    if out is None:
+        out = {name: np.empty((rows, cols), dtype=np.float32) for name in layers}
+    for top in range(0, rows, tile):
+        for left in range(0, cols, tile):
+            bottom, right = min(rows, top + tile), min(cols, left + tile)
+            r0, r1 = max(0, top - halo), min(rows, bottom + halo)
+            c0, c1 = max(0, left - halo), min(cols, right + halo)
+            block = np.asarray(dem[r0:r1, c0:c1], dtype=np.float64)
+            padded = np.pad(block, ((halo - (top - r0), halo - (r1 - bottom)),
+                                    (halo - (left - c0), halo - (c1 - right))), mode="edge")
+            for name, values in terrain_tile(padded, cellsize, layers, halo, tpi_radius).items():
+                out[name][top:bottom, left:right] = values
+    return out
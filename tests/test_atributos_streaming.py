@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_selection import chi2, f_regression
+from sklearn.preprocessing import LabelEncoder
+
+from atributos_streaming import StreamingFeatureScorer, score_chunks
+
+
+def _score(frame, target, chunksize=700):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False)
+    buffer.seek(0)
+    scorer, _, _, _ = score_chunks(pd.read_csv(buffer, chunksize=chunksize), target)
+    return scorer
+
+
+def test_f_regression_numeric_target():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, 4))
+    y = X @ [1.0, 0.0, -2.0, 0.5] + rng.normal(size=5000)
+    scorer = StreamingFeatureScorer(4)
+    for start in range(0, 5000, 333):
+        scorer.partial_fit(X[start:start + 333], y[start:start + 333])
+    expected, expected_p = f_regression(X, y)
+    scores, p_values = scorer.f_regression()
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+    np.testing.assert_allclose(p_values, expected_p, rtol=1e-6, atol=1e-300)
+
+
+def test_chi2_class_target():
+    rng = np.random.default_rng(1)
+    X = rng.integers(0, 20, size=(3000, 5)).astype(float)
+    y = rng.integers(0, 4, size=3000)
+    frame = pd.DataFrame(X, columns=list("abcde")).assign(clase=y)
+    expected, expected_p = chi2(X, y)
+    scores, p_values = _score(frame, "clase").chi2()
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+    np.testing.assert_allclose(p_values, expected_p, rtol=1e-6)
+
+
+def test_f_regression_many_text_labels():
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(8000, 3))
+    labels = np.array([f"id{v}" for v in rng.integers(0, 2000, 8000)])
+    frame = pd.DataFrame(X, columns=list("abc")).assign(t=labels)
+    expected, _ = f_regression(X, LabelEncoder().fit_transform(labels))
+    scores, _ = _score(frame, "t").f_regression()
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+
+
+def test_numeric_then_text_target_is_label_encoded():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(3000, 2))
+    labels = np.where(np.arange(3000) < 1500, rng.integers(0, 3, 3000).astype(str), "x")
+    frame = pd.DataFrame(X, columns=list("ab")).assign(t=labels)
+    expected, _ = f_regression(X, LabelEncoder().fit_transform(labels))
+    scores, _ = _score(frame, "t").f_regression()
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+
+
+def test_chi2_rejects_negative_features():
+    scorer = StreamingFeatureScorer(1).partial_fit(np.array([[-1.0], [2.0]]), np.array([0, 1]))
+    with pytest.raises(ValueError):
+        scorer.chi2()
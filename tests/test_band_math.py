@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from band_math import compile_plan
+from veg_index_engine import BufferPool
+
+
+def _evaluate(expressions, bands):
+    plan = compile_plan(tuple(expressions))
+    shape = next(iter(bands.values())).shape
+    return [values.copy() for _, values in plan.evaluate(bands, BufferPool(), shape)]
+
+
+@pytest.fixture
+def bands():
+    rng = np.random.default_rng(0)
+    return {name: rng.uniform(0.01, 1, (64, 48)).astype(np.float32) for name in ("nir", "red", "green")}
+
+
+def test_plan_matches_numpy(bands):
+    nir, red, green = (bands[name].astype(np.float64) for name in ("nir", "red", "green"))
+    expressions = [
+        "(nir - red) / (nir + red)",
+        "1.5 * (nir - red) / (nir + red + 0.5)",
+        "sqrt(nir) + log(green) - exp(-red) ** 2",
+        "min(nir, red) / max(green, 0.2) + abs(-nir)",
+        "(nir - red) / (nir + red) - (green - red) / (green + red)",
+    ]
+    expected = [
+        (nir - red) / (nir + red),
+        1.5 * (nir - red) / (nir + red + 0.5),
+        np.sqrt(nir) + np.log(green) - np.exp(-red) ** 2,
+        np.minimum(nir, red) / np.maximum(green, 0.2) + np.abs(-nir),
+        (nir - red) / (nir + red) - (green - red) / (green + red),
+    ]
+    for result, reference in zip(_evaluate(expressions, bands), expected):
+        np.testing.assert_allclose(result, reference, rtol=1e-5, atol=1e-6)  # float32 windows
+
+
+def test_zero_denominator_is_nan(bands):
+    (result,) = _evaluate(["nir / (red - red)"], bands)
+    assert np.isnan(result).all()
+
+
+def test_constant_folding_follows_numpy(bands):
+    results = _evaluate(["10 ** 1000 + nir", "(-8) ** (1 / 3) + nir", "exp(1000)"], bands)
+    assert np.isposinf(results[0]).all()
+    assert np.isnan(results[1]).all()
+    assert np.isposinf(results[2]).all()
+
+
+@pytest.mark.parametrize("expression", [
+    "-" * 3000 + "nir",
+    "+".join(["nir"] * 3000),
+    "__import__('os')",
+    "nir +",
+])
+def test_invalid_expressions_raise_value_error(expression):
+    with pytest.raises(ValueError):
+        compile_plan((expression,))
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from pyproj import Geod
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+
+from class_area import class_areas, class_counts, geodesic_row_areas
+
+
+def _dataset(memfile, classes, crs, transform):
+    with memfile.open(driver="GTiff", height=classes.shape[0], width=classes.shape[1], count=1,
+                      dtype=classes.dtype.name, crs=crs, transform=transform,
+                      tiled=True, blockxsize=16, blockysize=16) as dst:
+        dst.write(classes, 1)
+    return memfile.open()
+
+
+def _unique(classes):
+    values = classes.ravel()
+    if values.dtype.kind == "f":
+        values = values[np.isfinite(values)]
+    return np.unique(values, return_counts=True)
+
+
+@pytest.mark.parametrize("classes", [
+    np.random.default_rng(0).integers(0, 7, (50, 70)).astype(np.uint8),
+    np.random.default_rng(1).integers(-5, 5, (50, 70)).astype(np.int16),
+    # Values too far apart for the dense table
+    np.random.default_rng(2).choice([-2_000_000, 0, 3, 2_000_000], (50, 70)).astype(np.int32),
+])
+def test_class_counts_match_numpy(classes):
+    with MemoryFile() as memfile, _dataset(memfile, classes, "EPSG:32618", from_origin(0, 0, 30, 30)) as src:
+        values, counts = class_counts(src)
+    expected_values, expected_counts = _unique(classes)
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(counts, expected_counts)
+
+
+def test_class_counts_ignore_non_finite_floats():
+    classes = np.random.default_rng(3).integers(1, 4, (40, 40)).astype(np.float32)
+    classes[::3, ::5] = np.nan
+    classes[7] = np.inf
+    with MemoryFile() as memfile, _dataset(memfile, classes, "EPSG:32618", from_origin(0, 0, 30, 30)) as src:
+        values, counts = class_counts(src)
+    expected_values, expected_counts = _unique(classes)
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(counts, expected_counts)
+
+
+def test_projected_areas_are_count_times_pixel_area():
+    classes = np.random.default_rng(4).integers(1, 5, (40, 40)).astype(np.uint8)
+    with MemoryFile() as memfile, _dataset(memfile, classes, "EPSG:32618", from_origin(0, 0, 30, 20)) as src:
+        values, counts, areas = class_areas(src)
+    np.testing.assert_allclose(areas, counts * 600.0)
+
+
+def test_geodesic_row_areas_match_pyproj():
+    # Small cells: pyproj joins the corners with geodesics, the grid follows parallels
+    geod = Geod(ellps="WGS84")
+    for north in (0.5, 30.0, 60.0, 85.0):
+        areas = geodesic_row_areas(from_origin(-75.0, north, 0.01, 0.01), 3)
+        for row in range(3):
+            top, bottom = north - 0.01 * row, north - 0.01 * (row + 1)
+            expected, _ = geod.polygon_area_perimeter([-75.0, -74.99, -74.99, -75.0], [bottom, bottom, top, top])
+            np.testing.assert_allclose(areas[row], abs(expected), rtol=1e-7)
+
+
+def test_geographic_class_areas_match_pyproj():
+    classes = np.random.default_rng(5).integers(1, 4, (40, 30)).astype(np.uint8)
+    transform = from_origin(-74.2, 4.8, 0.01, 0.01)
+    with MemoryFile() as memfile, _dataset(memfile, classes, "EPSG:4326", transform) as src:
+        values, counts, areas = class_areas(src)
+
+    geod = Geod(ellps="WGS84")
+    row_areas = np.array([abs(geod.polygon_area_perimeter(
+        [-74.2, -74.19, -74.19, -74.2], [4.8 - 0.01 * (r + 1)] * 2 + [4.8 - 0.01 * r] * 2)[0]) for r in range(40)])
+    expected = [(row_areas[:, None] * (classes == value)).sum() for value in values]
+    np.testing.assert_allclose(areas, expected, rtol=1e-6)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from scipy import linalg
+
+from klt_engine import NOISE_RIDGE, accumulate, fit, project_cube, reconstruct_cube
+
+
+@pytest.fixture
+def cube():
+    rng = np.random.default_rng(0)
+    mixing = rng.normal(size=(4, 12))
+    sources = rng.normal(size=(60, 50, 4)) * np.array([5.0, 3.0, 1.0, 0.5])
+    return (sources @ mixing + rng.normal(0, 0.1, (60, 50, 12)) + 100).astype(np.float32)
+
+
+def test_covariance_matches_numpy(cube):
+    pixels = cube.reshape(-1, 12).astype(np.float64)
+    signal, _ = accumulate(cube, block_pixels=700)
+    np.testing.assert_allclose(signal.mean, pixels.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(signal.covariance(), np.cov(pixels, rowvar=False), rtol=1e-9, atol=1e-9)
+
+
+def test_covariance_skips_non_finite_pixels(cube):
+    cube = cube.copy()
+    cube[3, 4, 2] = np.nan
+    cube[10, :, 0] = np.inf
+    pixels = cube.reshape(-1, 12).astype(np.float64)
+    pixels = pixels[np.isfinite(pixels).all(axis=1)]
+    signal, _ = accumulate(cube, block_pixels=700)
+    assert signal.n == len(pixels)
+    np.testing.assert_allclose(signal.covariance(), np.cov(pixels, rowvar=False), rtol=1e-9, atol=1e-9)
+
+
+def test_pca_matches_eigh(cube):
+    pixels = cube.reshape(-1, 12).astype(np.float64)
+    eigenvalues, vectors = np.linalg.eigh(np.cov(pixels, rowvar=False))
+    eigenvalues, vectors = eigenvalues[::-1], vectors[:, ::-1]
+    transform = fit(cube, "PCA", block_pixels=700)
+    np.testing.assert_allclose(transform.eigenvalues, np.maximum(eigenvalues, 0), rtol=1e-8, atol=1e-8)
+    # Eigenvectors are defined up to sign; compare the well-separated leading ones
+    for j in range(4):
+        np.testing.assert_allclose(abs(transform.vectors[:, j] @ vectors[:, j]), 1, rtol=1e-8)
+
+    scores = project_cube(cube, transform, [0, 1], block_pixels=700).reshape(-1, 2)
+    expected = (pixels - pixels.mean(axis=0)) @ transform.vectors[:, :2]
+    np.testing.assert_allclose(scores, expected, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize("method", ["PCA", "MNF"])
+def test_full_reconstruction_is_identity(cube, method):
+    transform = fit(cube, method, block_pixels=700)
+    restored = reconstruct_cube(cube, transform, k=12, bands=[0, 5, 11], block_pixels=700)
+    np.testing.assert_allclose(restored, cube[..., [0, 5, 11]], rtol=1e-5, atol=1e-3)
+
+
+def test_mnf_solves_generalized_eigenproblem(cube):
+    pixels = cube.astype(np.float64)
+    differences = (pixels[:, 1:] - pixels[:, :-1]).reshape(-1, 12)
+    noise = np.cov(differences, rowvar=False) / 2
+    noise += NOISE_RIDGE * np.trace(noise) / 12 * np.eye(12)
+    signal = np.cov(pixels.reshape(-1, 12), rowvar=False)
+    expected = linalg.eigh(signal, noise, eigvals_only=True)[::-1]
+
+    transform = fit(cube, "MNF", block_pixels=700)
+    np.testing.assert_allclose(transform.eigenvalues, expected, rtol=1e-8)
+    # Noise is whitened: vectors^T N vectors = I
+    np.testing.assert_allclose(transform.vectors.T @ noise @ transform.vectors, np.eye(12), atol=1e-8)
+
+
+def test_unknown_method_raises(cube):
+    with pytest.raises(ValueError):
+        fit(cube, "ICA")
@@ -0,0 +1,53 @@
+import numpy as np
+
+from raster_stats import HISTOGRAM_BINS, StreamingStats
+
+
+def _accumulate(windows):
+    stats = StreamingStats()
+    for window in windows:
+        stats.update(window)
+    return stats
+
+
+def test_moments_match_numpy():
+    rng = np.random.default_rng(0)
+    windows = [rng.normal(loc, 1, 5000).astype(np.float32) for loc in (0, 3, -2, 10)]
+    windows[1][::7] = np.nan
+    windows[2][::11] = np.inf
+    stats = _accumulate(windows)
+    values = np.concatenate(windows).astype(np.float64)
+    values = values[np.isfinite(values)]
+    assert stats.n == values.size
+    np.testing.assert_allclose(stats.mean, values.mean(), rtol=1e-9)
+    np.testing.assert_allclose(stats.std, values.std(), rtol=1e-9)
+    assert stats.min == values.min() and stats.max == values.max()
+
+
+def test_quantiles_within_bin_bound():
+    rng = np.random.default_rng(1)
+    # Narrow first window, then windows that force the range to double both ways
+    windows = [rng.uniform(0.4, 0.5, 2000), rng.uniform(-1, 1, 20000), rng.uniform(0.9, 3, 20000)]
+    stats = _accumulate(windows)
+    values = np.concatenate(windows)
+    bound = max(4 * (values.max() - values.min()), 2) / HISTOGRAM_BINS
+    assert stats.width <= bound
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        assert abs(stats.quantile(q) - np.quantile(values, q)) <= stats.width
+
+
+def test_histogram_counts_every_value():
+    values = np.random.default_rng(2).gamma(2, size=30000)
+    stats = _accumulate(np.array_split(values, 7))
+    counts, edges = stats.histogram(bins=50)
+    assert len(edges) == 51 and edges[0] == values.min() and edges[-1] == values.max()
+    np.testing.assert_allclose(counts.sum(), values.size)
+    expected, _ = np.histogram(values, bins=edges)
+    assert np.abs(counts - expected).max() <= 0.02 * values.size
+
+
+def test_without_finite_values():
+    stats = _accumulate([np.full(10, np.nan), np.array([np.inf, -np.inf])])
+    counts, edges = stats.histogram()
+    assert stats.n == 0 and counts.size == 0 and edges.size == 0
+    assert np.isnan(stats.quantile(0.5)) and np.isnan(stats.std)
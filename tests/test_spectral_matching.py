@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from spectral_matching import SpectralMatcher
+
+
+def _reference_scores(pixels, spectra, method):
+    """Direct per-pair definitions of the three measures."""
+    pixels, spectra = pixels.astype(np.float64), spectra.astype(np.float64)
+    scores = np.empty((len(pixels), len(spectra)))
+    for i, x in enumerate(pixels):
+        for j, r in enumerate(spectra):
+            if method == "SAM":
+                cosine = x @ r / (np.linalg.norm(x) * np.linalg.norm(r))
+                scores[i, j] = np.arccos(np.clip(cosine, -1, 1))
+            elif method == "SID":
+                p, q = x / x.sum(), r / r.sum()
+                scores[i, j] = np.sum(p * np.log(p / q)) + np.sum(q * np.log(q / p))
+            else:
+                scores[i, j] = np.linalg.norm(x - r)
+    return scores
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    spectra = rng.uniform(0.05, 0.6, (6, 40)).astype(np.float32)
+    pixels = (spectra[rng.integers(0, 6, 300)] * rng.uniform(0.8, 1.2, (300, 1))
+              + rng.normal(0, 0.01, (300, 40))).astype(np.float32)
+    return np.abs(pixels) + 0.01, spectra
+
+
+@pytest.mark.parametrize("method", ["SAM", "SID", "Euclidiana"])
+def test_scores_match_definitions(data, method):
+    pixels, spectra = data
+    scores = SpectralMatcher(spectra, method).scores(pixels)
+    np.testing.assert_allclose(scores, _reference_scores(pixels, spectra, method), rtol=1e-3, atol=2e-3)
+
+
+@pytest.mark.parametrize("method", ["SAM", "SID", "Euclidiana"])
+def test_match_by_blocks_matches_argmin(data, method):
+    pixels, spectra = data
+    cube = pixels.reshape(20, 15, 40)
+    best, best_score = SpectralMatcher(spectra, method).match(cube, block_pixels=45)
+    reference = _reference_scores(pixels, spectra, method)
+    np.testing.assert_array_equal(best.ravel(), reference.argmin(axis=1))
+    np.testing.assert_allclose(best_score.ravel(), reference.min(axis=1), rtol=1e-3, atol=2e-3)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        SpectralMatcher(np.ones((2, 3)), "otro")
@@ -0,0 +1,182 @@
+import os
+import re
+import tempfile
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+import rasterio
+
+from band_math import compile_plan, resolve_bands
+from veg_index_engine import (DEFAULT_BAND_MAP, BufferPool, iter_windows, output_profile,
+                              read_bands, window_shape)
+
+# --- Configuration ---
+DEFAULT_PERCENTILES = (10, 90)
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DATE_PATTERN = re.compile(r"(\d{4})[-_]?(\d{2})[-_]?(\d{2})")
+
+
+def date_from_name(name):
+    """Acquisition date from a file name (YYYYMMDD, YYYY-MM-DD or YYYY_MM_DD)."""
+    match = DATE_PATTERN.search(name)
+    if match is None:
+        return None
+    try:
+        return date(*(int(part) for part in match.groups()))
+    except ValueError:
+        return None
+
+
+def layer_names(percentiles=DEFAULT_PERCENTILES):
+    return (["max", "fecha_max", "mediana"]
+            + [f"p{p}" for p in percentiles]
+            + ["tendencia_anual", "anomalia_ultima"])
+
+
+def check_grid(paths):
+    """Raises ValueError when the scenes are not co-registered (same grid)."""
+    grid = None
+    for path in paths:
+        with rasterio.open(path) as src:
+            current = (src.width, src.height, tuple(src.transform), src.crs)
+        if grid is None:
+            grid = current
+        elif current != grid:
+            raise ValueError(f"La escena {os.path.basename(str(path))} no esta co-registrada con la primera.")
+
+
+def nan_percentiles(stack, qs, n_valid):
+    """
+    Percentiles along the time axis ignoring NaN (linear interpolation, like
+    np.nanpercentile), from one sort of the stack: NaN sorts last, so the
+    valid values of each pixel are the first n_valid entries.
+    """
+    ordered = np.sort(stack, axis=0)
+    last = np.maximum(n_valid - 1, 0)
+    result = []
+    for q in qs:
+        position = last * (q / 100)
+        below = np.floor(position).astype(np.intp)
+        above = np.minimum(below + 1, last)
+        fraction = (position - below).astype(np.float32)
+        low = np.take_along_axis(ordered, below[None], axis=0)[0]
+        high = np.take_along_axis(ordered, above[None], axis=0)[0]
+        value = low + (high - low) * fraction
+        value[n_valid == 0] = np.nan
+        result.append(value)
+    return result
+
+
+def composite_window(stack, years, percentiles=DEFAULT_PERCENTILES):
+    """
+    Per-pixel composites of a (T, rows, cols) index stack:
+    max, date index of the max, median, percentiles, least-squares trend
+    (index units per year) and anomaly of the last date against the mean
+    of the previous ones. NaN is ignored; all-NaN pixels give NaN.
+    """
+    valid = np.isfinite(stack)
+    n_valid = valid.sum(axis=0)
+    empty = n_valid == 0
+
+    layers = [np.fmax.reduce(stack, axis=0)]
+
+    argmax = np.where(valid, stack, -np.inf).argmax(axis=0).astype(np.float32)
+    argmax[empty] = np.nan
+    layers.append(argmax)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        layers.extend(nan_percentiles(stack, [50, *percentiles], n_valid))
+
+        # Trend: slope of index vs. time over the valid dates of each pixel
+        t = np.where(valid, years[:, None, None], 0.0)
+        y = np.where(valid, stack, 0.0)
+        t_mean = t.sum(axis=0) / n_valid
+        y_mean = y.sum(axis=0) / n_valid
+        t_dev = np.where(valid, t - t_mean, 0.0)
+        slope = (t_dev * (y - y_mean)).sum(axis=0) / (t_dev * t_dev).sum(axis=0)
+        layers.append(slope)
+
+        history = np.nanmean(stack[:-1], axis=0) if len(stack) > 1 else np.full(stack.shape[1:], np.nan)
+        layers.append(stack[-1] - history)
+
+    return np.stack([np.asarray(layer, dtype=np.float32) for layer in layers])
+
+
+def composite_time_series(paths, dates, expression, dst_path, band_map=DEFAULT_BAND_MAP,
+                          percentiles=DEFAULT_PERCENTILES, workers=DEFAULT_WORKERS, cube_path=None):
+    """
+    Computes an index for every scene window by window and builds per-pixel
+    composites without holding the T x H x W cube in memory.
+
+    - The per-date index is stored in a disk-backed (T, H, W) float32 memmap,
+      which later serves time profiles of single pixels.
+    - Windows are processed in parallel threads; each thread keeps its own
+      rasterio handles. Only the main thread writes the GeoTIFF.
+
+    paths must be co-registered rasters (paths or /vsimem names) sorted by date.
+    cube_path is where the memmap is written (a new temporary file when None;
+    deleting it is up to the caller). Returns (dst_path, cube_path, layer names).
+    """
+    check_grid(paths)
+    plan = compile_plan((expression,))
+    band_numbers = resolve_bands(plan.bands, band_map)
+    years = np.array([(d - dates[0]).days / 365.25 for d in dates])
+
+    local = threading.local()
+    opened = []
+
+    def datasets():
+        if not hasattr(local, "sources"):
+            local.sources = [rasterio.open(path) for path in paths]
+            local.pool = BufferPool()
+            opened.extend(local.sources)
+        return local.sources, local.pool
+
+    if cube_path is None:
+        fd, cube_path = tempfile.mkstemp(suffix=".cube")
+        os.close(fd)
+
+    with rasterio.open(paths[0]) as first:
+        height, width = first.height, first.width
+        profile = output_profile(first, count=len(layer_names(percentiles)))
+        windows = list(iter_windows(first))
+    cube = np.memmap(cube_path, dtype=np.float32, mode="w+", shape=(len(paths), height, width))
+
+    def process(window):
+        sources, pool = datasets()
+        shape = window_shape(window)
+        (row_start, row_stop), (col_start, col_stop) = window.toranges()
+        stack = np.empty((len(sources),) + shape, dtype=np.float32)
+        for t, src in enumerate(sources):
+            bands = read_bands(src, band_numbers, window, pool)
+            for _, values in plan.evaluate(bands, pool, shape):
+                stack[t] = values
+        cube[:, row_start:row_stop, col_start:col_stop] = stack
+        return window, composite_window(stack, years, percentiles)
+
+    try:
+        with rasterio.open(dst_path, "w", **profile) as dst, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            for band, name in enumerate(layer_names(percentiles), start=1):
+                dst.set_band_description(band, name)
+            # Submit in batches so finished windows do not pile up in memory
+            batch = max(1, workers * 2)
+            for start in range(0, len(windows), batch):
+                for window, layers in executor.map(process, windows[start:start + batch]):
+                    dst.write(layers, window=window)
+    finally:
+        cube.flush()
+        for src in opened:
+            src.close()
+
+    return dst_path, cube_path, layer_names(percentiles)
+
+
+def pixel_profile(cube_path, n_dates, height, width, row, col):
+    """Index time profile of one pixel read from the memmapped cube."""
+    cube = np.memmap(cube_path, dtype=np.float32, mode="r", shape=(n_dates, height, width))
+    return np.array(cube[:, row, col])
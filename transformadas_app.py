@@ -1,15 +1,30 @@
 import streamlit as st
 import numpy as np
 import rasterio
-from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
-#from PIL import Image
+from PIL import Image
+from klt_engine import METHODS, fit, project_cube, reconstruct_cube
+from display_stretch import stretch
 
 st.title("Transformada Karhunen-Loève (KLT)")
 
 # Upload file
 uploaded_file = st.file_uploader("Cargue una imagen multiespectral (GeoTIFF o RGB)", type=["tif", "tiff", "png", "jpg"])
 
+@st.cache_data
+def load_cube(file_id, _file):
+    """Image as (rows, cols, bands), read once per uploaded file."""
+    _file.seek(0)
+    return load_image(_file)
+
+@st.cache_data
+def fit_klt(file_id, _img, method):
+    """
+    KLT of the image from its bands x bands covariance (one pass over the
+    pixels); the eigenvectors are cached per image and method.
+    """
+    return fit(_img, method)
+
 def load_image(file):
     try:
         with rasterio.open(file) as src:
@@ -21,33 +36,18 @@ def load_image(file):
             img = np.expand_dims(img, axis=-1)
     return img
 
-def normalize_for_display(img):
-    img = img.astype(np.float32)
-    min_val = np.min(img)
-    max_val = np.max(img)
-
-    if max_val - min_val == 0:
-        return np.zeros_like(img)
-
-    img = (img - min_val) / (max_val - min_val)
-    return img
-
-def percentile_stretch(img, p_low=2, p_high=98):
-    low = np.percentile(img, p_low)
-    high = np.percentile(img, p_high)
-
-    img = np.clip(img, low, high)
-    return (img - low) / (high - low)
-
-def despliegue(display_mode, img, bands, title, k):
+def despliegue(display_mode, read_bands, bands, title, k, image_key, **stretch_options):
+    """
+    read_bands(list of band indices) returns those bands as (rows, cols, n);
+    the display stretch is cached per image_key and bands.
+    """
     if display_mode == "RGB":
         if bands >= 3:
             r = st.selectbox("Canal R (Red)", list(range(bands)), index=2, key=k+1)
             g = st.selectbox("Canal G (Green)", list(range(bands)), index=1, key=k+2)
             b = st.selectbox("Canal B (Blue)", list(range(bands)), index=0, key=k+3)
 
-            rgb = np.stack([img[:, :, r], img[:, :, g], img[:, :, b]], axis=-1)
-            rgb = normalize_for_display(rgb)
+            rgb = stretch(read_bands([r, g, b]), key=(image_key, r, g, b), **stretch_options)
 
             st.image(rgb, caption=f"{title} RGB")
         else:
@@ -55,42 +55,35 @@ def despliegue(display_mode, img, bands, title, k):
 
     else:
         band_idx = st.slider("Seleccione la banda", 0, bands - 1, 0, key=k+4)
-        band_img = img[:, :, band_idx]
-        band_img = normalize_for_display(band_img)
+        band_img = stretch(read_bands([band_idx])[:, :, 0], key=(image_key, band_idx), **stretch_options)
 
         st.image(band_img, caption=f"{title} Banda {band_idx}")
 
 if uploaded_file is not None:
-    img = load_image(uploaded_file)
-
-    # Reshape for PCA
+    img = load_cube(uploaded_file.file_id, uploaded_file)
     rows, cols, bands = img.shape
-    reshaped = img.reshape(-1, bands)
 
-    # Normalize
-    reshaped = reshaped.astype(np.float32)
-    reshaped -= np.mean(reshaped, axis=0)
+    method = st.radio("Transformacion", list(METHODS), format_func=METHODS.get, horizontal=True)
 
-    # Apply PCA (KLT)
-    pca = PCA()
-    transformed = pca.fit_transform(reshaped)
+    # KLT from the bands x bands covariance (cached per image)
+    klt = fit_klt(uploaded_file.file_id, img, method)
     
     st.subheader("Opciones para desplegar la imagen")
 
     display_mode = st.radio("Escoja el modo", ["RGB", "Banda individual"],key=0)
 
-    despliegue(display_mode, img, bands,title='Original', k=0)
-
-    st.subheader("Varianza explicada")
-    st.write(pca.explained_variance_ratio_)
+    despliegue(display_mode, lambda idx: img[:, :, idx], bands, title='Original', k=0,
+               image_key=(uploaded_file.file_id, 'original'), mode='minmax')
 
-    # Reshape back to image
-    components = transformed.reshape(rows, cols, bands)
+    st.subheader("Varianza explicada" if method == "PCA" else "Relacion senal/ruido por componente")
+    st.write(klt.explained_variance_ratio if method == "PCA" else klt.eigenvalues)
 
     st.subheader("Componentes KLT")
 
+    # Only the selected component is computed: one (bands,) projection
     component_idx = st.slider("Seleccione el componente", 0, bands - 1, 0)
-    comp = percentile_stretch(components[:, :, component_idx])
+    comp = stretch(project_cube(img, klt, [component_idx])[:, :, 0],
+                   key=(uploaded_file.file_id, method, 'componente', component_idx))
 
     st.image(comp, caption=f"Componente KLT {component_idx}")
 
@@ -99,21 +92,13 @@ if uploaded_file is not None:
 
     k = st.slider("Numero de componentes", 1, bands, min(3, bands))
 
-    reduced = transformed[:, :k]
-
-    # Pad with zeros to match original number of components
-    padded = np.zeros_like(transformed)
-    padded[:, :k] = reduced
-
-    reconstructed = pca.inverse_transform(padded)
-    reconstructed = reconstructed.reshape(rows, cols, bands)
-
-    reconstructed = percentile_stretch(reconstructed)
+    # Reconstruction of the displayed bands only: (bands, n) matrix per k
+    def reconstructed_bands(idx):
+        return reconstruct_cube(img, klt, k, bands=idx)
 
     st.subheader("Opciones para desplegar la imagen")
 
     display_mode = st.radio("Escoja el modo", ["RGB", "Banda individual"],key=5)
 
-    despliegue(display_mode, reconstructed, bands,title='Reconstruida', k=5)
-
-
+    despliegue(display_mode, reconstructed_bands, bands, title='Reconstruida', k=5,
+               image_key=(uploaded_file.file_id, method, 'reconstruida', k), p_low=2, p_high=98)
\ No newline at end of file
@@ -1,8 +1,16 @@
 import streamlit as st
-import numpy as np
 import rasterio
 import matplotlib.pyplot as plt
 import pandas as pd
+from datetime import date
+from rasterio.io import MemoryFile
+from raster_stats import StreamingStats
+from zonal_stats import DEFAULT_ZONES, read_zones, zone_grid, zonal_statistics
+from time_series import composite_time_series, date_from_name, pixel_profile
+from veg_index_engine import DEFAULT_BAND_MAP, INDICES, ScratchFile, check_bands, index_expressions, needed_bands, write_indices, read_preview
+
+# --- Configuration ---
+MAX_CACHED_RUNS = 4   # Index stacks / time series kept per server; evicted ones delete their temporary files
 
 st.set_page_config(layout="wide")
 st.title("🌿 Indices de Vegetacion")
@@ -16,69 +24,204 @@ user_response = st.sidebar.text_area("Que valor le asigna cada indice a la clase
 # --- Sidebar ---
 st.sidebar.header("Options")
 
+mode = st.sidebar.radio("Modo", ["Escena unica", "Serie temporal"])
+
+# All selected indices are computed in one pass; switching the displayed one is free
+index_names = st.sidebar.multiselect(
+    "Indices a calcular",
+    list(INDICES),
+    default=["NDVI", "GNDVI", "SAVI"]
+)
+
+# User-defined index typed as a band-math expression
+custom_expression = st.sidebar.text_input(
+    "Indice personalizado (expresion)",
+    placeholder="2.5*(nir-red)/(nir+6*red-7.5*blue+1)",
+    help="Alias de banda: blue, green, red, nir, swir2 o bN para la banda N. Funciones: sqrt, abs, log, exp, min, max."
+)
+custom = {"Personalizado": custom_expression} if custom_expression.strip() else {}
+
 index_option = st.sidebar.selectbox(
     "Seleccione un indice",
-    ["NDVI", "GNDVI", "SAVI"]
+    index_names + list(custom)
 )
 
-uploaded_file = st.file_uploader("Cargar una imagen multiespectral (GeoTIFF preferred)", type=["tif", "tiff", "png"])
+with st.sidebar.expander("Numero de banda"):
+    band_map = {
+        name: st.number_input(f"Banda {name.upper()}", 1, 20, band, key=f"band_{name}")
+        for name, band in DEFAULT_BAND_MAP.items()
+    }
+
+# Zonal statistics over polygons (campusUT by default)
+zonal_enabled = st.sidebar.checkbox("Estadisticas zonales (poligonos)")
+zones_file = None
+if zonal_enabled:
+    zones_file = st.sidebar.file_uploader("Poligonos (GeoJSON/GPKG, opcional)", type=["geojson", "gpkg"])
+
+if mode == "Serie temporal":
+    uploaded_files = st.file_uploader(
+        "Cargar escenas co-registradas (una por fecha, fecha AAAAMMDD en el nombre)",
+        type=["tif", "tiff"],
+        accept_multiple_files=True
+    )
+    uploaded_file = None
+else:
+    uploaded_file = st.file_uploader("Cargar una imagen multiespectral (GeoTIFF preferred)", type=["tif", "tiff", "png"])
 
 # --- Functions ---
-def calculate_index(index_name, bands):
-    # Expecting bands as dict: {"red":..., "green":..., "nir":...}
-    red = bands.get("red")
-    green = bands.get("green")
-    nir = bands.get("nir")
+def get_stats(accumulator):
+    # Streaming accumulator filled window by window (median from its histogram)
+    return accumulator.to_frame()
 
-    if index_name == "NDVI":
-        return (nir - red) / (nir + red + 1e-10)
 
-    elif index_name == "GNDVI":
-        return (nir - green) / (nir + green + 1e-10)
+@st.cache_resource(max_entries=MAX_CACHED_RUNS)
+def compute_indices(file_id, _uploaded_file, expressions, band_items):
+    """
+    Streams all (name, expression) indices over block windows into one tiled
+    GeoTIFF stack (one band per index). Statistics are accumulated from the
+    same windows; returns (ScratchFile, {name: StreamingStats}). Keep the
+    ScratchFile referenced while its path is in use.
+    """
+    output = ScratchFile(prefix=f"{file_id}_", suffix=".tif")
+    stats = {name: StreamingStats() for name, _ in expressions}
+    _uploaded_file.seek(0)
+    with rasterio.open(_uploaded_file) as src:
+        write_indices(src, list(expressions), output.path, dict(band_items),
+                      on_window=lambda name, window, values: stats[name].update(values))
+    return output, stats
 
-    elif index_name == "SAVI":
-        L = 0.5
-        return ((nir - red) / (nir + red + L)) * (1 + L)
 
-    else:
-        return None
+@st.cache_data
+def load_zones(zones_key, _source):
+    return read_zones(_source)
 
 
-def get_stats(array):
-    flat = array.flatten()
-    flat = flat[~np.isnan(flat)]
+@st.cache_data
+def compute_zonal(index_path, index_band, value_range, zones_key, _zones, label_column):
+    """Rasterizes the zones once per grid and reduces the index per zone in one pass."""
+    with rasterio.open(index_path) as src:
+        grid = zone_grid(src, _zones, zones_key, label_column)
+        return zonal_statistics(src, grid, value_range, band=index_band)
 
-    stats = {
-        "Media": np.mean(flat),
-        "Mediana": np.median(flat),
-        "Minimo": np.min(flat),
-        "Maximo": np.max(flat),
-        "Desv. Est.": np.std(flat)
-    }
 
-    return pd.DataFrame(stats.items(), columns=["Metrica", "Valor"])
+@st.cache_resource(max_entries=MAX_CACHED_RUNS)
+def compute_time_series(file_ids, _uploaded_files, dates, expression, band_items):
+    """
+    Index per date and per-pixel composites, window by window and in parallel.
+    Uploads are exposed to GDAL as in-memory files so every worker can open them.
+    Returns (composites ScratchFile, (T, H, W) cube ScratchFile, layer names);
+    both files are deleted once evicted and no longer referenced.
+    """
+    memfiles = [MemoryFile(f.getbuffer()) for f in _uploaded_files]
+    composites, cube = ScratchFile(suffix=".tif"), ScratchFile(suffix=".cube")
+    try:
+        _, _, layers = composite_time_series([m.name for m in memfiles], list(dates), expression,
+                                             composites.path, dict(band_items), cube_path=cube.path)
+        return composites, cube, layers
+    finally:
+        for memfile in memfiles:
+            memfile.close()
+
+
+def show_time_series(uploaded_files, expressions, band_map):
+    """Time-series mode: composites and trend of the selected index."""
+    if len(uploaded_files) < 2:
+        st.info("Cargue al menos dos escenas para construir la serie temporal.")
+        return
+
+    # Sort the scenes by the date in their names (upload order otherwise)
+    dates = [date_from_name(f.name) for f in uploaded_files]
+    if None in dates:
+        st.warning("No se encontro la fecha en todos los nombres; se usara el orden de carga (un año entre escenas).")
+        dates = [date(2000 + i, 1, 1) for i in range(len(uploaded_files))]
+    order = sorted(range(len(dates)), key=lambda i: dates[i])
+    files = [uploaded_files[i] for i in order]
+    dates = tuple(dates[i] for i in order)
+
+    if not index_option:
+        st.warning("Seleccione un indice.")
+        return
+    name, expression = index_option, dict(expressions)[index_option]
+    try:
+        scene_bands = needed_bands([(name, expression)], band_map)
+    except ValueError as e:
+        st.error(f"Indice personalizado: {e}")
+        return
+
+    with st.spinner(f"Calculando {name} para {len(files)} fechas..."):
+        try:
+            composites, cube, layers = compute_time_series(
+                tuple(f.file_id for f in files), files, dates, expression, tuple(scene_bands.items())
+            )
+            dst_path, cube_path = composites.path, cube.path
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+    st.write(f"### Serie temporal de {name}")
+    st.dataframe(pd.DataFrame({"Fecha": dates, "Archivo": [f.name for f in files]}))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        layer = st.selectbox("Capa", layers)
+        fig, ax = plt.subplots()
+        im = ax.imshow(read_preview(dst_path, band=layers.index(layer) + 1),
+                       cmap="RdBu" if layer.startswith(("tendencia", "anomalia")) else "RdYlGn")
+        plt.colorbar(im, ax=ax)
+        ax.axis("off")
+        st.pyplot(fig)
+        with open(dst_path, "rb") as f:
+            st.download_button("Descargar compuestos (GeoTIFF multibanda)", data=f,
+                               file_name=f"{name.lower()}_compuestos.tif", mime="image/tiff")
+
+    with col2:
+        with rasterio.open(dst_path) as dst:
+            height, width = dst.height, dst.width
+        row = st.slider("Fila", 0, height - 1, height // 2)
+        col = st.slider("Columna", 0, width - 1, width // 2)
+        profile = pixel_profile(cube_path, len(dates), height, width, row, col)
+        fig2, ax2 = plt.subplots()
+        ax2.plot(dates, profile, "o-")
+        ax2.set_title(f"{name} del pixel ({row}, {col})")
+        fig2.autofmt_xdate()
+        st.pyplot(fig2)
 
 
 # --- Main Logic ---
+if mode == "Serie temporal":
+    if uploaded_files:
+        show_time_series(uploaded_files, index_expressions(index_names, custom), band_map)
+    else:
+        st.info("Cargue las escenas para empezar.")
+    st.stop()
+
 if uploaded_file:
+    uploaded_file.seek(0)
     with rasterio.open(uploaded_file) as src:
         st.write("### Informacion de la imagen")
         st.write(f"Bandas: {src.count}")
         st.write(f"Dimensiones (cols, filas): {src.width} x {src.height}")
 
-        # Basic assumption: band order
-        # You may adjust depending on your dataset
-        bands = {}
+        expressions = index_expressions(index_names, custom)
+        if not expressions:
+            st.warning("Seleccione al menos un indice.")
+            st.stop()
 
-        if src.count >= 3:
-            bands["red"] = src.read(4).astype(float)
-            bands["green"] = src.read(3).astype(float)
-            bands["nir"] = src.read(8).astype(float)
-        else:
-            st.error("La imagen debe tener  bandas (R, G, NIR)")
+        # Basic assumption: band order (adjustable in the sidebar)
+        try:
+            band_map = needed_bands(expressions, band_map)
+        except ValueError as e:
+            st.error(f"Indice personalizado: {e}")
+            st.stop()
+        missing = check_bands(src, band_map)
+        if missing:
+            st.error(f"La imagen no tiene las bandas {missing} ({', '.join(band_map).upper()})")
             st.stop()
 
-        index = calculate_index(index_option, bands)
+        index_output, index_stats = compute_indices(uploaded_file.file_id, uploaded_file, tuple(expressions), tuple(band_map.items()))
+        index_path = index_output.path  # index_output stays referenced for the rest of the run
+        index_band = [name for name, _ in expressions].index(index_option) + 1
+        preview = read_preview(index_path, band=index_band)
 
         col1, col2 = st.columns(2)
 
@@ -86,23 +229,45 @@ if uploaded_file:
         with col1:
             st.subheader(f"{index_option}")
             fig, ax = plt.subplots()
-            im = ax.imshow(index, cmap="RdYlGn")
+            im = ax.imshow(preview, cmap="RdYlGn")
             plt.colorbar(im, ax=ax)
             ax.axis("off")
             st.pyplot(fig)
 
+            with open(index_path, "rb") as f:
+                st.download_button(
+                    label=f"Descargar {', '.join(name for name, _ in expressions)} (GeoTIFF multibanda)",
+                    data=f,
+                    file_name="indices.tif",
+                    mime="image/tiff"
+                )
+
         # --- Histogram ---
         with col2:
             st.subheader("Histograma")
             fig2, ax2 = plt.subplots()
-            ax2.hist(index.flatten(), bins=50)
+            if index_stats[index_option].n:
+                counts, edges = index_stats[index_option].histogram(bins=50)
+                ax2.hist(edges[:-1], bins=edges, weights=counts)
+            else:
+                st.warning("El indice no tiene valores validos (todos NaN o infinitos).")
             ax2.set_title("Distribucion")
             st.pyplot(fig2)
 
         # --- Statistics ---
         st.subheader("Estadisticas descriptivas")
-        stats_df = get_stats(index)
+        stats_df = get_stats(index_stats[index_option])
         st.dataframe(stats_df)
+
+        # --- Zonal Statistics ---
+        if zonal_enabled and index_stats[index_option].n:
+            st.subheader("Estadisticas zonales")
+            zones_key = zones_file.file_id if zones_file else DEFAULT_ZONES
+            zones, label_column = load_zones(zones_key, zones_file or DEFAULT_ZONES)
+            accumulator = index_stats[index_option]
+            zonal_df = compute_zonal(index_path, index_band, (accumulator.min, accumulator.max),
+                                     zones_key, zones, label_column)
+            st.dataframe(zonal_df, use_container_width=True)
 		
 		# --- Display User Info ---
         if user_name or user_response:
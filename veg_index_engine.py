@@ -0,0 +1,169 @@
+import math
+import os
+import tempfile
+import weakref
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from band_math import compile_plan, resolve_bands
+
+# --- Configuration ---
+# Band numbers (1-based) of a Sentinel-2 stack, as assumed by veg_index_app
+DEFAULT_BAND_MAP = {"blue": 2, "green": 3, "red": 4, "nir": 8, "swir2": 12}
+WINDOW_PIXELS = 512 * 512     # Target pixels per window for striped rasters
+OUTPUT_BLOCK = 256            # Tile size of the output GeoTIFF
+SAVI_L = 0.5
+EVI_G, EVI_C1, EVI_C2, EVI_L = 2.5, 6.0, 7.5, 1.0
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ScratchFile:
+    """
+    Temporary file (path) deleted once the object is no longer referenced or
+    at exit, so outputs kept in a bounded cache are removed when evicted.
+    """
+
+    def __init__(self, suffix="", prefix=None):
+        fd, self.path = tempfile.mkstemp(suffix=suffix, prefix=prefix)
+        os.close(fd)
+        weakref.finalize(self, _remove_file, self.path)
+
+
+class BufferPool:
+    """Reusable float32 buffers keyed by name and window shape."""
+
+    def __init__(self, dtype=np.float32):
+        self.dtype = dtype
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=None):
+        key = (name, shape)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty(shape, dtype=dtype or self.dtype)
+        return buffer
+
+
+def iter_windows(src, max_pixels=WINDOW_PIXELS):
+    """
+    Yields the windows used to stream a raster: the native blocks for tiled
+    files, or strips of whole blocks (about max_pixels each) for striped ones.
+    """
+    block_rows, block_cols = src.block_shapes[0]
+    if block_cols < src.width:
+        for _, window in src.block_windows(1):
+            yield window
+        return
+
+    rows = max(block_rows, (max_pixels // src.width) // block_rows * block_rows)
+    for row_off in range(0, src.height, rows):
+        yield Window(0, row_off, src.width, min(rows, src.height - row_off))
+
+
+def window_shape(window):
+    return (int(window.height), int(window.width))
+
+
+def read_bands(src, band_map, window, pool):
+    """Reads each band of band_map for a window straight into float32 buffers."""
+    shape = window_shape(window)
+    bands = {}
+    for name, band in band_map.items():
+        buffer = pool.get(name, shape)
+        src.read(band, window=window, out=buffer)
+        bands[name] = buffer
+    return bands
+
+
+# Index name -> band-math expression (compiled and evaluated by band_math)
+INDICES = {
+    "NDVI": "(nir - red) / (nir + red)",
+    "GNDVI": "(nir - green) / (nir + green)",
+    "SAVI": f"(nir - red) / (nir + red + {SAVI_L}) * (1 + {SAVI_L})",
+    "EVI": f"{EVI_G} * (nir - red) / (nir + {EVI_C1} * red - {EVI_C2} * blue + {EVI_L})",
+    "NDWI": "(green - nir) / (green + nir)",
+    "NBR": "(nir - swir2) / (nir + swir2)",
+    "MSAVI": "(2 * nir + 1 - sqrt((2 * nir + 1) ** 2 - 8 * (nir - red))) / 2",
+}
+
+
+def index_expressions(index_names, custom=None):
+    """(name, expression) pairs for built-in index names plus custom {name: expression}."""
+    expressions = [(name, INDICES[name]) for name in index_names]
+    expressions += list((custom or {}).items())
+    return expressions
+
+
+def needed_bands(expressions, band_map=DEFAULT_BAND_MAP):
+    """Band aliases (and their numbers) required by a list of (name, expression)."""
+    plan = compile_plan(tuple(expression for _, expression in expressions))
+    return resolve_bands(plan.bands, band_map)
+
+
+def output_profile(src, count=1):
+    """Tiled, compressed float32 GeoTIFF on the same grid (CRS/transform) as src."""
+    return {
+        "driver": "GTiff",
+        "width": src.width,
+        "height": src.height,
+        "count": count,
+        "dtype": "float32",
+        "crs": src.crs,
+        "transform": src.transform,
+        "nodata": np.nan,
+        "tiled": True,
+        "blockxsize": OUTPUT_BLOCK,
+        "blockysize": OUTPUT_BLOCK,
+        "compress": "deflate",
+        "predictor": 3,
+        "BIGTIFF": "IF_SAFER",
+    }
+
+
+def check_bands(src, band_map):
+    """Returns the band numbers missing from src (empty list when all exist)."""
+    return sorted(band for band in set(band_map.values()) if not 1 <= band <= src.count)
+
+
+def write_indices(src, expressions, dst_path, band_map=DEFAULT_BAND_MAP, on_window=None):
+    """
+    Evaluates every (name, expression) in a single pass: each needed band is
+    read once per window and the compiled plan shares common sub-expressions
+    (e.g. nir+red) between indices. Writes a multi-band stack (one band per
+    expression, in the given order).
+    on_window(name, window, values) is called for every computed window.
+    """
+    names = [name for name, _ in expressions]
+    plan = compile_plan(tuple(expression for _, expression in expressions))
+    band_numbers = resolve_bands(plan.bands, band_map)
+    pool = BufferPool()
+
+    with rasterio.open(dst_path, "w", **output_profile(src, count=len(names))) as dst:
+        for band, name in enumerate(names, start=1):
+            dst.set_band_description(band, name)
+
+        for window in iter_windows(src):
+            shape = window_shape(window)
+            bands = read_bands(src, band_numbers, window, pool)
+            for k, values in plan.evaluate(bands, pool, shape):
+                dst.write(values, k + 1, window=window)
+                if on_window is not None:
+                    on_window(names[k], window, values)
+    return dst_path
+
+
+def read_preview(path, band=1, max_size=1024):
+    """Decimated read of a band for display (at most max_size pixels per side)."""
+    with rasterio.open(path) as src:
+        scale = max(1, math.ceil(max(src.width, src.height) / max_size))
+        shape = (math.ceil(src.height / scale), math.ceil(src.width / scale))
+        return src.read(band, out_shape=shape, resampling=Resampling.nearest)
@@ -3,23 +3,9 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# --- 1. Define Vegetation Index Calculation Functions ---
-def calculate_ndvi(nir, red):
-    """NDVI = (NIR - Red) / (NIR + Red)"""
-    if (nir + red) == 0: return np.nan
-    return (nir - red) / (nir + red)
-
-def calculate_evi(nir, red, blue, L=1.0, C1=6.0, C2=7.5, G=2.5):
-    """EVI = G * ((NIR - Red) / (NIR + C1 * Red - C2 * Blue + L))"""
-    denominator = (nir + C1 * red - C2 * blue + L)
-    if denominator == 0: return np.nan
-    return G * ((nir - red) / denominator)
-
-def calculate_savi(nir, red, L=0.5):
-    """SAVI = ((NIR - Red) / (NIR + Red + L)) * (1 + L)"""
-    denominator = (nir + red + L)
-    if denominator == 0: return np.nan
-    return ((nir - red) / denominator) * (1 + L)
+# --- 1. Vegetation Index Calculation Functions ---
+# Vectorized versions shared with the raster apps (scalars or arrays, out=, float32)
+from spectral_indices import calculate_ndvi, calculate_evi, calculate_savi
 
 # --- 2. Define Spectral Signatures for Scenarios (Hypothetical) ---
 # Values are [Blue, Red, NIR] reflectance (0 to 1)
@@ -43,8 +29,77 @@ SPECTRAL_SIGNATURES = {
 }
 BAND_NAMES = ["Blue", "Red", "NIR"]
 BAND_WAVELENGTHS = [480, 660, 840] # Approximate centers for visualization
+INDEX_NAMES = ["NDVI", "EVI", "SAVI"]
+L_SAVI = 0.5 # Constant L factor for simplicity
+SLIDER_STEPS = 101 # Slider from 0 to 1 in steps of 0.01
+
+# --- 3. Precomputed Response Surfaces ---
+@st.cache_data
+def response_surfaces(steps=SLIDER_STEPS):
+    """
+    Lookup tables for every pair of signatures over the whole slider range,
+    computed once with array operations:
+    bands[i, j, k] = [Blue, Red, NIR] at step k from signature i to j,
+    indices[i, j, k] = [NDVI, EVI, SAVI] of those bands.
+    """
+    signatures = np.array([[SPECTRAL_SIGNATURES[name]["bands"][band] for band in BAND_NAMES]
+                           for name in SPECTRAL_SIGNATURES])
+    factors = np.linspace(0.0, 1.0, steps)
+    # Linear interpolation: (1 - factor) * start + factor * end, for all pairs at once
+    start = signatures[:, None, None, :]
+    end = signatures[None, :, None, :]
+    bands = (1 - factors[:, None]) * start + factors[:, None] * end
+    blue, red, nir = bands[..., 0], bands[..., 1], bands[..., 2]
+    indices = np.stack([
+        calculate_ndvi(nir, red),
+        calculate_evi(nir, red, blue),
+        calculate_savi(nir, red, L_SAVI),
+    ], axis=-1)
+    return bands, indices
+
+def signature_figure():
+    """
+    Matplotlib figure built once per session; later reruns only update the
+    data of its artists (line, labels, annotation).
+    """
+    if "signature_figure" not in st.session_state:
+        fig, ax = plt.subplots(figsize=(6, 4))
+        line, = ax.plot(BAND_WAVELENGTHS, [0, 0, 0], 'o-', linewidth=2, markersize=8)
+
+        # Highlight the key VI bands
+        ax.axvspan(620, 700, alpha=0.1, color='red', label='Red (Absorcion)')
+        ax.axvspan(760, 900, alpha=0.1, color='green', label='NIR (Reflexion)')
+
+        ax.set_xticks(BAND_WAVELENGTHS)
+        ax.set_xticklabels(BAND_NAMES)
+        ax.set_ylim(0, 1.0)
+        ax.set_title("Curva de reflectancia espectral actual")
+        ax.set_ylabel("Valor de reflectancia (0-1)")
+        ax.set_xlabel("Banda espectral")
 
-# --- 3. Streamlit App Layout ---
+        labels = [ax.text(x, 0, "", fontsize=9, ha='center') for x in BAND_WAVELENGTHS]
+        # Add the 'Vegetation Index Principle' description
+        annotation = ax.annotate('Gran reflexión NIR, baja absorción del rojo → Alto valor VI',
+                                 xy=(BAND_WAVELENGTHS[2], 0), xytext=(BAND_WAVELENGTHS[2] - 100, 0),
+                                 arrowprops=dict(facecolor='black', shrink=0.05, width=1, headwidth=5),
+                                 fontsize=10, color='darkgreen', ha='center')
+        st.session_state["signature_figure"] = (fig, line, labels, annotation)
+    return st.session_state["signature_figure"]
+
+def update_signature_figure(reflectance, color):
+    fig, line, labels, annotation = signature_figure()
+    line.set_ydata(reflectance)
+    line.set_color(color)
+    for label, ref in zip(labels, reflectance):
+        label.set_y(ref + 0.05)
+        label.set_text(f"{ref:.2f}")
+    nir, red = reflectance[2], reflectance[1]
+    annotation.xy = (BAND_WAVELENGTHS[2], nir)
+    annotation.set_position((BAND_WAVELENGTHS[2] - 100, nir + 0.3))
+    annotation.set_visible(bool(nir > red))
+    return fig
+
+# --- 4. Streamlit App Layout ---
 def main():
     st.set_page_config(
         page_title="VI interactiva",
@@ -60,27 +115,33 @@ def main():
     st.sidebar.header("🔬 Selector de escenarios")
     st.sidebar.markdown("**Mueva el control deslizante** para volar virtualmente sobre un área que cambia de **Planta sana** a **Suelo desnudo**.")
 
-    # Get the key signatures for interpolation
-    sig_healthy = SPECTRAL_SIGNATURES["🌱 Planta sana"]["bands"]
-    sig_bare = SPECTRAL_SIGNATURES["🧱 Suelo desnudo"]["bands"]
-    
+    # Pair of signatures to interpolate (healthy -> bare by default)
+    names = list(SPECTRAL_SIGNATURES)
+    start_name = st.sidebar.selectbox("Superficie inicial (0)", names, index=names.index("🌱 Planta sana"))
+    end_name = st.sidebar.selectbox("Superficie final (1)", names, index=names.index("🧱 Suelo desnudo"))
+    default_pair = (start_name, end_name) == ("🌱 Planta sana", "🧱 Suelo desnudo")
+
     # Interactive Slider for Interpolation
     interpolation_factor = st.sidebar.slider(
-        "Transición de Planta Sana (0) a Suelo Desnudo (1)",
+        "Transición de Planta Sana (0) a Suelo Desnudo (1)" if default_pair
+        else f"Transición de {start_name} (0) a {end_name} (1)",
         0.0, 1.0, 0.0, 0.01,
-        help="Un valor de 0,0 simula un dosel puramente saludable, 1,0 es un suelo puramente desnudo.."
+        help="Un valor de 0,0 simula un dosel puramente saludable, 1,0 es un suelo puramente desnudo..",
+        key="interpolation_factor"
     )
-    
-    # Interpolate the spectral values
-    current_bands = {}
-    for band in BAND_NAMES:
-        h_val = sig_healthy[band]
-        b_val = sig_bare[band]
-        # Linear interpolation: current_value = (1 - factor) * healthy_value + factor * bare_value
-        current_bands[band] = (1 - interpolation_factor) * h_val + interpolation_factor * b_val
+
+    # The slider only indexes the precomputed tables
+    bands_lut, indices_lut = response_surfaces()
+    i, j = names.index(start_name), names.index(end_name)
+    step = int(round(interpolation_factor * (SLIDER_STEPS - 1)))
+    current_bands = dict(zip(BAND_NAMES, bands_lut[i, j, step].tolist()))
+    ndvi_val, evi_val, savi_val = indices_lut[i, j, step].tolist()
 
     # Display current surface type
-    if interpolation_factor < 0.25:
+    if not default_pair:
+        st.sidebar.info(f"Superficie actual: **{100 * (1 - interpolation_factor):.0f}% {start_name} / "
+                        f"{100 * interpolation_factor:.0f}% {end_name}**")
+    elif interpolation_factor < 0.25:
         st.sidebar.success("Superficie actual: **Dosel de alto vigor**")
     elif interpolation_factor < 0.75:
         st.sidebar.warning("Superficie actual: **Vegetación escasa/estresada**")
@@ -88,61 +149,29 @@ def main():
         st.sidebar.error("Superficie actual: **Suelo desnudo predominante**")
 
 
-    # --- 4. Spectral Signature Visualization ---
+    # --- 5. Spectral Signature Visualization ---
     col_vis, col_calc = st.columns([1, 1])
 
     with col_vis:
         st.header("1. Firma espectral")
         st.markdown("Esta línea muestra cuánta luz se refleja en cada banda para el escenario elegido.")
         
-        fig, ax = plt.subplots(figsize=(6, 4))
-        
-        # Plot the interpolated signature
+        # Plot the interpolated signature on the cached figure
         current_reflectance = [current_bands[band] for band in BAND_NAMES]
-        
-        ax.plot(BAND_WAVELENGTHS, current_reflectance, 'o-', color='green' if interpolation_factor < 0.5 else 'orange', linewidth=2, markersize=8)
-        
-        # Highlight the key VI bands
-        ax.axvspan(620, 700, alpha=0.1, color='red', label='Red (Absorcion)')
-        ax.axvspan(760, 900, alpha=0.1, color='green', label='NIR (Reflexion)')
-
-        ax.set_xticks(BAND_WAVELENGTHS)
-        ax.set_xticklabels(BAND_NAMES)
-        ax.set_ylim(0, 1.0)
-        ax.set_title("Curva de reflectancia espectral actual")
-        ax.set_ylabel("Valor de reflectancia (0-1)")
-        ax.set_xlabel("Banda espectral")
-        
-        # Add labels to the points
-        for i, (band, ref) in enumerate(current_bands.items()):
-             ax.text(BAND_WAVELENGTHS[i], ref + 0.05, f"{ref:.2f}", fontsize=9, ha='center')
-        
-        # Add the 'Vegetation Index Principle' description
-        if current_bands["NIR"] > current_bands["Red"]:
-            ax.annotate('Gran reflexión NIR, baja absorción del rojo → Alto valor VI', 
-                        xy=(BAND_WAVELENGTHS[2], current_bands["NIR"]), xytext=(BAND_WAVELENGTHS[2] - 100, current_bands["NIR"] + 0.3),
-                        arrowprops=dict(facecolor='black', shrink=0.05, width=1, headwidth=5),
-                        fontsize=10, color='darkgreen', ha='center')
+        fig = update_signature_figure(current_reflectance, 'green' if interpolation_factor < 0.5 else 'orange')
         
         st.pyplot(fig)
 
-    # --- 5. Index Calculation and Comparison ---
+    # --- 6. Index Calculation and Comparison ---
     with col_calc:
         st.header("2. Cálculo del índice")
         st.markdown("Los índices se calculan utilizando los valores de reflectancia del gráfico..")
 
-        # Calculate results
-        nir = current_bands["NIR"]
-        red = current_bands["Red"]
-        blue = current_bands["Blue"] # Used for EVI
-        L_savi = 0.5 # Constant L factor for simplicity in this section
-
-        ndvi_val = calculate_ndvi(nir, red)
-        evi_val = calculate_evi(nir, red, blue)
-        savi_val = calculate_savi(nir, red, L_savi)		
+        # Values come from the lookup table (same functions, computed once)
+        L_savi = L_SAVI
  
         results_df = pd.DataFrame({
-            "Indice": ["NDVI", "EVI", "SAVI"],
+            "Indice": INDEX_NAMES,
             "Valor": [ndvi_val, evi_val, savi_val],
             "Detalle de la Formula": [
                 r"(nir-red / nir+red)",
@@ -170,6 +199,6 @@ def main():
             Esta corrección es más beneficiosa en copas muy densas, donde el NDVI tiende a saturarse.
             """)
 
-# --- 6. Run the app ---
+# --- 7. Run the app ---
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from rasterio import features
+
+from class_area import MAX_DENSE_SPAN, grouped_counts, pixel_areas
+from veg_index_engine import iter_windows
+
+# --- Configuration ---
+DEFAULT_ZONES = "campusUT.gpkg"
+ZONE_BINS = 256        # Histogram bins per zone used for percentiles
+MAX_CACHED_GRIDS = 8   # Rasterized zone grids kept (each one is a temporary file)
+
+# (key, crs, transform, shape, label column) -> ZoneGrid, least recently used first
+_GRID_CACHE = OrderedDict()
+_GRID_LOCK = threading.Lock()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ZoneGrid:
+    """
+    Zone ids rasterized on a raster grid (1..n, 0 outside every polygon),
+    stored in a disk-backed memmap so windows can be sliced from it. The
+    file is deleted once the grid is no longer referenced (or at exit).
+    """
+
+    def __init__(self, ids, labels, path=None):
+        self.ids = ids
+        self.labels = labels
+        if path is not None:
+            weakref.finalize(self, _remove_file, path)
+
+    @property
+    def n_zones(self):
+        return len(self.labels)
+
+    def window(self, window):
+        (row_start, row_stop), (col_start, col_stop) = window.toranges()
+        return self.ids[row_start:row_stop, col_start:col_stop]
+
+
+def read_zones(source):
+    """Reads a polygon layer (path or file-like) and picks a label column."""
+    zones = gpd.read_file(source)
+    label_column = "Name" if "Name" in zones.columns else None
+    return zones, label_column
+
+
+def zone_grid(src, zones, key, label_column=None):
+    """
+    Rasterizes the polygons of a GeoDataFrame once per raster grid of src
+    (cached by key and grid, at most MAX_CACHED_GRIDS of them). Overlapping
+    polygons keep the last one.
+    """
+    cache_key = (key, src.crs.to_wkt() if src.crs else None, tuple(src.transform),
+                 src.height, src.width, label_column)
+    with _GRID_LOCK:
+        if cache_key in _GRID_CACHE:
+            _GRID_CACHE.move_to_end(cache_key)
+            return _GRID_CACHE[cache_key]
+
+    if src.crs is not None and zones.crs is not None:
+        zones = zones.to_crs(src.crs)
+
+    fd, path = tempfile.mkstemp(suffix=".zones")
+    os.close(fd)
+    ids = np.memmap(path, dtype=np.int32, mode="w+", shape=(src.height, src.width))
+    shapes = ((geometry, zone) for zone, geometry in enumerate(zones.geometry, start=1)
+              if geometry is not None and not geometry.is_empty)
+    features.rasterize(shapes, out=ids, transform=src.transform, fill=0)
+
+    if label_column:
+        labels = zones[label_column].astype(str).tolist()
+    else:
+        labels = [str(i) for i in zones.index]
+
+    grid = ZoneGrid(ids, labels, path)
+    with _GRID_LOCK:
+        _GRID_CACHE[cache_key] = grid
+        while len(_GRID_CACHE) > MAX_CACHED_GRIDS:
+            # Evicted grids delete their file when the last user drops them
+            _GRID_CACHE.popitem(last=False)
+    return grid
+
+
+class ZonalStats:
+    """
+    Per-zone count, mean, std, min, max and histogram (for percentiles),
+    updated window by window with grouped reductions (np.bincount /
+    ufunc.at) so the cost does not depend on the number of zones.
+    Slot 0 collects pixels outside every zone and is never reported.
+    """
+
+    def __init__(self, n_zones, value_range, bins=ZONE_BINS):
+        slots = n_zones + 1
+        self.count = np.zeros(slots, dtype=np.int64)
+        self.mean = np.zeros(slots)
+        self.m2 = np.zeros(slots)
+        self.min = np.full(slots, np.inf)
+        self.max = np.full(slots, -np.inf)
+        self.low, high = value_range
+        self.bins = bins
+        self.width = (high - self.low or 1.0) / bins
+        self.hist = np.zeros(slots * bins, dtype=np.int64)
+
+    def update(self, zone_ids, values):
+        valid = (zone_ids > 0) & np.isfinite(values)
+        z = zone_ids[valid]
+        x = values[valid].astype(np.float64)
+        if z.size == 0:
+            return self
+        slots = len(self.count)
+
+        count = np.bincount(z, minlength=slots)
+        sums = np.bincount(z, weights=x, minlength=slots)
+        present = count > 0
+        window_mean = np.divide(sums, count, out=np.zeros(slots), where=present)
+        deviation = x - window_mean[z]
+        window_m2 = np.bincount(z, weights=deviation * deviation, minlength=slots)
+
+        # Chan et al. merge of (count, mean, m2) for every zone at once
+        total = self.count + count
+        delta = window_mean - self.mean
+        ratio = np.divide(count, total, out=np.zeros(slots), where=present)
+        self.m2 += np.where(present, window_m2 + delta * delta * self.count * ratio, 0)
+        self.mean += np.where(present, delta * ratio, 0)
+        self.count = total
+
+        np.minimum.at(self.min, z, x)
+        np.maximum.at(self.max, z, x)
+
+        b = ((x - self.low) / self.width).astype(np.intp)
+        np.clip(b, 0, self.bins - 1, out=b)
+        self.hist += np.bincount(z * self.bins + b, minlength=slots * self.bins)
+        return self
+
+    def percentiles(self, qs):
+        """Per-zone percentiles (qs in 0-100) interpolated inside the bins."""
+        hist = self.hist.reshape(-1, self.bins)
+        cdf = np.cumsum(hist, axis=1)
+        rows = np.arange(hist.shape[0])
+        result = []
+        for q in qs:
+            target = self.count * (q / 100)
+            idx = np.argmax(cdf >= target[:, None], axis=1)
+            before = np.where(idx > 0, cdf[rows, idx - 1], 0)
+            inside = np.divide(target - before, hist[rows, idx],
+                               out=np.zeros(len(rows)), where=hist[rows, idx] > 0)
+            value = self.low + (idx + inside) * self.width
+            result.append(np.clip(value, self.min, self.max))
+        return result
+
+    def to_frame(self, labels):
+        present = self.count > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / self.count)
+        p25, p50, p75 = self.percentiles([25, 50, 75])
+
+        def column(values):
+            return np.where(present, values, np.nan)[1:]
+
+        return pd.DataFrame({
+            "Zona": labels,
+            "Pixeles": self.count[1:],
+            "Media": column(self.mean),
+            "Desv. Est.": column(std),
+            "Minimo": column(self.min),
+            "P25": column(p25),
+            "Mediana": column(p50),
+            "P75": column(p75),
+            "Maximo": column(self.max),
+        })
+
+
+class ZonalClassCounts:
+    """
+    Pixel count and area of every (zone, class) pair present, kept sparse so
+    memory follows the pairs present rather than zones x class range (e.g. a
+    65535 nodata). Each window is reduced with class_area.grouped_counts on
+    a compact key (zone among the window's zones, class code), so classes
+    are counted like ClassCounts: negatives kept, NaN / inf dropped. Areas
+    are the same sums weighted by the pixel area of each row (geographic
+    grids) or count x pixel area (uniform grids).
+    """
+
+    def __init__(self, n_zones):
+        self.n_zones = n_zones
+        self.pairs = {}   # (zone, class) -> (count, area)
+
+    def update(self, zone_ids, classes, row_areas=None):
+        weights = None
+        if row_areas is not None:
+            weights = np.broadcast_to(np.asarray(row_areas, dtype=np.float64)[:, None], zone_ids.shape).ravel()
+        values = classes.ravel()
+        valid = zone_ids.ravel() > 0
+        if values.dtype.kind == "f":
+            valid &= np.isfinite(values)
+        z, c = zone_ids.ravel()[valid], values[valid]
+        w = None if weights is None else weights[valid]
+        if z.size == 0:
+            return self
+
+        # Zones of this window renumbered 0..k-1 (bincount, no sort)
+        zones = np.nonzero(np.bincount(z))[0]
+        lookup = np.zeros(zones[-1] + 1, dtype=np.int64)
+        lookup[zones] = np.arange(len(zones))
+        if c.dtype.kind in "iub" and int(c.max()) - int(c.min()) < MAX_DENSE_SPAN:
+            low = int(c.min())
+            codes = c.astype(np.int64) - low
+            span = int(codes.max()) + 1
+            class_values = np.arange(low, low + span)
+        else:
+            class_values, codes = np.unique(c, return_inverse=True)
+            codes = codes.reshape(-1)
+            span = len(class_values)
+
+        keys, counts, areas = grouped_counts(lookup[z] * span + codes, w)
+        for zone, value, count, area in zip(zones[keys // span].tolist(), class_values[keys % span].tolist(),
+                                            counts.tolist(), areas.tolist()):
+            total = self.pairs.get((zone, value), (0, 0.0))
+            self.pairs[zone, value] = (total[0] + count, total[1] + area)
+        return self
+
+    def to_frame(self, labels, pixel_area=None):
+        """
+        Long table with one row per zone and class present in it (by zone,
+        then class); with a uniform pixel_area the areas are count x pixel_area.
+        """
+        order = sorted(self.pairs)
+        counts = np.array([self.pairs[pair][0] for pair in order], dtype=np.int64)
+        if pixel_area is not None:
+            areas = counts * pixel_area
+        else:
+            areas = np.array([self.pairs[pair][1] for pair in order], dtype=np.float64)
+        return pd.DataFrame({
+            "Zona": np.asarray(labels, dtype=object)[[zone - 1 for zone, _ in order]],
+            "Valor Clase": np.array([value for _, value in order]),
+            "Pixeles": counts,
+            "Area (metros2)": areas,
+        })
+
+
+def zonal_statistics(src, grid, value_range, band=1, bins=ZONE_BINS):
+    """Per-zone statistics of a continuous band (e.g. an index) in one pass."""
+    accumulator = ZonalStats(grid.n_zones, value_range, bins)
+    for window in iter_windows(src):
+        accumulator.update(grid.window(window), src.read(band, window=window))
+    return accumulator.to_frame(grid.labels)
+
+
+def zonal_class_counts(src, grid, band=1):
+    """
+    Per-zone pixel counts and areas (m2) of a class band in one pass, with
+    the same classes as class_area.class_areas; geodesic per-row pixel
+    areas on geographic CRSs.
+    """
+    areas = pixel_areas(src)
+    uniform = np.isscalar(areas)
+    accumulator = ZonalClassCounts(grid.n_zones)
+    for window in iter_windows(src):
+        classes = src.read(band, window=window)
+        (row_start, row_stop), _ = window.toranges()
+        accumulator.update(grid.window(window), classes, None if uniform else areas[row_start:row_stop])
+    return accumulator.to_frame(grid.labels, areas if uniform else None)